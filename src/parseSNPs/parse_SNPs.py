@@ -1,7 +1,7 @@
 """
-This program is designed to parse SNP files from OpenSNP.  
+This program is designed to parse SNP files from OpenSNP.
 
-Parameters that control what data is selected are passed to parse_snps in a Params instance.  
+Parameters that control what data is selected are passed to parse_snps in a Params instance.
 (See snp_classes)
 
 Author: David Gray
@@ -9,90 +9,345 @@ Author: David Gray
 import sys
 import fnmatch
 import os
+import time
 import psutil
+import multiprocessing
 from snp_classes import *
+from snp_cache import SnpCache
+from snp_index import RsidIndex
+from snp_manifest import SnpManifest
+from snp_sources import list_files, open_file, get_file_info
+from snp_metrics import *
+from snp_profile import PipelineProfiler, run_profiled
+from snp_results import new_results_set, new_file_counts, add_file_counts, ChunkResultsSet
 from snp_utils import get_elapsed, string_to_bool, increment_dictionary_counter
 from datetime import datetime
 
 def bypass(filename):
     return "-exome-" in filename
 
+# Get the files in the directory or archive named in params that belong to a file group (see
+# snp_sources for the names given to compressed files).  Returns a tuple of (selected, bypassed)
+# where selected is a list of (filename, label) tuples and bypassed is a list of selected
+# filenames that are never parsed.
+def select_files(params):
+    selected_files = []
+    bypassed_files = []
+    for filename in list_files(params.get_directory_location()):
+        label = params.get_file_group_label(filename)
+        if (label != None):
+            if (bypass(filename)):
+                bypassed_files.append(filename)
+            else:
+                selected_files.append((filename, label))
+    return (selected_files, bypassed_files)
+
+# Find the cached rows holding the rsid selected by params using the rsid index in the cache
+# directory (see snp_index).  Returns a dictionary of {filename: NumPy array of rows} for the
+# selected files the index covers, or None if there is no index or the rsid has wild cards other
+# than a trailing *.  Files that have changed since the index was built are left out.
+def find_indexed_rows(params, selected_files):
+    if params.get_cache_directory() == None or len(params.get_rsid().strip("*")) == 0:
+        return None
+    index_dir = RsidIndex.get_index_directory(params.get_cache_directory())
+    if not RsidIndex.exists(index_dir):
+        return None
+    rsid_index = RsidIndex(index_dir)
+    found = rsid_index.find(params.get_rsid())
+    if found == None:
+        return None
+    cache = SnpCache(params.get_cache_directory())
+    sources = rsid_index.get_sources()
+    indexed_rows = {}
+    for filename, label in selected_files:
+        path = os.path.join(params.get_directory_location(), filename)
+        if filename in sources and cache.is_current(path) and sources[filename] == cache.read_meta(path):
+            indexed_rows[filename] = found.get(filename, np.zeros(0, dtype=np.int64))
+    return indexed_rows
+
+# Get where the rows of a SNP file are read from: "index" if rows is passed (see
+# find_indexed_rows), "cache" if params has a cache directory holding a current copy of the file,
+# otherwise "text"
+def get_file_source(params, path, rows = None):
+    if rows is not None:
+        return "index"
+    if params.get_cache_directory() != None and SnpCache(params.get_cache_directory()).is_current(path):
+        return "cache"
+    return "text"
+
+# Return True if read_file_chunks applies the query plan of params as it parses a file, so its
+# chunks only hold the selected rows.  Files are read whole when they are cached.
+def is_plan_applied(params, rows = None):
+    return rows is None and params.get_cache_directory() == None
+
+# Read the SnpChunks of a SNP file for iter_file_chunks.  Chunks parsed from the text only hold
+# the rows selected by params, as its query plan is applied to the split fields before they are
+# converted (see is_plan_applied).  Chunks read or written through the cache hold every row.
+def read_file_chunks(params, path, processor, rows = None):
+    if rows is not None:
+        yield SnpCache(params.get_cache_directory()).load(path, stored_order=True).select(rows)
+    elif not is_plan_applied(params, rows):
+        for snp_chunk in SnpCache(params.get_cache_directory()).parse_file(path, processor, params):
+            yield snp_chunk
+    else:
+        with open_file(path) as f:
+            for snp_chunk in processor.parse_file(f, plan=params.get_query_plan()):
+                yield snp_chunk
+
+# Parse one SNP file a block at a time and yield a SnpChunk of the rows in each block that pass
+# the selections in params.  get_lines_read and is_valid on each chunk describe the block it was 
+# selected from.  Nothing is yielded if there is no processor for the file.  If params has a
+# cache directory, the file is read from the cache when it hasn't changed since it was cached.
+# If rows is passed (see find_indexed_rows) only those rows of the cached file are read.  If a
+# FileMetrics is passed, the bytes read and the time spent parsing and filtering are added to it.
+def iter_file_chunks(params, filename, rows = None, metrics = None):
+    processor = AbstractSNPProcessor.get_processor(filename)
+    if processor == None:
+        return
+    path = os.path.join(params.get_directory_location(), filename)
+    plan_applied = is_plan_applied(params, rows)
+    if metrics == None:
+        # Select the rows to process in each block with array masks, unless they were selected
+        # as the block was parsed
+        for snp_chunk in read_file_chunks(params, path, processor, rows):
+            yield snp_chunk if plan_applied else snp_chunk.select(params.process_chunk(snp_chunk))
+        return
+    metrics.source = get_file_source(params, path, rows)
+    if metrics.source == "text":
+        metrics.bytes_read = get_file_info(path)["size"]
+    plan = params.get_query_plan()
+    snp_chunks = read_file_chunks(params, path, processor, rows)
+    while True:
+        started = time.time()
+        select_seconds = plan.select_seconds
+        snp_chunk = next(snp_chunks, None)
+        parsed = time.time()
+        # The time the plan spent selecting rows as the block was parsed is filtering
+        selected_seconds = plan.select_seconds - select_seconds
+        metrics.parse_seconds += parsed - started - selected_seconds
+        metrics.filter_seconds += selected_seconds
+        if snp_chunk == None:
+            break
+        selected = snp_chunk
+        if not plan_applied:
+            selected = snp_chunk.select(params.process_chunk(snp_chunk))
+        metrics.filter_seconds += time.time() - parsed
+        if metrics.source != "text":
+            # Cached columns are memory-mapped, so only the rows selected from them are read
+            metrics.bytes_read += sum(column.nbytes for column in [snp_chunk.get_rsids(), snp_chunk.get_chromosome_codes(),
+                                                                   snp_chunk.get_positions(), snp_chunk.get_genotype_codes()])
+        yield selected
+
+# Yield a (label, filename, snp_chunk) tuple for each block of each selected file, where
+# snp_chunk holds the rows that pass the selections in params
+def iter_snp_chunks(params):
+    selected_files = select_files(params)[0]
+    indexed_rows = find_indexed_rows(params, selected_files) or {}
+    for filename, label in selected_files:
+        for snp_chunk in iter_file_chunks(params, filename, indexed_rows.get(filename)):
+            yield (label, filename, snp_chunk)
+
+# Yield a (file group label, filename, rsid, chromosome, position, genotype) tuple for each line 
+# of the selected files that passes the selections in params.  Files are read lazily a block at 
+# a time, so memory use doesn't grow with the number of lines.
+def iter_snps(params):
+    for label, filename, snp_chunk in iter_snp_chunks(params):
+        for rsid, chromosome, position, genotype in snp_chunk.get_rows():
+            yield (label, filename, rsid, chromosome, position, genotype)
+
+# Return True if parse_snps should keep its results in the cache directory and only parse files
+# that are new or have changed since the last run (see snp_manifest)
+def is_incremental(params):
+    return params.get_incremental() and params.get_cache_directory() != None
+
+# Parse one SNP file, adding the rows that pass the selections in params to results_set under
+# the group label.  If show_progress is passed, it is called with the lines read and processed so
+# far after each block of lines.  Returns a tuple of (lines read, lines processed, valid) where
+# valid is False if the file has a line that can't be parsed or has no processor.  rows is passed
+# to iter_file_chunks.  In incremental runs the rows added are saved with the stored results.
+# If a FileMetrics is passed, what was read and the time spent in each stage are added to it.
+def parse_file(params, filename, label, results_set, show_progress = None, rows = None, metrics = None):
+    lines_processed = lines_read = 0
+    valid = AbstractSNPProcessor.get_processor(filename) != None
+    snp_chunks = []
+    for snp_chunk in iter_file_chunks(params, filename, rows, metrics):
+        lines_read += snp_chunk.get_lines_read()
+        lines_processed += len(snp_chunk)
+        valid = snp_chunk.is_valid()
+        if metrics != None and not valid:
+            metrics.reason = snp_chunk.get_reason()
+
+        # Add to the results
+        started = time.time()
+        results_set.add_chunk(label, snp_chunk)
+        if metrics != None:
+            metrics.aggregate_seconds += time.time() - started
+            metrics.add_lines(snp_chunk.get_lines_read(), len(snp_chunk))
+        if is_incremental(params):
+            snp_chunks.append(snp_chunk)
+        if show_progress:
+            show_progress(lines_read, lines_processed)
+    if is_incremental(params):
+        SnpManifest(params.get_cache_directory()).save_file_rows(params, filename, snp_chunks)
+    if metrics != None:
+        metrics.valid = valid
+        metrics.sample_memory()
+    return (lines_read, lines_processed, valid)
+
+# Create a FileMetrics for a file about to be parsed
+def new_file_metrics(filename, label):
+    processor = AbstractSNPProcessor.get_processor(filename)
+    return FileMetrics(filename, label, processor.get_file_type_label() if processor != None else None)
+
+# Parse one SNP file in a process pool worker when params has more than one worker.  The single
+# argument is a tuple of (params, filename, label, rows) so it can be used with
+# Pool.imap_unordered.  Returns a tuple of (filename, SnpChunk of the rows selected, parse_file
+# result, FileMetrics, profile statistics).  The rows are counted by the parent process, as they
+# are much quicker to send back than counts.  The statistics are None unless params has a
+# profile directory (see snp_profile).
+def parse_file_worker(args):
+    params, filename, label, rows = args
+    chunk_results_set = ChunkResultsSet()
+    metrics = new_file_metrics(filename, label)
+    stats = None
+    if params.get_profile_directory() != None:
+        result, stats = run_profiled(parse_file, params, filename, label, chunk_results_set, rows = rows, metrics = metrics)
+    else:
+        result = parse_file(params, filename, label, chunk_results_set, rows = rows, metrics = metrics)
+    return (filename, chunk_results_set.get_snp_chunk(), result, metrics, stats)
+
 # Main processing method.  The one parameter, "parms" is an instance of the Params class.
 # The returned value is a ResultsSet instance
 def parse_snps(params):
+    return parse_snps_with_metrics(params)[0]
+
+# Parse the selected files as parse_snps does, recording what was done in each file and stage.
+# Returns a tuple of (ResultsSet, RunMetrics).  If params has a profile directory, the run is
+# profiled and the profiles are written there (see snp_profile).
+def parse_snps_with_metrics(params):
     print "Processing files"
     files = 0
     process = psutil.Process(os.getpid())
-    directory_files = os.listdir(params.get_directory_location())
-    dir_count = 0
+    metrics = RunMetrics()
+    profiler = None
+    if params.get_profile_directory() != None:
+        profiler = PipelineProfiler(params.get_profile_directory())
+        profiler.start()
+    selected_files, skipped_files = select_files(params)
+    for filename in skipped_files:
+        metrics.add_skipped(filename, bypassed_reason)
+    dir_count = len(selected_files)
     fileTypeCounts = {}
-    skipped_files = []
-    
+
     # Count number of files to process for progress reporting
-    for filename in directory_files:
-        if (bypass(filename)):
-            continue
-        if (params.get_file_group_label(filename) != None):
-            if params.get_show_selected_files(): 
-                print "Selected:", filename
-            dir_count += 1
-            processor = AbstractSNPProcessor.get_processor(filename);
-            if (processor):
-                counter_name = processor.get_file_type_label()
-                increment_dictionary_counter( fileTypeCounts, counter_name )
-                    
+    for filename, label in selected_files:
+        if params.get_show_selected_files():
+            print "Selected:", filename
+        processor = AbstractSNPProcessor.get_processor(filename);
+        if (processor):
+            counter_name = processor.get_file_type_label()
+            increment_dictionary_counter( fileTypeCounts, counter_name )
+
     # Summarize counts by file type
     print
     for count in fileTypeCounts.iteritems():
         print count[0], ":", count[1]
     print
-            
-    # Process each selected file.  Returns a ResultsSet instance
-    results_set = ResultsSet()
-    for filename in directory_files:
-        label = params.get_file_group_label(filename)
-        if (label != None):
-            if (bypass(filename)):
+
+    # Show progress by file
+    def show_file_progress():
+        if params.get_show_file_progress() and params.get_show_lines_progress_interval() <= 0:
+            elapsed = get_elapsed();
+            print "files: %d/%d  elapsed: %d minutes, %d seconds, memory: %d%%          \r" % (files, dir_count, elapsed[0], elapsed[1], process.memory_percent()),
+            sys.stdout.flush()
+
+    # Show progress by lines within a file
+    interval = params.get_show_lines_progress_interval()
+    progress = {"lines_read": 0}
+    def show_lines_progress(lines_read, lines_processed):
+        if interval > 0 and lines_read // interval != progress["lines_read"] // interval:
+            elapsed = get_elapsed();
+            print "file: {:,d}/{:,d}  lines read: {:,d}  processed {:,d}  elapsed: {:,d} minutes, {:,d} seconds, memory: {:d}%        \r".format(files, dir_count, lines_read, lines_processed, int(elapsed[0]), int(elapsed[1]), int(process.memory_percent())),
+            sys.stdout.flush()
+        progress["lines_read"] = lines_read
+
+    # Start from the results stored by the last incremental run with the same selections, taking
+    # away files that have been removed or changed since, so only new and changed files are parsed
+    results_set = new_results_set(params)
+    files_to_parse = selected_files
+    if is_incremental(params):
+        manifest = SnpManifest(params.get_cache_directory())
+        manifest.update(params.get_directory_location(), [filename for filename, label in selected_files])
+        results_set, counted_files = manifest.load_results(params)
+        files_to_parse = manifest.remove_stale_files(params, results_set, counted_files, selected_files)
+        for filename, counted in sorted(counted_files.items()):
+            if not counted["valid"]:
                 skipped_files.append(filename)
-                continue
-            with open(os.path.join(params.get_directory_location(), filename)) as f:
+                metrics.add_skipped(filename, invalid_reason)
+        print "Unchanged files:", len(counted_files), " files to parse:", len(files_to_parse)
+        print
+
+    # Report the outcome of parsing a file
+    def file_parsed(filename, label, lines_read, lines_processed, valid):
+        if is_incremental(params):
+            counted_files[filename] = {"hash": manifest.get_entry(filename)["hash"], "label": label,
+                                       "lines_read": lines_read, "lines_processed": lines_processed, "valid": valid}
+        if not valid:
+            skipped_files.append(filename)
+        if (params.get_show_selected_files() and lines_processed == 0):
+            print "    No lines to process in ", filename
+
+    # Single rsid queries only read the indexed rows of files covered by an rsid index
+    indexed_rows = find_indexed_rows(params, selected_files) or {}
+
+    # Process each selected file.  Returns a ResultsSet instance
+    if params.get_workers() > 1:
+        # Parse files in a process pool.  The rows selected from each file are counted in arrays
+        # as they come back and added to the results once every file is parsed.
+        file_counts = new_file_counts(results_set)
+        pool = multiprocessing.Pool(params.get_workers())
+        try:
+            tasks = [(params, filename, label, indexed_rows.get(filename)) for filename, label in files_to_parse]
+            for filename, snp_chunk, (lines_read, lines_processed, valid), file_metrics, stats in pool.imap_unordered(parse_file_worker, tasks):
                 files += 1
-                if params.get_show_file_progress() and params.get_show_lines_progress_interval() <= 0:
-                    elapsed = snp_utils.get_elapsed();
-                    print "files: %d/%d  elapsed: %d minutes, %d seconds, memory: %d\%          \r" % (files, dir_count, elapsed[0], elapsed[1], process.get_memory_percent()),
-                    sys.stdout.flush()
-                lines_processed = lines_read = 0
-                line = f.readline()
-                exit_file = False
-                while (line != "" and not exit_file):
-                    lines_read += 1
-                    snp_values = None
-                    if not line.startswith( "#" ):
-                        snp_values = AbstractSNPProcessor.get_processor(filename).parse_line(line)
-                        if ( snp_values == None ) or ( len(snp_values.get_rsid()) > 20 ):
-                            skipped_files.append(filename)
-                            exit_file = True
-                            
-                        if not exit_file:
-                            
-                            if ( params.process( snp_values )):
-                                lines_processed += 1
-                                
-                                # Add to the results
-                                result = results_set.get_or_create_result(snp_values.get_rsid(), snp_values.get_chromosome(), snp_values.get_position())
-                                result.add_one(label, snp_values.get_genotype())
-                            
-                    if params.get_show_lines_progress_interval() > 0 and lines_read % params.get_show_lines_progress_interval() == 0:
-                        elapsed = get_elapsed();
-                        print "file: {:,d}/{:,d}  lines read: {:,d}  processed {:,d}  elapsed: {:,d} minutes, {:,d} seconds, memory: {:d}%        \r".format(files, dir_count, lines_read, lines_processed, int(elapsed[0]), int(elapsed[1]), int(process.get_memory_percent())), 
-                        sys.stdout.flush()
-                    line = f.readline()
-                if (params.get_show_selected_files() and lines_processed == 0):
-                    print "    No lines to process in ", filename
+                if stats != None:
+                    profiler.add_stats(file_metrics.file_type, stats)
+                show_file_progress()
+                started = time.time()
+                file_counts.add_chunk(file_metrics.label, snp_chunk)
+                file_metrics.aggregate_seconds += time.time() - started
+                metrics.add_file(file_metrics)
+                file_parsed(filename, file_metrics.label, lines_read, lines_processed, valid)
+        finally:
+            pool.close()
+            pool.join()
+        add_file_counts(results_set, file_counts)
+    else:
+        for filename, label in files_to_parse:
+            files += 1
+            show_file_progress()
+            progress["lines_read"] = 0
+            file_metrics = new_file_metrics(filename, label)
+            parse_args = (params, filename, label, results_set, show_lines_progress, indexed_rows.get(filename), file_metrics)
+            if profiler != None:
+                lines_read, lines_processed, valid = profiler.profile_call(file_metrics.file_type, parse_file, *parse_args)
+            else:
+                lines_read, lines_processed, valid = parse_file(*parse_args)
+            metrics.add_file(file_metrics)
+            file_parsed(filename, label, lines_read, lines_processed, valid)
+    if is_incremental(params):
+        manifest.save_results(params, results_set, counted_files)
     if(len(skipped_files) > 0):
-        print 
+        print
         print "Skipped Files"
+        skipped_reasons = metrics.get_skipped()
         for file in skipped_files:
-            print file
-    return results_set
-            
+            if skipped_reasons.get(file) != None:
+                print file, "-", skipped_reasons[file]
+            else:
+                print file
+    metrics.finish()
+    if profiler != None:
+        profiler.stop()
+        print "Profile summary written to " + profiler.write(metrics)
+    return (results_set, metrics)
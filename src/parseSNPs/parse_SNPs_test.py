@@ -0,0 +1,158 @@
+"""
+This program is designed to test the functions in parse_SNPs against a directory of small SNP files
+"""
+import sys
+import os
+import shutil
+import tempfile
+import StringIO
+from snp_classes import *
+from parse_SNPs import *
+import unittest
+
+# Sample files in each of the formats the processors handle
+sample_files = {
+    "user1_file1_yearofbirth_unknown_sex_unknown.23andme.txt" :
+        "# rsid\tchromosome\tposition\tgenotype\n"
+        "rs4477212\t1\t72017\tAA\n"
+        "rs3094315\t1\t742429\tAG\n"
+        "rs3131972\t2\t742584\tGG\n",
+    "user2_file2_yearofbirth_1986_sex_XX.ftdna-illumina.txt" :
+        "rs4477212\t1\t72017\tA\tA\n"
+        "rs3094315\t1\t742429\tG\tG\n",
+    "user3_file3_yearofbirth_1966_sex_unknown.illumina.txt" :
+        '"rs4477212","1","72017","AG"\n'
+        '"rs3131972","2","742584","GG"\n',
+    "user4_file4_yearofbirth_1956_sex_XY.decodeme.txt" :
+        "rs4477212,A/G,1,72017,+,AA\n"
+        "not,a,valid,line,for,decodeme\n"
+        "rs3094315,C/T,1,742429,-,CT\n",
+    "user5_file5_yearofbirth_unknown_sex_unknown.IYG.txt" :
+        "rs2131925\tTT\n",
+    "user6_file6-exome-yearofbirth_unknown_sex_unknown.23andme.txt" :
+        "rs4477212\t1\t72017\tTT\n",
+}
+
+####################################################################################
+#
+# Base class for tests that need a directory of SNP files
+#
+####################################################################################
+class SnpDirectory_test(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        for filename, contents in sample_files.iteritems():
+            with open(os.path.join(self.dir, filename), "w") as f:
+                f.write(contents)
+        self.params = Params()
+        self.params.set_directory_location(self.dir)
+        self.stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()  # parse_snps reports progress to the console
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+        shutil.rmtree(self.dir)
+
+    # Get the counts in a ResultsSet as {(rsid, chromosome, position): {label: {genotype: count}}}
+    def get_counts(self, results_set):
+        counts = {}
+        for result in results_set.get_results_iterator():
+            counts[result.get_key()] = dict((label, dict(group.get_counts())) for label, group in result.get_groups().items())
+        return counts
+
+####################################################################################
+#
+# Test parse_snps
+#
+####################################################################################
+class parse_snps_test(SnpDirectory_test):
+
+    def test_parse_snps(self):
+        counts = self.get_counts(parse_snps(self.params))
+        self.assertEqual({"Default": {"AA": 3, "AG": 1}}, counts[("RS4477212", "1", 72017)])
+        self.assertEqual({"Default": {"AG": 1, "GG": 1}}, counts[("RS3094315", "1", 742429)])
+        self.assertEqual({"Default": {"GG": 2}}, counts[("RS3131972", "2", 742584)])
+        self.assertEqual({"Default": {"TT": 1}}, counts[("RS2131925", "", 0)])
+        self.assertEqual(4, len(counts))
+
+    def test_file_groups(self):
+        group1 = FileGroup("Group 1", 1)
+        group1.add_file_selector("user1_*.txt")
+        group2 = FileGroup("Group 2", 2)
+        group2.add_file_selector("*illumina.txt")
+        self.params.add_file_group(group1)
+        self.params.add_file_group(group2)
+        self.params.add_chromosome("1")
+        counts = self.get_counts(parse_snps(self.params))
+        self.assertEqual({"Group 1": {"AA": 1}, "Group 2": {"AA": 1, "AG": 1}}, counts[("RS4477212", "1", 72017)])
+        self.assertEqual({"Group 1": {"AG": 1}, "Group 2": {"GG": 1}}, counts[("RS3094315", "1", 742429)])
+        self.assertEqual(2, len(counts))
+
+    def test_workers(self):
+        expected = self.get_counts(parse_snps(self.params))
+        self.params.set_workers(2)
+        self.assertEqual(expected, self.get_counts(parse_snps(self.params)))
+
+####################################################################################
+#
+# Test parse_snps with chromosomes and genotypes the code tables don't start with
+#
+####################################################################################
+class unknown_names_test(SnpDirectory_test):
+
+    def setUp(self):
+        SnpDirectory_test.setUp(self)
+        # The last file falls back to parsing line by line at its bad line
+        for filename, contents in [("user7_file7_yearofbirth_unknown_sex_unknown.23andme.txt", "rs7\t0\t700\tNN\nrs9\tx\t900\tag\n"),
+                                   ("user8_file8_yearofbirth_unknown_sex_unknown.23andme.txt", "rs7\t0\t700\t00\n"),
+                                   ("user9_file9_yearofbirth_unknown_sex_unknown.23andme.txt", "rs9\tx\t900\tAG\nbad line\n")]:
+            with open(os.path.join(self.dir, filename), "w") as f:
+                f.write(contents)
+
+    # Get the counts of the SNPs of the files added in setUp
+    def get_added_counts(self):
+        counts = self.get_counts(parse_snps(self.params))
+        return dict((key, value) for key, value in counts.items() if key[0] in ("RS7", "RS9"))
+
+    def test_names_kept(self):
+        # Each spelling is counted under the name in the file
+        expected = {("RS7", "0", 700): {"Default": {"NN": 1, "00": 1}}, ("RS9", "x", 900): {"Default": {"AG": 2}}}
+        self.assertEqual(expected, self.get_added_counts())
+        self.params.set_results_backend("ARRAY")
+        self.assertEqual(expected, self.get_added_counts())
+        self.params.set_workers(2)
+        self.assertEqual(expected, self.get_added_counts())
+        self.params.set_cache_directory(os.path.join(self.dir, "cache"))
+        parse_snps(self.params)
+        self.assertEqual(expected, self.get_added_counts())
+
+    def test_chromosomes(self):
+        for chromosome, rsids in [("", ["RS2131925"]), ("0", ["RS7"]), ("x", ["RS9"]), ("X", [])]:
+            params = Params()
+            params.set_directory_location(self.dir)
+            params.add_chromosome(chromosome)
+            self.assertEqual(rsids, sorted(rsid for rsid, chromosome, position in self.get_counts(parse_snps(params))))
+
+####################################################################################
+#
+# Test iter_snps
+#
+####################################################################################
+class iter_snps_test(SnpDirectory_test):
+
+    def test_iter_snps(self):
+        self.params.set_rsid("rs3094315")
+        rows = sorted(iter_snps(self.params))
+        self.assertEqual([("Default", "user1_file1_yearofbirth_unknown_sex_unknown.23andme.txt", "RS3094315", "1", 742429, "AG"),
+                          ("Default", "user2_file2_yearofbirth_1986_sex_XX.ftdna-illumina.txt", "RS3094315", "1", 742429, "GG")],
+                         rows)
+
+    def test_matches_parse_snps(self):
+        results_set = ResultsSet()
+        for label, filename, rsid, chromosome, position, genotype in iter_snps(self.params):
+            results_set.get_or_create_result(rsid, chromosome, position).add_one(label, genotype)
+        self.assertEqual(self.get_counts(parse_snps(self.params)), self.get_counts(results_set))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,11 +5,23 @@ program.  The results are output to the console.  The heavy lifting is done by p
 
 Parameters are stored in a text file.  See parsefiles.txt for an example.
 
+Several queries can be answered in one pass over the files (see snp_batch) by passing more than one
+parameter file, or a file with a QUERY line starting each query:
+    python parse_files.py tongue_rolling.txt eye_colour.txt earwax.txt
+
 Author: David Gray
 """
 from snp_classes import *
 from snp_utils import *
-from parse_SNPs import parse_snps
+from parse_SNPs import parse_snps_with_metrics
+from snp_batch import parse_batch
+from snp_matrix import open_matrix
+from snp_results import results_backends
+from snp_association import AssociationTable
+from snp_summary import SummaryTable, select_rows
+from snp_writers import output_formats, write_results
+from snp_filters import RsidList, RegionList
+from phenotype_store import PhenotypeStore
 from datetime import datetime
 
 """
@@ -23,17 +35,68 @@ def rsid_key_seq( item ):
     else:
         return int(item[1:])
 """        
-if __name__=="__main__":
-    params = Params()
-    filename = sys.argv[1]
+# Read a parameter file (see parse_files.txt) into a Params instance
+def read_params(filename):
     f=file(filename,"r")
-    for line in f:
+    lines = f.readlines()
+    f.close()
+    return read_params_lines(lines)
+
+# Split the lines of a parameter file into queries for batch mode.  A line "QUERY(tab)[name]" starts
+# a query; the lines before the first QUERY line are shared by every query.  Returns a list of
+# (name, lines) tuples.  A file with no QUERY lines is one query named default_name.
+def split_queries(lines, default_name):
+    shared_lines = []
+    queries = []
+    for line in lines:
+        values = line.strip().split("\t")
+        if line[0:1] != "#" and values[0].strip().upper() == "QUERY":
+            queries.append((values[1].strip() if len(values) > 1 else str(len(queries) + 1), []))
+        elif len(queries) > 0:
+            queries[-1][1].append(line)
+        else:
+            shared_lines.append(line)
+    if len(queries) == 0:
+        return [(default_name, shared_lines)]
+    return [(name, shared_lines + query_lines) for name, query_lines in queries]
+
+# Read the queries of one or more parameter files for batch mode (see split_queries).  Returns a
+# list of (name, Params) tuples.  Queries are named after their file, and their QUERY line if the
+# file has more than one.
+def read_batch_params(filenames):
+    queries = []
+    for filename in filenames:
+        f=file(filename,"r")
+        lines = f.readlines()
+        f.close()
+        file_queries = split_queries(lines, filename)
+        for name, query_lines in file_queries:
+            if len(file_queries) > 1:
+                name = filename + ":" + name
+            queries.append((name, read_params_lines(query_lines)))
+    return queries
+
+# Read the lines of a parameter file into a Params instance
+def read_params_lines(lines):
+    params = Params()
+    phenotypes_path = "phenotypes_plain.json"
+    phenotype = None
+    cohort_groups = []
+    for line in lines:
         if line[0:1] != "#": # Skip comment lines
             values = line.strip().split("\t")
             if (len(values) > 1 and values[0].strip()): # Must have a non-blank name and a value
                 name = values[0].strip()
                 val = values[1].strip()
-                if (name.startswith("FILES")):
+                if (name.startswith("COHORT")):
+                    # A COHORT line selects the files of the users that gave some values for PHENOTYPE:
+                    #   COHORT:Rollers:1    tongue roller, roller, yes
+                    label_and_priority = name.split(":")
+                    if len(label_and_priority) != 3:
+                        sys.exit("When specifying cohort groups, the line must begin with COHORT:[label]:[priority seq].  The value '"
+                                 + name + "' is not in this format")
+                    cohort_groups.append((label_and_priority[1], int(label_and_priority[2]), val.split(",")))
+                elif (name.startswith("FILES")):
                     # The "FILES" line int the parameter file will look like this:
                     #   FILES:Group 1:1    user10_*.txt, user11_*.txt, user13_*.txt, user14_*.txt
                     # The line is in two sections, separated by a tab.
@@ -55,8 +118,39 @@ if __name__=="__main__":
                     name = name.upper()
                     if(name == "DIR"):
                         params.set_directory_location(val)
+                    elif( name == "CACHEDIR"):
+                        params.set_cache_directory(val)
+                    elif( name == "MATRIXDIR"):
+                        params.set_matrix_directory(val)
+                    elif( name == "BACKEND"):
+                        if val.upper() not in results_backends:
+                            sys.exit("BACKEND must be one of " + ", ".join(results_backends) + ".  The value '" + val +
+                                     "' is not one of these")
+                        params.set_results_backend(val)
+                    elif( name == "HARMONIZE"):
+                        # True can be represented by "TRUE", "T", "1", "YES" or "Y" in any case.
+                        params.set_harmonize(string_to_bool(val))
+                    elif( name == "INCREMENTAL"):
+                        # True can be represented by "TRUE", "T", "1", "YES" or "Y" in any case.
+                        params.set_incremental(string_to_bool(val))
                     elif( name == "RSID"):
                         params.set_rsid(val)
+                    elif( name == "RSIDFILE"):
+                        if not os.path.exists(val):
+                            sys.exit("RSIDFILE must name a file of RSIDs.  '" + val + "' doesn't exist")
+                        params.set_rsid_list(RsidList.read(val))
+                    elif( name == "REGIONFILE"):
+                        if not os.path.exists(val):
+                            sys.exit("REGIONFILE must name a BED file of regions.  '" + val + "' doesn't exist")
+                        try:
+                            region_list = RegionList.read(val)
+                        except ValueError as error:
+                            sys.exit("REGIONFILE " + str(error))
+                        if region_list.get_skipped_count() > 0:
+                            contigs = sorted(region_list.get_skipped_contigs().keys())
+                            print "REGIONFILE " + val + ": skipped " + str(region_list.get_skipped_count()) + \
+                                  " regions on contigs that aren't chromosomes, such as " + ", ".join(contigs[:3])
+                        params.set_region_list(region_list)
                     elif( name == "CHROMOSOMES"):
                         if ( len( val ) > 0 ):
                             for chromosome in map(strip, val.split(",")):
@@ -73,17 +167,115 @@ if __name__=="__main__":
                     elif( name == "SHOWSELECTEDFILES"):
                         # True can be represented by "TRUE", "T", "1", "YES" or "Y" in any case.    
                         params.set_show_selected_files(string_to_bool(val))
-    f.close()
-    results_set = parse_snps(params)
+                    elif( name == "WORKERS"):
+                        params.set_workers(int(val))
+                    elif( name == "PROFILE"):
+                        params.set_profile_directory(val)
+                    elif( name == "METRICS"):
+                        params.set_metrics_path(val)
+                    elif( name == "OUTPUT"):
+                        params.set_output_path(val)
+                    elif( name == "FORMAT"):
+                        if val.upper() not in output_formats:
+                            sys.exit("FORMAT must be one of " + ", ".join(output_formats) + ".  The value '" + val +
+                                     "' is not one of these")
+                        params.set_output_format(val)
+                    elif( name == "SORT"):
+                        params.set_sort_output(string_to_bool(val))
+                    elif( name == "PHENOTYPES"):
+                        phenotypes_path = val
+                    elif( name == "PHENOTYPE"):
+                        phenotype = val
+                    elif( name == "ASSOCIATION"):
+                        for label in val.split(","):
+                            params.add_association_label(label)
+                    elif( name == "SUMMARY"):
+                        # True can be represented by "TRUE", "T", "1", "YES" or "Y" in any case.
+                        params.set_show_summary(string_to_bool(val))
+                    elif( name == "MINMAF"):
+                        params.set_min_maf(float(val))
+                    elif( name == "MINCALLRATE"):
+                        params.set_min_call_rate(float(val))
+                    elif( name == "MINHWEP"):
+                        params.set_min_hwe_p(float(val))
+    if len(cohort_groups) > 0:
+        # Build the cohort's file groups from the phenotype index (see phenotype_store)
+        if not os.path.exists(phenotypes_path):
+            sys.exit("COHORT groups need PHENOTYPES to name a phenotypes file written by pparser.py.  '" + phenotypes_path + "' doesn't exist")
+        store = PhenotypeStore.load(phenotypes_path)
+        if phenotype == None or store.get_phenotype_id(phenotype) == None:
+            sys.exit("COHORT groups need PHENOTYPE to be a phenotype id or name in " + phenotypes_path)
+        for label, priority_seq, values in cohort_groups:
+            params.add_file_group(store.get_file_group(phenotype, label, priority_seq, values))
+    if params.get_output_format() == "BINARY" and params.get_output_path() == None:
+        sys.exit("FORMAT BINARY needs an OUTPUT file to write to")
+    if len(params.get_association_labels()) == 1:
+        sys.exit("ASSOCIATION must list at least two file group labels to compare")
+    return params
+
+# Write the metrics of a run to the file named in params, if it names one
+def write_metrics(params, metrics):
+    if params.get_metrics_path() != None:
+        metrics.write_json(params.get_metrics_path())
+        print "Metrics written to " + params.get_metrics_path()
+
+# Report the results of a query as params asks: a summary or association table, or the counts
+def report_results(params, results_set):
+    if params.get_harmonize():
+        results_set.harmonize()
 
     print "\n"
     print str(params)
     print "\n" 
     if (len(results_set) > 0):
     #    for entry in sorted(results.items(), key=lambda t: rsid_key_seq(t[0])):
-        results_set.print_contents()
+        if len(params.get_association_labels()) > 0 or params.get_show_summary() or params.has_quality_filters():
+            labels = params.get_association_labels() or params.get_file_group_labels()
+            genotype_counts = results_set.get_genotype_counts(labels)
+            summary = SummaryTable(labels, *genotype_counts)
+            passing = summary.get_passing(params.get_min_maf(), params.get_min_call_rate(), params.get_min_hwe_p())
+            if len(params.get_association_labels()) > 0:
+                # Rank the SNPs that pass quality control by how strongly they differ between the groups
+                AssociationTable(labels, *select_rows(genotype_counts, passing)).print_contents()
+            else:
+                summary.print_contents(passing)
+        else:
+            write_results(results_set, params)
+            if params.get_output_path() != None:
+                print "Results written to " + params.get_output_path()
     else:
         print "Nothing matched selections"
+
+if __name__=="__main__":
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python parse_files.py [parameter file] [more parameter files for batch mode]")
+    # Several parameter files, or one with QUERY sections, are answered together in batch mode
+    queries = read_batch_params(sys.argv[1:])
+    if len(queries) == 1:
+        params = queries[0][1]
+        matrix = open_matrix(params)
+        if matrix != None:
+            # Answer the query from the genotype matrix built by snp_matrix.py
+            results_set = matrix.get_results_set(params)
+        else:
+            results_set, metrics = parse_snps_with_metrics(params)
+            write_metrics(params, metrics)
+        report_results(params, results_set)
+    else:
+        # Queries with a genotype matrix are answered from it; the rest share one pass over the files
+        matrices = [open_matrix(params) for name, params in queries]
+        results_sets = [matrix.get_results_set(params) if matrix != None else None
+                        for matrix, (name, params) in zip(matrices, queries)]
+        scanned = [index for index, (name, params) in enumerate(queries) if results_sets[index] is None]
+        if len(scanned) > 0:
+            batch_results_sets, metrics = parse_batch([queries[index][1] for index in scanned])
+            for index, results_set in zip(scanned, batch_results_sets):
+                results_sets[index] = results_set
+                write_metrics(queries[index][1], metrics)
+        for (name, params), results_set in zip(queries, results_sets):
+            print
+            print "Query", name
+            report_results(params, results_set)
     
     elapsed = elapsed = get_elapsed();
     print
@@ -0,0 +1,148 @@
+"""
+This module indexes the OpenSNP phenotypes written by pparser so groups of users can be chosen by
+the values they gave for a phenotype without scanning the phenotypes file for each query.
+
+PhenotypeStore maps each phenotype id and name to the normalized values given for it, and each
+value to the set of users that gave it.  Names and values are normalized by stripping spaces and
+ignoring case, so "Tongue roller" and " tongue ROLLER" are the same.  The index is kept in a
+pickle file beside the phenotypes file and rebuilt when the phenotypes file changes.
+
+A cohort is a list of (label, values) pairs for one phenotype.  get_file_groups turns a cohort
+into FileGroups that select the SNP files of the users in each group, for parse_snps.
+"""
+
+import os
+import sys
+import json
+import cPickle
+from snp_classes import FileGroup
+
+# Normalize a phenotype name or value for comparison.  Strings of bytes are read as UTF-8, as
+# the phenotypes file is.
+def normalize(value):
+    if isinstance(value, str):
+        value = value.decode("utf-8", "replace")
+    return value.strip().lower()
+
+####################################################################################
+#
+# Class holding the phenotype index
+#
+####################################################################################
+class PhenotypeStore:
+    # Version of the index file.  Index files with a different version are rebuilt.
+    version = 1
+
+    # Constructor.  names is a dictionary of {phenotype id: name} and values is a dictionary of
+    # {phenotype id: {normalized value: set of user ids}}.
+    def __init__(self, names, values):
+        self.names = names
+        self.values = values
+        self.ids = dict((normalize(name), phenotype_id) for phenotype_id, name in sorted(names.items(), reverse=True))
+
+    # Build the index from a phenotypes file written by pparser (phenotypes_plain.json)
+    @staticmethod
+    def build(json_path):
+        with open(json_path) as f:
+            phenotypes = json.load(f)
+        names = {}
+        values = {}
+        for phenotype in phenotypes:
+            phenotype_id = phenotype["phenotype_id"]
+            names[phenotype_id] = phenotype["phenotype"]
+            users = values[phenotype_id] = {}
+            for entry in phenotype["data"]:
+                users.setdefault(normalize(entry["value"]), set()).add(entry["user_id"].encode("utf-8"))
+        return PhenotypeStore(names, values)
+
+    # Get the path of the index file for a phenotypes file
+    @staticmethod
+    def get_index_path(json_path):
+        return os.path.splitext(json_path)[0] + ".index.pkl"
+
+    # Get the index for a phenotypes file, reading the index file if it is up to date and building
+    # and saving it otherwise
+    @staticmethod
+    def load(json_path, index_path = None):
+        if index_path == None:
+            index_path = PhenotypeStore.get_index_path(json_path)
+        stat = os.stat(json_path)
+        source = [PhenotypeStore.version, stat.st_size, stat.st_mtime]
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as f:
+                index = cPickle.load(f)
+            if index["source"] == source:
+                return PhenotypeStore(index["names"], index["values"])
+        store = PhenotypeStore.build(json_path)
+        with open(index_path, "wb") as f:
+            cPickle.dump({"source": source, "names": store.names, "values": store.values}, f, cPickle.HIGHEST_PROTOCOL)
+        return store
+
+    # Get the number of phenotypes
+    def __len__(self):
+        return len(self.names)
+
+    # Convert the contents to a string
+    def __str__(self):
+        return "( PhenotypeStore: " + str(len(self)) + " phenotypes )"
+
+    # Get the id of a phenotype given its id, or its name in any case.  Returns None if there is
+    # no such phenotype.
+    def get_phenotype_id(self, phenotype):
+        if isinstance(phenotype, (int, long)) or phenotype.strip().isdigit():
+            phenotype_id = int(phenotype)
+            return phenotype_id if phenotype_id in self.names else None
+        return self.ids.get(normalize(phenotype))
+
+    # Get the name of a phenotype given its id or name
+    def get_name(self, phenotype):
+        return self.names[self.get_required_id(phenotype)]
+
+    # Get the id of a phenotype given its id or name.  Raises KeyError if there is no such phenotype.
+    def get_required_id(self, phenotype):
+        phenotype_id = self.get_phenotype_id(phenotype)
+        if phenotype_id == None:
+            raise KeyError("No such phenotype: " + str(phenotype))
+        return phenotype_id
+
+    # Get the normalized values given for a phenotype as a dictionary of {value: number of users}
+    def get_values(self, phenotype):
+        return dict((value, len(users)) for value, users in self.values[self.get_required_id(phenotype)].iteritems())
+
+    # Get the set of ids of the users that gave any of a list of values for a phenotype
+    def get_users(self, phenotype, values):
+        users_by_value = self.values[self.get_required_id(phenotype)]
+        users = set()
+        for value in values:
+            users.update(users_by_value.get(normalize(value), ()))
+        return users
+
+    # Get a FileGroup selecting the SNP files of the users that gave any of a list of values for a
+    # phenotype
+    def get_file_group(self, phenotype, label, priority_seq, values):
+        file_group = FileGroup(label, priority_seq)
+        for user_id in sorted(self.get_users(phenotype, values), key=lambda user_id: (len(user_id), user_id)):
+            file_group.add_file_selector("user" + user_id + "_*.txt")
+        return file_group
+
+    # Get a FileGroup for each (label, values) pair of a cohort, in priority sequence.  A user
+    # that gave values in more than one group is counted in the first.
+    def get_file_groups(self, phenotype, cohort):
+        return [self.get_file_group(phenotype, label, priority_seq, values)
+                for priority_seq, (label, values) in enumerate(cohort, 1)]
+
+    # Add the FileGroups for a cohort (see get_file_groups) to a Params instance
+    def add_file_groups(self, params, phenotype, cohort):
+        for file_group in self.get_file_groups(phenotype, cohort):
+            params.add_file_group(file_group)
+
+if __name__ == "__main__":
+    # List the phenotypes, or the values of one phenotype.  Usage:
+    #   python phenotype_store.py [phenotypes_plain.json] [phenotype id or name]
+    store = PhenotypeStore.load(sys.argv[1] if len(sys.argv) > 1 else "phenotypes_plain.json")
+    if len(sys.argv) > 2:
+        for value, count in sorted(store.get_values(sys.argv[2]).items(), key=lambda pair: -pair[1]):
+            print str(count) + "\t" + value.encode("utf-8")
+    else:
+        for phenotype_id, name in sorted(store.names.items()):
+            print str(phenotype_id) + "\t" + name.encode("utf-8")
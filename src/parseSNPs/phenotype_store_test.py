@@ -0,0 +1,83 @@
+"""
+This program is designed to test the functions in phenotype_store
+"""
+import sys
+import os
+import shutil
+import tempfile
+from pparser import convert_phenotypes
+from phenotype_store import *
+from snp_classes import Params
+import unittest
+
+# A phenotypes file with values in different cases and with spaces, and a user with no value
+sample_csv = ('user_id;Tongue roller;eye colour\n'
+              '10;Yes;Brown\n'
+              '2;tongue roller ;Blue\n'
+              '7;No;-\n'
+              '33;non-roller;Brown\n'
+              '5;-;Green\n'
+              '41;maybe;blue\n')
+
+####################################################################################
+#
+# Test the phenotype index and cohort FileGroups
+#
+####################################################################################
+class phenotype_store_test(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        csv_path = os.path.join(self.dir, "phenotypes.csv")
+        with open(csv_path, "wb") as f:
+            f.write(sample_csv)
+        convert_phenotypes(csv_path, self.dir)
+        self.json_path = os.path.join(self.dir, "phenotypes_plain.json")
+        self.store = PhenotypeStore.load(self.json_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_phenotype_ids(self):
+        self.assertEqual(3, len(self.store))
+        self.assertEqual(1, self.store.get_phenotype_id(1))
+        self.assertEqual(1, self.store.get_phenotype_id(" 1"))
+        self.assertEqual(1, self.store.get_phenotype_id("TONGUE Roller "))
+        self.assertEqual(None, self.store.get_phenotype_id("hair colour"))
+        self.assertEqual(None, self.store.get_phenotype_id(9))
+        self.assertEqual("eye colour", self.store.get_name("2"))
+        self.assertRaises(KeyError, self.store.get_name, "hair colour")
+
+    def test_values(self):
+        self.assertEqual({"yes": 1, "tongue roller": 1, "no": 1, "non-roller": 1, "maybe": 1}, self.store.get_values(1))
+        self.assertEqual({"brown": 2, "blue": 2, "green": 1}, self.store.get_values("eye colour"))
+        self.assertEqual(set(["10", "2"]), self.store.get_users(1, ["Tongue Roller", "yes", "roller"]))
+
+    def test_file_groups(self):
+        groups = self.store.get_file_groups("Tongue roller", [("Rollers", ["tongue roller", "roller", "yes"]),
+                                                              ("Non-Rollers", ["no", "non-roller"])])
+        self.assertEqual(["Rollers", "Non-Rollers"], [group.get_label() for group in groups])
+        self.assertEqual([1, 2], [group.get_priority_seq() for group in groups])
+        self.assertEqual(["user2_*.txt", "user10_*.txt"], groups[0].get_file_selectors())
+        self.assertEqual(["user7_*.txt", "user33_*.txt"], groups[1].get_file_selectors())
+        self.assertTrue(groups[0].matches("user10_file20_yearofbirth_unknown_sex_unknown.23andme.txt"))
+        self.assertFalse(groups[0].matches("user1_file9_yearofbirth_unknown_sex_unknown.23andme.txt"))
+        params = Params()
+        self.store.add_file_groups(params, 1, [("Brown", ["brown"])])
+        self.assertEqual(["Brown"], params.get_file_group_labels())
+
+    def test_index(self):
+        index_path = PhenotypeStore.get_index_path(self.json_path)
+        self.assertEqual(os.path.join(self.dir, "phenotypes_plain.index.pkl"), index_path)
+        self.assertTrue(os.path.exists(index_path))
+        cached = PhenotypeStore.load(self.json_path)
+        self.assertEqual((self.store.names, self.store.values), (cached.names, cached.values))
+        # A changed phenotypes file is indexed again
+        with open(self.json_path, "w") as f:
+            f.write('[{"phenotype": "zodiac", "phenotype_id": 0, "data": [{"user_id": "3", "value": "Leo"}]}]')
+        rebuilt = PhenotypeStore.load(self.json_path)
+        self.assertEqual({0: "zodiac"}, rebuilt.names)
+        self.assertEqual(set(["3"]), rebuilt.get_users("zodiac", ["leo"]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,13 @@
 import sys
+import os
 import json
 import re #regular expressions
 import csv
+from array import array
+from json.encoder import encode_basestring_ascii
 from string import maketrans
 
-def Rev(s): 
+def Rev(s):
     print(s[::-1].translate(maketrans('ACGT', 'TGCA')))
 
 def removeNonAscii(s): return "".join(i for i in s if ord(i)<128)
@@ -13,98 +16,150 @@ def removeNonAscii(s): return "".join(i for i in s if ord(i)<128)
 def cleanString(s): return "".join(i for i in s if ord(i)<128)
 
 
-if __name__ == "__main__":
-    print sys.argv
-
-#filename = sys.argv[1]
-
-
-#json data that will be written to file
-output = []
-i = 0
-
-#read CSV column by column, then row by row and create a JSON file from it, containing only phenotypes for which
-#a value was provided
-
-with open('phenotypes.csv', 'rb') as csvfile:
-        csvreader = csv.DictReader(csvfile,dialect='excel', delimiter=';', quotechar='"')
-        #phenotype is a column
-        for phenotype in csvreader.fieldnames:
-            
-            phenotypeDictionary = []
-            
-            for row in csvreader:
-
-                if(len(row[phenotype].replace("-",""))>0):
-                    dictionary = {'user_id': row["user_id"], 'value': row[phenotype]}
-                    phenotypeDictionary.append(dictionary)
-
-            
-            print "processing "+ str(i)+"/" +str(len(csvreader.fieldnames)) +" phenotype: "+ phenotype
-            output.append({"phenotype":phenotype,"phenotype_id":i,"data": phenotypeDictionary})
-            i = i+1
-            csvfile.seek(0) #reset the file, otherwise csvdata iterates over rows only once
-                
-
-        
-
-
-#create json without special formatting
-with open('phenotypes_plain.json', 'w') as outfile:
-  json.dump(output, outfile)
-  outfile.close()
-
-#create json with pretty print for readability
-with open('phenotypes_pretty.json', 'w') as outfile:
-    outfile.write(json.dumps(output, sort_keys=True, indent=4, separators=(',', ': ')))
-    outfile.close()
-
-print "Created henotypes_plain.json and phenotypes_pretty.json"
+# Format a value the way json.dumps(value, sort_keys=True, indent=4, separators=(',', ': ')) does,
+# starting at an indent of level.  json only uses its fast encoder when there is no indent, so the
+# dictionaries, lists, strings and integers the converter writes are formatted here.
+def pretty_json(value, level = 0):
+    if isinstance(value, basestring):
+        return encode_basestring_ascii(value)
+    if type(value) in (int, long):
+        return str(value)
+    if isinstance(value, (dict, list)) and len(value) > 0:
+        indent = ",\n" + "    " * (level + 1)
+        if isinstance(value, dict):
+            items = sorted(value.items(), key=lambda pair: pair[0])
+            text = indent.join(encode_basestring_ascii(key) + ": " + pretty_json(item, level + 1) for key, item in items)
+            return "{" + indent[1:] + text + "\n" + "    " * level + "}"
+        text = indent.join(pretty_json(item, level + 1) for item in value)
+        return "[" + indent[1:] + text + "\n" + "    " * level + "]"
+    return json.dumps(value)
+
+# Format a list of entries already formatted by pretty_json at level + 1, with their indent, as
+# pretty_json would format the list at level
+def pretty_list(entries, level):
+    if len(entries) == 0:
+        return "[]"
+    return "[\n" + ",\n".join(entries) + "\n" + "    " * level + "]"
+
+####################################################################################
+#
+# Writes a JSON list one entry at a time to a plain file and a pretty printed file.
+# The files hold the same text json.dump and the pretty printing json.dumps below
+# would write for the whole list, without the list having to be held in memory.
+#
+####################################################################################
+class JsonListWriter:
+    # Constructor.  Opens the plain and pretty printed files for writing.
+    def __init__(self, plain_path, pretty_path):
+        self.plain = open(plain_path, 'w')
+        self.pretty = open(pretty_path, 'w')
+        self.count = 0
+
+    # Write one entry of the list.  pretty can pass the entry already formatted by pretty_json at level 1.
+    def write(self, entry, pretty = None):
+        if self.count == 0:
+            self.plain.write("[")
+            self.pretty.write("[\n")
+        else:
+            self.plain.write(", ")
+            self.pretty.write(",\n")
+        self.plain.write(json.dumps(entry))
+        # Entries of the list are indented one level
+        self.pretty.write("    " + (pretty or pretty_json(entry, 1)))
+        self.count += 1
+
+    # Finish the list and close the files
+    def close(self):
+        if self.count == 0:
+            self.plain.write("[]")
+            self.pretty.write("[]")
+        else:
+            self.plain.write("]")
+            self.pretty.write("\n]")
+        self.plain.close()
+        self.pretty.close()
+
+# Convert an OpenSNP phenotypes CSV file to JSON, reading it once.  Writes:
+#   phenotypes_plain.json, phenotypes_pretty.json  an entry for each column with the users that gave a value
+#   users_plain.json, users_pretty.json            an entry for each user with the values they gave
+# to output_dir.  Values that are empty or only dashes are left out.  User entries are written as
+# each row is read; phenotype entries once every row has been read.  Returns a tuple of the
+# number of phenotypes and users written.
+def convert_phenotypes(csv_path = 'phenotypes.csv', output_dir = '.', show_progress = False):
+    users = JsonListWriter(os.path.join(output_dir, 'users_plain.json'), os.path.join(output_dir, 'users_pretty.json'))
+    with open(csv_path, 'rb') as csvfile:
+        csvreader = csv.reader(csvfile, dialect='excel', delimiter=';', quotechar='"')
+        fieldNamesList = next(csvreader, [])
+        # A name used for more than one column gets the value of the last, as with csv.DictReader
+        columns = dict((phenotype, i) for i, phenotype in enumerate(fieldNamesList))
+        phenotypeColumns = [columns[phenotype] for phenotype in fieldNamesList]
+        # The user number and value of each value given for each phenotype.  Values are interned
+        # since most are one of a few answers.
+        userIds = []
+        phenotypeUsers = [array('l') for phenotype in fieldNamesList]
+        phenotypeValues = [[] for phenotype in fieldNamesList]
+        # The pretty printed text of each user and value, and the text before and after the value
+        # of each phenotype in a user's data.  The keys of a user's data are written sorted.
+        userTexts = []
+        valueTexts = {}
+        dataTexts = []
+        for i, phenotype in enumerate(fieldNamesList):
+            nameText = "                " + encode_basestring_ascii(phenotype) + ": "
+            idText = "                \"phenotype_id\": " + str(i)
+            if phenotype < "phenotype_id":
+                dataTexts.append(("            {\n" + nameText, ",\n" + idText + "\n            }"))
+            elif phenotype > "phenotype_id":
+                dataTexts.append(("            {\n" + idText + ",\n" + nameText, "\n            }"))
+            else:
+                dataTexts.append(None) # The value is replaced by the phenotype_id
+        for row in csvreader:
+            if len(row) == 0:
+                continue # Blank lines aren't users
+            # Short rows are read as if padded with empty values
+            row += [''] * (len(fieldNamesList) - len(row))
+            user_id = row[columns["user_id"]]
+            userIds.append(user_id)
+            userTexts.append(encode_basestring_ascii(user_id))
+            userDictionary = []
+            userData = []
+            for i, phenotype in enumerate(fieldNamesList):
+                value = row[phenotypeColumns[i]]
+                if len(value.replace("-","")) > 0:
+                    value = intern(value)
+                    userDictionary.append({phenotype: value, "phenotype_id": i})
+                    phenotypeUsers[i].append(len(userIds) - 1)
+                    phenotypeValues[i].append(value)
+                    if value not in valueTexts:
+                        valueTexts[value] = encode_basestring_ascii(value)
+                    if dataTexts[i] == None:
+                        userData.append("            " + pretty_json(userDictionary[-1], 3))
+                    else:
+                        userData.append(dataTexts[i][0] + valueTexts[value] + dataTexts[i][1])
+            if show_progress:
+                print "processing user_id: " + user_id
+            users.write({"user_id": user_id, "data": userDictionary},
+                        "{\n        \"data\": " + pretty_list(userData, 2) + ",\n        \"user_id\": " + userTexts[-1] + "\n    }")
+    users.close()
+
+    phenotypes = JsonListWriter(os.path.join(output_dir, 'phenotypes_plain.json'), os.path.join(output_dir, 'phenotypes_pretty.json'))
+    for i, phenotype in enumerate(fieldNamesList):
+        if show_progress:
+            print "processing " + str(i) + "/" + str(len(fieldNamesList)) + " phenotype: " + phenotype
+        data = [{'user_id': userIds[user], 'value': value} for user, value in zip(phenotypeUsers[i], phenotypeValues[i])]
+        dataText = pretty_list(["            {\n                \"user_id\": " + userTexts[user] + ",\n                \"value\": " +
+                                valueTexts[value] + "\n            }" for user, value in zip(phenotypeUsers[i], phenotypeValues[i])], 2)
+        phenotypes.write({"phenotype": phenotype, "phenotype_id": i, "data": data},
+                         "{\n        \"data\": " + dataText + ",\n        \"phenotype\": " + encode_basestring_ascii(phenotype) +
+                         ",\n        \"phenotype_id\": " + str(i) + "\n    }")
+        phenotypeUsers[i] = phenotypeValues[i] = None
+    phenotypes.close()
+    return (len(fieldNamesList), len(userIds))
 
 
-#now create a json dictionary for each user
-
-output = []
-
-with open('phenotypes.csv', 'rb') as csvfile:
-            csvreader = csv.DictReader(csvfile,dialect='excel', delimiter=';', quotechar='"')
-            #phenotype is a column
-            
-            fieldNamesList = list(csvreader.fieldnames)
-            for row in csvreader:
-                userDictionary = []
-                i = 0
-
-                for phenotype in fieldNamesList:
-
-                    if len(row[phenotype].replace("-",""))>0:
-                        dictionary = {phenotype: row[phenotype],"phenotype_id":i}
-                        userDictionary.append(dictionary)
-                    i = i + 1
-                    
-                print "processing user_id: "+ row["user_id"]
-                output.append({"user_id":row["user_id"],"data": userDictionary})
- #           csvfile.seek(0) #reset the file, otherwise csvdata iterates over rows only once
-                
-
- #create json without special formatting
-with open('users_plain.json', 'w') as outfile:
-  json.dump(output, outfile)
-  outfile.close()
-
-#create json with pretty print for readability
-with open('users_pretty.json', 'w') as outfile:
-    outfile.write(json.dumps(output, sort_keys=True, indent=4, separators=(',', ': ')))
-    outfile.close()
-
-print "Created users_plain.json and users_pretty.json"
-
-
-#writes pretty printed json string to file
-#data = json.dumps({'4': 5, '6': 7}, sort_keys=True,indent=4, separators=(',', ': '))
-#with open('data.txt', 'w') as outfile:
-#  json.dump(data, outfile)
-
-
-
- 
+if __name__ == "__main__":
+    print sys.argv
+    # Usage: python pparser.py [phenotypes csv file] [output directory]
+    phenotype_count, user_count = convert_phenotypes(sys.argv[1] if len(sys.argv) > 1 else 'phenotypes.csv',
+                                                     sys.argv[2] if len(sys.argv) > 2 else '.', True)
+    print "Created phenotypes_plain.json and phenotypes_pretty.json with " + str(phenotype_count) + " phenotypes"
+    print "Created users_plain.json and users_pretty.json with " + str(user_count) + " users"
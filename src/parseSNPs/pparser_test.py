@@ -0,0 +1,76 @@
+"""
+This program is designed to test the functions in pparser
+"""
+import sys
+import os
+import csv
+import json
+import shutil
+import tempfile
+import StringIO
+from pparser import *
+import unittest
+
+# A phenotypes file with a blank line, a short row, dashes for no value, a non-ASCII value and a
+# column that sorts after phenotype_id
+sample_csv = ('user_id;date_of_birth;eye colour;Tongue roller;zodiac\n'
+              '820;1989;Brown;-;Leo\n'
+              '\n'
+              '822;---;Blue;yes\n'
+              '254;;"Gr\xc3\xbcn; hazel";no;\n')
+
+####################################################################################
+#
+# Test converting a phenotypes file to JSON
+#
+####################################################################################
+class pparser_test(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.dir, "phenotypes.csv")
+        with open(self.csv_path, "wb") as f:
+            f.write(sample_csv)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    # Read a file written by convert_phenotypes
+    def read(self, name):
+        with open(os.path.join(self.dir, name)) as f:
+            return f.read()
+
+    # Build the users and phenotypes lists with csv.DictReader, as the converter used to
+    def get_expected(self):
+        with open(self.csv_path, "rb") as csvfile:
+            rows = list(csv.DictReader(csvfile, dialect='excel', delimiter=';', quotechar='"', restval=''))
+            fieldNamesList = csv.reader(StringIO.StringIO(sample_csv), delimiter=';').next()
+        users = [{"user_id": row["user_id"], "data": [{phenotype: row[phenotype], "phenotype_id": i}
+                                                      for i, phenotype in enumerate(fieldNamesList)
+                                                      if len(row[phenotype].replace("-", "")) > 0]} for row in rows]
+        phenotypes = [{"phenotype": phenotype, "phenotype_id": i,
+                       "data": [{'user_id': row["user_id"], 'value': row[phenotype]} for row in rows
+                                if len(row[phenotype].replace("-", "")) > 0]} for i, phenotype in enumerate(fieldNamesList)]
+        return (users, phenotypes)
+
+    def test_convert_phenotypes(self):
+        self.assertEqual((5, 3), convert_phenotypes(self.csv_path, self.dir))
+        users, phenotypes = self.get_expected()
+        for name, expected in [("users", users), ("phenotypes", phenotypes)]:
+            self.assertEqual(json.dumps(expected), self.read(name + "_plain.json"))
+            self.assertEqual(json.dumps(expected, sort_keys=True, indent=4, separators=(',', ': ')), self.read(name + "_pretty.json"))
+        self.assertEqual([{"user_id": "822", "value": "yes"}, {"user_id": "254", "value": "no"}], phenotypes[3]["data"])
+
+    def test_empty(self):
+        with open(self.csv_path, "wb") as f:
+            f.write("user_id;eye colour\n")
+        self.assertEqual((2, 0), convert_phenotypes(self.csv_path, self.dir))
+        self.assertEqual("[]", self.read("users_pretty.json"))
+        self.assertEqual(json.loads(self.read("phenotypes_plain.json"))[1], {"phenotype": "eye colour", "phenotype_id": 1, "data": []})
+
+    def test_pretty_json(self):
+        for value in [{}, [], {"b": [1, {"a": "x\xc3\xa9\n"}], "a": [], "c": {}}, [[[]]], "x", [True, None, 1.5]]:
+            self.assertEqual(json.dumps(value, sort_keys=True, indent=4, separators=(',', ': ')), pretty_json(value))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+This module tests SNPs for association with file groups, such as groups of users with and without
+a phenotype (see the FILES keyword in parse_files.txt).
+
+For each SNP the two most common called alleles across the groups compared are taken as the major
+and minor alleles.  The tests are:
+    allelic chi-square      groups x (minor, major) allele counts
+    genotypic chi-square    groups x (major/major, major/minor, minor/minor) genotype counts
+    Fisher exact            two-sided, on the allele counts of the first two groups
+    odds ratio              of the minor allele in the first group against the second
+Every SNP is tested at once with NumPy array operations (see snp_stats).  The table is ranked
+by the allelic p-value, smallest first.
+"""
+
+import numpy as np
+from snp_codes import *
+from snp_stats import chi_square, fisher_exact, odds_ratio
+from snp_summary import get_allele_counts, get_major_minor, get_major_minor_genotypes
+
+####################################################################################
+#
+# Class holding the association tests for every SNP in a set of results
+#
+####################################################################################
+class AssociationTable:
+    # Constructor.  Tests the genotype counts for the group labels, given in the form returned by
+    # ResultsSet.get_genotype_counts.
+    def __init__(self, labels, rsids, chromosomes, positions, codes, counts):
+        self.labels = list(labels)
+        self.rsids = rsids
+        self.chromosomes = chromosomes
+        self.positions = positions
+        rows = np.arange(len(rsids))[:, np.newaxis]
+        groups = np.arange(len(self.labels))[np.newaxis, :]
+
+        # Find the major and minor alleles from the allele counts of every group
+        allele_counts = get_allele_counts(codes, counts)
+        self.major, self.minor = get_major_minor(allele_counts)
+        self.minor_counts = allele_counts[rows, groups, self.minor[:, np.newaxis]]
+        self.major_counts = allele_counts[rows, groups, self.major[:, np.newaxis]]
+        self.allelic = chi_square(np.dstack([self.minor_counts, self.major_counts]))
+        self.genotype_counts = get_major_minor_genotypes(codes, counts, self.major, self.minor)
+        self.genotypic = chi_square(self.genotype_counts)
+
+        # The exact test and odds ratio compare the first two groups
+        if len(self.labels) >= 2:
+            tables = (self.minor_counts[:, 0], self.major_counts[:, 0], self.minor_counts[:, 1], self.major_counts[:, 1])
+            self.fisher_p = fisher_exact(*tables)
+            self.odds_ratios = odds_ratio(*tables)
+        else:
+            self.fisher_p = self.odds_ratios = np.full(len(rsids), np.nan)
+
+    # Test the SNPs in a ResultsSet or ArrayResultsSet for association with the group labels
+    @staticmethod
+    def from_results_set(results_set, labels):
+        return AssociationTable(labels, *results_set.get_genotype_counts(labels))
+
+    # Get the number of SNPs in the table
+    def __len__(self):
+        return len(self.rsids)
+
+    # Convert the contents to a string
+    def __str__(self):
+        return "( AssociationTable: " + ", ".join(self.labels) + ": " + str(len(self)) + " SNPs )"
+
+    # Get the group labels compared
+    def get_labels(self):
+        return self.labels
+
+    # Get the allelic chi-square test as a tuple of (statistic, degrees of freedom, p-value) arrays
+    def get_allelic(self):
+        return self.allelic
+
+    # Get the genotypic chi-square test as a tuple of (statistic, degrees of freedom, p-value) arrays
+    def get_genotypic(self):
+        return self.genotypic
+
+    # Get the Fisher exact test p-values for the first two groups
+    def get_fisher_p(self):
+        return self.fisher_p
+
+    # Get the odds ratios of the minor allele in the first group against the second
+    def get_odds_ratios(self):
+        return self.odds_ratios
+
+    # Get the frequency of the minor allele in each group as an array with a column for each label
+    def get_minor_allele_frequencies(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.minor_counts / (self.minor_counts + self.major_counts).astype(np.float64)
+
+    # Get the sequence that ranks the SNPs by allelic and then genotypic p-value, with ties in rsid
+    # sequence.  SNPs that couldn't be tested come last.
+    def get_order(self):
+        allelic_p = np.where(np.isnan(self.allelic[2]), np.inf, self.allelic[2])
+        genotypic_p = np.where(np.isnan(self.genotypic[2]), np.inf, self.genotypic[2])
+        return np.lexsort((np.asarray(self.rsids), genotypic_p, allelic_p))
+
+    # Print the table in rank sequence as tab-separated columns with a heading line.  If limit is
+    # passed, only that many SNPs are printed.
+    def print_contents(self, limit = None):
+        print "\t".join(["rsid", "chromosome", "position", "minor", "major"] +
+                        ["MAF " + label for label in self.labels] +
+                        ["allelic chi2", "allelic p", "genotypic chi2", "genotypic df", "genotypic p", "Fisher p", "odds ratio"])
+        frequencies = self.get_minor_allele_frequencies()
+        for index in self.get_order()[:limit]:
+            print "\t".join([self.rsids[index], self.chromosomes[index], str(self.positions[index]),
+                             called_alleles[self.minor[index]], called_alleles[self.major[index]]] +
+                            ["%.4g" % frequency for frequency in frequencies[index]] +
+                            ["%.4g" % self.allelic[0][index], "%.4g" % self.allelic[2][index],
+                             "%.4g" % self.genotypic[0][index], str(self.genotypic[1][index]), "%.4g" % self.genotypic[2][index],
+                             "%.4g" % self.fisher_p[index], "%.4g" % self.odds_ratios[index]])
@@ -0,0 +1,57 @@
+"""
+This program is designed to test the classes in snp_association
+"""
+import sys
+import numpy as np
+from snp_classes import *
+from snp_results import ArrayResultsSet
+from snp_association import *
+import unittest
+
+####################################################################################
+#
+# Test AssociationTable class
+#
+####################################################################################
+class AssociationTable_test(unittest.TestCase):
+
+    def setUp(self):
+        rsids = ["RS1"] * 10 + ["RS2"] * 4
+        chromosomes = ["1"] * 14
+        positions = [5] * 10 + [9] * 4
+        self.chunks = {"Rollers": SnpChunk.from_strings(rsids, chromosomes, positions,
+                                                        ["AA"] * 6 + ["AG"] * 3 + ["GA"] + ["CC", "CT", "--", "T"]),
+                       "Non-Rollers": SnpChunk.from_strings(rsids, chromosomes, positions,
+                                                            ["GG"] * 6 + ["AG"] * 3 + ["AA"] + ["CC"] * 4)}
+
+    # Get the table for a results set holding the sample chunks
+    def get_table(self, results_set):
+        for label, snp_chunk in self.chunks.items():
+            results_set.add_chunk(label, snp_chunk)
+        return AssociationTable.from_results_set(results_set, ["Rollers", "Non-Rollers"])
+
+    def test_alleles(self):
+        table = self.get_table(ResultsSet())
+        order = table.get_order()
+        self.assertEqual(["RS1", "RS2"], [table.rsids[index] for index in order])
+        first = order[0]
+        self.assertEqual(("G", "A"), (called_alleles[table.minor[first]], called_alleles[table.major[first]]))
+        self.assertEqual([0.2, 0.75], table.get_minor_allele_frequencies()[first].tolist())
+        # Rollers AA=6, AG=4 and Non-Rollers AA=1, AG=3, GG=6
+        self.assertEqual([[6, 4, 0], [1, 3, 6]], table.genotype_counts[first].tolist())
+        self.assertEqual(2, table.get_genotypic()[1][first])
+        self.assertAlmostEqual(12.1303258, table.get_allelic()[0][first], places=6)
+        self.assertAlmostEqual((4 * 5) / (16 * 15.0), table.get_odds_ratios()[first])
+
+    def test_backends(self):
+        table = self.get_table(ResultsSet())
+        array_table = self.get_table(ArrayResultsSet())
+        for index, array_index in zip(table.get_order(), array_table.get_order()):
+            self.assertEqual(table.rsids[index], array_table.rsids[array_index])
+            self.assertEqual(table.get_fisher_p()[index], array_table.get_fisher_p()[array_index])
+
+    def test_empty(self):
+        self.assertEqual(0, len(AssociationTable.from_results_set(ResultsSet(), ["Rollers", "Non-Rollers"])))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+"""
+This module answers several queries in one pass over the SNP files (batch mode).
+
+Each query is a Params instance with its own selections, file groups and results backend.  Every
+file selected by any query is read and parsed once, and each block of rows is then routed to every
+query whose file groups select the file: the rows that pass the query's selections are added to
+its ResultsSet under the query's label for the file.  Reading and parsing are most of the cost of
+a run, so comparing several cohorts costs little more than counting one of them.
+
+The directory, cache directory and number of workers are taken from the first query.  The rsid
+index and incremental results (see snp_index and snp_manifest) only serve single queries, so a
+batch always reads every row of the selected files.
+"""
+
+import os
+import time
+import multiprocessing
+import numpy as np
+from snp_classes import *
+from snp_metrics import *
+from snp_results import new_results_set, new_file_counts, add_file_counts, ChunkResultsSet
+from snp_sources import list_files, get_file_info
+from parse_SNPs import bypass, get_file_source, read_file_chunks, new_file_metrics
+
+# Get the Params files are read with in a batch: the directory and cache directory of the first
+# query with no selections, so every row of each file is read
+def get_scan_params(params_list):
+    scan_params = Params()
+    scan_params.set_directory_location(params_list[0].get_directory_location())
+    scan_params.set_cache_directory(params_list[0].get_cache_directory())
+    return scan_params
+
+# Find the files selected by any query.  Returns a tuple of (routes, bypassed) where routes is a
+# list of (filename, [(query index, label)]) tuples in the sequence the files are listed, and
+# bypassed is a list of the selected filenames that are never parsed.
+def route_files(params_list):
+    routes = []
+    bypassed_files = []
+    for filename in list_files(params_list[0].get_directory_location()):
+        file_routes = []
+        for index, params in enumerate(params_list):
+            label = params.get_file_group_label(filename)
+            if label != None:
+                file_routes.append((index, label))
+        if len(file_routes) > 0:
+            if bypass(filename):
+                bypassed_files.append(filename)
+            else:
+                routes.append((filename, file_routes))
+    return (routes, bypassed_files)
+
+# Parse one file once and add the rows each query selects to the query's ResultsSet.  queries is
+# a list of (params, label, results_set) tuples.  Returns the FileMetrics of the file, where the
+# lines accepted are those selected by at least one query.
+def parse_shared_file(scan_params, filename, queries):
+    metrics = new_file_metrics(filename, queries[0][1])
+    processor = AbstractSNPProcessor.get_processor(filename)
+    if processor == None:
+        return metrics
+    path = os.path.join(scan_params.get_directory_location(), filename)
+    metrics.source = get_file_source(scan_params, path)
+    if metrics.source == "text":
+        metrics.bytes_read = get_file_info(path)["size"]
+    snp_chunks = read_file_chunks(scan_params, path, processor)
+    while True:
+        started = time.time()
+        snp_chunk = next(snp_chunks, None)
+        metrics.parse_seconds += time.time() - started
+        if snp_chunk == None:
+            break
+        accepted = np.zeros(len(snp_chunk), dtype=bool)
+        for params, label, results_set in queries:
+            started = time.time()
+            mask = params.process_chunk(snp_chunk)
+            accepted |= mask
+            selected = snp_chunk.select(mask)
+            filtered = time.time()
+            metrics.filter_seconds += filtered - started
+            results_set.add_chunk(label, selected)
+            metrics.aggregate_seconds += time.time() - filtered
+        metrics.add_lines(snp_chunk.get_lines_read(), int(accepted.sum()))
+        if metrics.source != "text":
+            metrics.bytes_read += sum(column.nbytes for column in [snp_chunk.get_rsids(), snp_chunk.get_chromosome_codes(),
+                                                                   snp_chunk.get_positions(), snp_chunk.get_genotype_codes()])
+        metrics.valid = snp_chunk.is_valid()
+        if not metrics.valid:
+            metrics.reason = snp_chunk.get_reason()
+    metrics.sample_memory()
+    return metrics
+
+# Parse one file in a process pool worker when the first query has more than one worker.  The
+# single argument is a tuple of (scan_params, filename, [(query index, params, label)]).  Returns
+# a tuple of (filename, [(query index, label, SnpChunk of the rows the query selects)],
+# FileMetrics).  The rows are counted by the parent process, as they are much quicker to send
+# back than counts.
+def parse_shared_file_worker(args):
+    scan_params, filename, queries = args
+    chunk_results_sets = [ChunkResultsSet() for query in queries]
+    metrics = parse_shared_file(scan_params, filename, [(params, label, chunk_results_set) for (index, params, label), chunk_results_set
+                                                        in zip(queries, chunk_results_sets)])
+    return (filename, [(index, label, chunk_results_set.get_snp_chunk()) for (index, params, label), chunk_results_set
+                       in zip(queries, chunk_results_sets)], metrics)
+
+# Answer several queries in one pass over the files.  params_list is a list of Params, one for each
+# query.  Returns a tuple of (a list with a ResultsSet for each query in the sequence of
+# params_list, RunMetrics).  Each file is recorded once in the metrics.
+def parse_batch(params_list):
+    print "Processing files for", len(params_list), "queries"
+    metrics = RunMetrics()
+    results_sets = [new_results_set(params) for params in params_list]
+    if len(params_list) == 0:
+        metrics.finish()
+        return (results_sets, metrics)
+    scan_params = get_scan_params(params_list)
+    routes, bypassed_files = route_files(params_list)
+    for filename in bypassed_files:
+        metrics.add_skipped(filename, bypassed_reason)
+    print "Files to parse:", len(routes)
+    if params_list[0].get_workers() > 1:
+        # Parse files in a process pool.  The rows each query selects from each file are counted
+        # in arrays as they come back and added to the query's results once every file is parsed.
+        file_counts = [new_file_counts(results_set) for results_set in results_sets]
+        pool = multiprocessing.Pool(params_list[0].get_workers())
+        try:
+            tasks = [(scan_params, filename, [(index, params_list[index], label) for index, label in file_routes])
+                     for filename, file_routes in routes]
+            for filename, file_chunks, file_metrics in pool.imap_unordered(parse_shared_file_worker, tasks):
+                started = time.time()
+                for index, label, snp_chunk in file_chunks:
+                    file_counts[index].add_chunk(label, snp_chunk)
+                file_metrics.aggregate_seconds += time.time() - started
+                metrics.add_file(file_metrics)
+        finally:
+            pool.close()
+            pool.join()
+        for results_set, counts in zip(results_sets, file_counts):
+            add_file_counts(results_set, counts)
+    else:
+        for filename, file_routes in routes:
+            queries = [(params_list[index], label, results_sets[index]) for index, label in file_routes]
+            metrics.add_file(parse_shared_file(scan_params, filename, queries))
+    skipped_reasons = metrics.get_skipped()
+    if len(skipped_reasons) > 0:
+        print
+        print "Skipped Files"
+        for filename, reason in sorted(skipped_reasons.items()):
+            print filename, "-", reason
+    metrics.finish()
+    return (results_sets, metrics)
@@ -0,0 +1,81 @@
+"""
+This program is designed to test the functions in snp_batch
+"""
+import sys
+import os
+from snp_classes import *
+from snp_batch import *
+from parse_SNPs import parse_snps
+from parse_SNPs_test import SnpDirectory_test
+import unittest
+
+####################################################################################
+#
+# Test parse_batch
+#
+####################################################################################
+class parse_batch_test(SnpDirectory_test):
+
+    def setUp(self):
+        SnpDirectory_test.setUp(self)
+        # A query of every file, one of chromosome 1 in two groups and one of a single user's file
+        self.params_list = [self.params]
+        params = self.new_params()
+        params.add_chromosome("1")
+        group1 = FileGroup("Group 1", 1)
+        group1.add_file_selector("user1_*.txt")
+        group2 = FileGroup("Group 2", 2)
+        group2.add_file_selector("*illumina.txt")
+        params.add_file_group(group1)
+        params.add_file_group(group2)
+        self.params_list.append(params)
+        params = self.new_params()
+        group3 = FileGroup("Group 3", 1)
+        group3.add_file_selector("user3_*")
+        params.add_file_group(group3)
+        params.set_rsid("rs3131972")
+        self.params_list.append(params)
+
+    def new_params(self):
+        params = Params()
+        params.set_directory_location(self.dir)
+        return params
+
+    def test_parse_batch(self):
+        results_sets, metrics = parse_batch(self.params_list)
+        self.assertEqual(3, len(results_sets))
+        for params, results_set in zip(self.params_list, results_sets):
+            self.assertEqual(self.get_counts(parse_snps(params)), self.get_counts(results_set))
+        # Each file is parsed once
+        self.assertEqual(5, len(metrics))
+        self.assertEqual(2, len(metrics.get_skipped()))
+        files = dict((file_metrics.filename, file_metrics) for file_metrics in metrics.get_files())
+        file_metrics = files["user1_file1_yearofbirth_unknown_sex_unknown.23andme.txt"]
+        self.assertEqual((4, 3), (file_metrics.lines_read, file_metrics.lines_accepted))
+
+    def test_route_files(self):
+        routes, bypassed_files = route_files(self.params_list[1:])
+        self.assertEqual([("user1_file1_yearofbirth_unknown_sex_unknown.23andme.txt", [(0, "Group 1")]),
+                          ("user2_file2_yearofbirth_1986_sex_XX.ftdna-illumina.txt", [(0, "Group 2")]),
+                          ("user3_file3_yearofbirth_1966_sex_unknown.illumina.txt", [(0, "Group 2"), (1, "Group 3")])], routes)
+        self.assertEqual([], bypassed_files)
+
+    def test_workers(self):
+        expected = [self.get_counts(results_set) for results_set in parse_batch(self.params_list)[0]]
+        self.params_list[0].set_workers(2)
+        self.assertEqual(expected, [self.get_counts(results_set) for results_set in parse_batch(self.params_list)[0]])
+
+    def test_cache(self):
+        expected = [self.get_counts(results_set) for results_set in parse_batch(self.params_list)[0]]
+        self.params_list[0].set_cache_directory(os.path.join(self.dir, "cache"))
+        parse_batch(self.params_list)
+        results_sets, metrics = parse_batch(self.params_list)
+        self.assertEqual(expected, [self.get_counts(results_set) for results_set in results_sets])
+        self.assertEqual(set(["cache"]), set(file_metrics.source for file_metrics in metrics.get_files()
+                                                 if file_metrics.file_type != None))
+
+    def test_no_queries(self):
+        self.assertEqual([], parse_batch([])[0])
+
+if __name__ == '__main__':
+    unittest.main()
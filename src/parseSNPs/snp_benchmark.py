@@ -0,0 +1,180 @@
+"""
+This module measures how fast the parser runs over a synthetic dataset (see snp_synthetic).
+
+Each case runs part of the pipeline over the same files and reports the seconds it took, the
+rows selected and files read per second and the peak resident memory.  A case is run several times and
+the fastest run kept.  The report can be saved as a baseline, a JSON file, and later runs are
+compared with it, listing each case's speed as a ratio of the baseline's.
+
+The cases are:
+    parse        parse_snps in one process
+    workers      parse_snps in a process pool
+    cache-build  parse_snps writing a cache of the files (see snp_cache)
+    cache        parse_snps reading the cache
+    region       one chromosome read from the cache
+    iter_snps    every selected row read with iter_snps
+    write        the counts written as TSV (see snp_writers)
+
+Usage:
+    python snp_benchmark.py [files] [rows per file] [baseline file]
+The baseline is written if the file doesn't exist, otherwise the run is compared with it.
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+import StringIO
+import multiprocessing
+from snp_classes import *
+from snp_metrics import get_rss
+from snp_synthetic import write_dataset
+from snp_writers import write_results
+from parse_SNPs import parse_snps_with_metrics, iter_snps
+
+# Names of the values reported for each case
+report_fields = ["seconds", "rows", "files", "rows_per_second", "files_per_second", "peak_rss"]
+
+# Get params selecting every file in a directory with no progress output
+def new_params(directory):
+    params = Params()
+    params.set_directory_location(directory)
+    params.set_show_selected_files(False)
+    params.set_show_file_progress(False)
+    params.set_show_lines_progress_interval(0)
+    return params
+
+# Run parse_snps.  Returns a tuple of (rows selected, files read, peak resident memory).
+def run_parse(params, prepared = None):
+    metrics = parse_snps_with_metrics(params)[1]
+    return (sum(file_metrics.lines_accepted for file_metrics in metrics.get_files()), len(metrics), metrics.peak_rss)
+
+# Run parse_snps in a process pool
+def run_workers(params, prepared = None):
+    params.set_workers(max(2, min(4, multiprocessing.cpu_count())))
+    return run_parse(params)
+
+# Run parse_snps with a new, empty cache directory
+def run_cache_build(params, prepared = None):
+    cache_dir = tempfile.mkdtemp()
+    try:
+        params.set_cache_directory(cache_dir)
+        return run_parse(params)
+    finally:
+        shutil.rmtree(cache_dir)
+
+# Run parse_snps reading a cache built beforehand, which isn't timed
+def prepare_cache(params):
+    params.set_cache_directory(tempfile.mkdtemp())
+    parse_snps_with_metrics(params)
+
+# Read the rows of one chromosome from a cache built beforehand
+def prepare_region(params):
+    prepare_cache(params)
+    params.add_chromosome("1")
+
+# Read every selected row with iter_snps
+def run_iter_snps(params, prepared = None):
+    rows = 0
+    files = set()
+    for label, filename, rsid, chromosome, position, genotype in iter_snps(params):
+        rows += 1
+        files.add(filename)
+    return (rows, len(files), get_rss())
+
+# Count the genotypes of every file to be written as TSV, which isn't timed.  Returns the ResultsSet.
+def prepare_write(params):
+    params.set_output_format("TSV")
+    params.set_output_path(os.devnull)
+    return parse_snps_with_metrics(params)[0]
+
+# Write the counts in the ResultsSet returned by prepare_write
+def run_write(params, results_set):
+    write_results(results_set, params)
+    return (len(results_set), 0, get_rss())
+
+# Names of the cases with the function run untimed before each run, or None, and the function timed.
+# The first takes the params and the second the params and what the first returned.  The second
+# returns a tuple of (rows, files, peak resident memory).
+cases = [("parse", None, run_parse),
+         ("workers", None, run_workers),
+         ("cache-build", None, run_cache_build),
+         ("cache", prepare_cache, run_parse),
+         ("region", prepare_region, run_parse),
+         ("iter_snps", None, run_iter_snps),
+         ("write", prepare_write, run_write)]
+
+# Run a case once over the files in a directory.  Returns a dictionary of the values named in
+# report_fields.
+def run_case(directory, prepare, run):
+    params = new_params(directory)
+    stdout = sys.stdout
+    # parse_snps reports its progress to the console
+    sys.stdout = StringIO.StringIO()
+    try:
+        prepared = prepare(params) if prepare != None else None
+        started = time.time()
+        rows, files, peak_rss = run(params, prepared)
+        seconds = time.time() - started
+    finally:
+        sys.stdout = stdout
+        if params.get_cache_directory() != None and os.path.isdir(params.get_cache_directory()):
+            shutil.rmtree(params.get_cache_directory())
+    return {"seconds": seconds, "rows": rows, "files": files, "rows_per_second": rows / seconds if seconds > 0 else 0.0,
+            "files_per_second": files / seconds if seconds > 0 else 0.0, "peak_rss": peak_rss}
+
+# Run each case named (every case if None) repeat times over the files in a directory, keeping
+# the fastest run.  Returns a dictionary of {case name: report}.
+def run_benchmark(directory, names = None, repeat = 3):
+    report = {}
+    for name, prepare, run in cases:
+        if names == None or name in names:
+            runs = [run_case(directory, prepare, run) for count in range(repeat)]
+            report[name] = min(runs, key=lambda values: values["seconds"])
+    return report
+
+# Compare a report with a baseline.  Returns a dictionary of {case name: ratio of the report's rows
+# per second to the baseline's}, for the cases in both.  A ratio above 1 is faster than the baseline.
+def compare(report, baseline):
+    ratios = {}
+    for name, values in report.items():
+        if name in baseline and baseline[name]["rows_per_second"] > 0:
+            ratios[name] = values["rows_per_second"] / baseline[name]["rows_per_second"]
+    return ratios
+
+# Format a report as a table, with a column of the ratios to a baseline if they are passed
+def format_report(report, ratios = None):
+    lines = ["%-12s %9s %12s %12s %10s %9s%s" % ("case", "seconds", "rows", "rows/sec", "files/sec", "peak MB",
+                                                  "  vs baseline" if ratios != None else "")]
+    for name, prepare, run in cases:
+        if name in report:
+            values = report[name]
+            line = "%-12s %9.3f %12d %12.0f %10.1f %9.1f" % (name, values["seconds"], values["rows"], values["rows_per_second"],
+                                                            values["files_per_second"], values["peak_rss"] / 1048576.0)
+            if ratios != None and name in ratios:
+                line += "  %10.2fx" % ratios[name]
+            lines.append(line)
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    baseline_path = sys.argv[3] if len(sys.argv) > 3 else None
+    directory = tempfile.mkdtemp()
+    try:
+        print "Writing", files, "files of", rows, "rows"
+        write_dataset(directory, files, rows)
+        report = run_benchmark(directory)
+    finally:
+        shutil.rmtree(directory)
+    if baseline_path != None and os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            print format_report(report, compare(report, json.load(f)))
+    else:
+        print format_report(report)
+        if baseline_path != None:
+            with open(baseline_path, "w") as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            print "Baseline written to " + baseline_path
@@ -0,0 +1,52 @@
+"""
+This program is designed to test the functions in snp_benchmark
+"""
+import sys
+import shutil
+import tempfile
+import multiprocessing
+from snp_benchmark import *
+from snp_synthetic import write_dataset
+import unittest
+
+####################################################################################
+#
+# Test run_benchmark and compare
+#
+####################################################################################
+class benchmark_test(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        write_dataset(self.dir, 6, 100)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_run_benchmark(self):
+        report = run_benchmark(self.dir, ["parse", "cache", "region", "iter_snps", "write"], repeat=1)
+        self.assertEqual(["cache", "iter_snps", "parse", "region", "write"], sorted(report.keys()))
+        self.assertEqual(sorted(report_fields), sorted(report["parse"].keys()))
+        self.assertEqual((600, 6), (report["parse"]["rows"], report["parse"]["files"]))
+        self.assertEqual(report["parse"]["rows"], report["cache"]["rows"])
+        self.assertEqual(600, report["iter_snps"]["rows"])
+        self.assertTrue(report["region"]["rows"] < 600)
+        self.assertTrue(report["parse"]["peak_rss"] > 0)
+        ratios = compare(report, {"parse": dict(report["parse"], rows_per_second=report["parse"]["rows_per_second"] / 2)})
+        self.assertEqual(["parse"], ratios.keys())
+        self.assertAlmostEqual(2.0, ratios["parse"])
+        self.assertEqual(6, len(format_report(report, ratios).splitlines()))
+
+    def test_workers(self):
+        # The process pool keeps up with one process over more files, allowing for starting the
+        # pool when there is only one processor to share
+        shutil.rmtree(self.dir)
+        write_dataset(self.dir, 24, 5000)
+        report = run_benchmark(self.dir, ["parse", "workers"])
+        self.assertEqual(report["parse"]["rows"], report["workers"]["rows"])
+        allowed = 1.0 if multiprocessing.cpu_count() > 1 else 1.5
+        self.assertTrue(report["workers"]["seconds"] <= report["parse"]["seconds"] * allowed,
+                        "%.3f seconds with workers, %.3f without" % (report["workers"]["seconds"], report["parse"]["seconds"]))
+
+if __name__ == '__main__':
+    unittest.main()
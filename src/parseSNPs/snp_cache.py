@@ -0,0 +1,131 @@
+"""
+This module keeps a binary columnar copy of parsed SNP files so later runs needn't re-parse the text.
+
+Each SNP file gets a directory in the cache directory holding one NumPy .npy file per column
+(rsids, chromosome codes, positions and genotype codes) and a meta.json file recording the size
+and modification time of the source file and the names of the codes (see snp_codes.CodeTable).  The columns are memory-mapped when read, and the copy
+is rebuilt when the source file changes.  Rows are sorted by chromosome and position so queries
+limited to some chromosomes or positions only read the rows in that region (see snp_index).
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+from snp_classes import *
+from snp_index import find_query_rows, get_region_order
+from snp_sources import open_file, get_file_info
+
+####################################################################################
+#
+# Class to manage a directory of cached SNP files
+#
+####################################################################################
+class SnpCache:
+    # Version of the cache layout.  Cached files with a different version are rebuilt.
+    version = 4
+
+    # Names of the column files in each cached file directory
+    columns = ["rsids", "chromosome_codes", "positions", "genotype_codes"]
+
+    # Constructor
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    # Convert the contents to a string
+    def __str__(self):
+        return "( SnpCache: " + self.cache_dir + " )"
+
+    # Get the cache directory
+    def get_cache_directory(self):
+        return self.cache_dir
+
+    # Get the directory that holds the cached columns for a SNP file
+    def get_cache_path(self, source_path):
+        return os.path.join(self.cache_dir, os.path.basename(source_path) + ".snpcache")
+
+    # Get the details of a source file that are checked to see whether the cached copy is current
+    # (see snp_sources.get_file_info)
+    @staticmethod
+    def get_source_info(source_path):
+        return get_file_info(source_path)
+
+    # Read the meta data for a cached file.  Returns None if the cached file isn't there.
+    def read_meta(self, source_path):
+        meta_path = os.path.join(self.get_cache_path(source_path), "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    # Return True if there is a cached copy of the source file made since it last changed
+    def is_current(self, source_path):
+        meta = self.read_meta(source_path)
+        if meta == None or meta.get("version") != SnpCache.version:
+            return False
+        return meta["source"] == SnpCache.get_source_info(source_path)
+
+    # Read a cached file as a single SnpChunk of memory-mapped columns sorted by chromosome and
+    # position.  If params limits the chromosomes or positions, only the rows in that region are 
+    # read.  get_lines_read and is_valid on the chunk describe the whole source file.  If
+    # stored_order is True the rows are kept in the sequence they were written in, which is the
+    # sequence the rsid index numbers them in (see snp_index), even where this process gives
+    # chromosomes other codes than the process that wrote them; params is then ignored.
+    def load(self, source_path, params = None, stored_order = False):
+        cache_path = self.get_cache_path(source_path)
+        meta = self.read_meta(source_path)
+        arrays = [np.load(os.path.join(cache_path, column + ".npy"), mmap_mode="r") for column in SnpCache.columns]
+        chromosome_codes, genotype_codes = import_codes(meta["code_names"], arrays[1], arrays[3])
+        snp_chunk = SnpChunk(arrays[0], chromosome_codes, arrays[2], genotype_codes, meta["valid"], meta["lines_read"], meta.get("reason"))
+        if stored_order:
+            return snp_chunk
+        if chromosome_codes is not arrays[1]:
+            # Chromosomes this process gave other codes to can leave the rows out of sequence
+            snp_chunk = snp_chunk.select(get_region_order(chromosome_codes, arrays[2]))
+        if params != None and params.is_region_query():
+            snp_chunk = snp_chunk.select(find_query_rows(snp_chunk.get_chromosome_codes(), snp_chunk.get_positions(), params))
+        return snp_chunk
+
+    # Write the chunks parsed from a source file to the cache, replacing any earlier copy
+    def save(self, source_path, processor, snp_chunks):
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        snp_chunk = SnpChunk.concatenate(snp_chunks)
+        snp_chunk = snp_chunk.select(get_region_order(snp_chunk.get_chromosome_codes(), snp_chunk.get_positions()))
+        arrays = [snp_chunk.get_rsids(), snp_chunk.get_chromosome_codes(), snp_chunk.get_positions(), snp_chunk.get_genotype_codes()]
+        meta = {"version": SnpCache.version,
+                "source": SnpCache.get_source_info(source_path),
+                "processor": processor.get_file_type_label(),
+                "valid": snp_chunk.is_valid(),
+                "reason": snp_chunk.get_reason(),
+                "lines_read": snp_chunk.get_lines_read(),
+                "code_names": get_code_names()}
+        # Write to a temporary directory and move it into place so readers never see part of a file
+        temp_path = tempfile.mkdtemp(dir=self.cache_dir)
+        try:
+            for column, array in zip(SnpCache.columns, arrays):
+                np.save(os.path.join(temp_path, column + ".npy"), array)
+            with open(os.path.join(temp_path, "meta.json"), "w") as f:
+                json.dump(meta, f)
+            cache_path = self.get_cache_path(source_path)
+            if os.path.exists(cache_path):
+                shutil.rmtree(cache_path)
+            os.rename(temp_path, cache_path)
+        except:
+            shutil.rmtree(temp_path, ignore_errors=True)
+            raise
+
+    # Yield the SnpChunks of a source file.  If the cached copy is current it is read from the cache,
+    # otherwise the file is parsed by the processor and the cache is written once it has been read.
+    # params is passed to load to limit the rows read from the cache.
+    def parse_file(self, source_path, processor, params = None):
+        if self.is_current(source_path):
+            yield self.load(source_path, params)
+        else:
+            snp_chunks = []
+            with open_file(source_path) as f:
+                for snp_chunk in processor.parse_file(f):
+                    snp_chunks.append(snp_chunk)
+                    yield snp_chunk
+            self.save(source_path, processor, snp_chunks)
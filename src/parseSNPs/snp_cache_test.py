@@ -0,0 +1,87 @@
+"""
+This program is designed to test the classes in snp_cache
+"""
+import sys
+import os
+import json
+from snp_classes import *
+from snp_cache import *
+from parse_SNPs import parse_snps
+from parse_SNPs_test import SnpDirectory_test
+import unittest
+
+####################################################################################
+#
+# Test SnpCache class
+#
+####################################################################################
+class SnpCache_test(SnpDirectory_test):
+
+    def setUp(self):
+        SnpDirectory_test.setUp(self)
+        self.cache_dir = os.path.join(self.dir, "cache")
+        self.cache = SnpCache(self.cache_dir)
+        self.source_path = os.path.join(self.dir, "user1_file1_yearofbirth_unknown_sex_unknown.23andme.txt")
+        self.processor = AbstractSNPProcessor.get_processor(self.source_path)
+
+    def test_parse_file(self):
+        self.assertFalse(self.cache.is_current(self.source_path))
+        parsed = list(self.cache.parse_file(self.source_path, self.processor))
+        self.assertTrue(self.cache.is_current(self.source_path))
+        cached = list(self.cache.parse_file(self.source_path, self.processor))
+        self.assertEqual(1, len(cached))
+        self.assertEqual(SnpChunk.concatenate(parsed).get_rows(), cached[0].get_rows())
+        self.assertEqual(4, cached[0].get_lines_read())
+        self.assertTrue(cached[0].is_valid())
+
+    def test_invalid_file(self):
+        source_path = os.path.join(self.dir, "user4_file4_yearofbirth_1956_sex_XY.decodeme.txt")
+        list(self.cache.parse_file(source_path, AbstractSNPProcessor.get_processor(source_path)))
+        snp_chunk = self.cache.load(source_path)
+        self.assertFalse(snp_chunk.is_valid())
+        self.assertEqual([("RS4477212", "1", 72017, "AA")], snp_chunk.get_rows())
+
+    def test_load_region(self):
+        list(self.cache.parse_file(self.source_path, self.processor))
+        self.params.add_chromosome("1")
+        self.params.set_position_start(700000)
+        snp_chunk = self.cache.load(self.source_path, self.params)
+        self.assertEqual([("RS3094315", "1", 742429, "AG")], snp_chunk.get_rows())
+        self.assertEqual(4, snp_chunk.get_lines_read())
+        self.params.set_position_end(700001)
+        self.assertEqual(0, len(self.cache.load(self.source_path, self.params)))
+
+    def test_source_changed(self):
+        list(self.cache.parse_file(self.source_path, self.processor))
+        with open(self.source_path, "a") as f:
+            f.write("rs1\t3\t5\tCC\n")
+        self.assertFalse(self.cache.is_current(self.source_path))
+        list(self.cache.parse_file(self.source_path, self.processor))
+        self.assertEqual(4, len(self.cache.load(self.source_path)))
+
+    def test_code_names(self):
+        list(self.cache.parse_file(self.source_path, self.processor))
+        # Codes cached by a process that gave chromosomes 1 and 2 each other's codes
+        meta_path = os.path.join(self.cache.get_cache_path(self.source_path), "meta.json")
+        with open(meta_path) as f:
+            meta = json.load(f)
+        chromosome_names = meta["code_names"]["chromosome_names"]
+        chromosome_names[1], chromosome_names[2] = chromosome_names[2], chromosome_names[1]
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+        # Rows are put back in chromosome and position sequence
+        self.assertEqual([("RS3131972", "1", 742584, "GG"), ("RS4477212", "2", 72017, "AA"), ("RS3094315", "2", 742429, "AG")],
+                         self.cache.load(self.source_path).get_rows())
+        self.params.add_chromosome("2")
+        self.params.set_position_start(700000)
+        self.assertEqual([("RS3094315", "2", 742429, "AG")], self.cache.load(self.source_path, self.params).get_rows())
+
+    def test_parse_snps(self):
+        expected = self.get_counts(parse_snps(self.params))
+        self.params.set_cache_directory(self.cache_dir)
+        self.assertEqual(expected, self.get_counts(parse_snps(self.params)))
+        self.assertTrue(self.cache.is_current(self.source_path))
+        self.assertEqual(expected, self.get_counts(parse_snps(self.params)))
+
+if __name__ == '__main__':
+    unittest.main()
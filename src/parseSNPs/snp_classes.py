@@ -6,8 +6,15 @@ Author: David Gray
 """
 
 import sys
+import os
+import re
+import time
 import fnmatch
+import string
+import numpy as np
 from snp_utils import *
+from snp_codes import *
+from snp_harmonize import harmonize_counts
 
 ####################################################################################
 #
@@ -25,11 +32,7 @@ class ResultsSet:
     
     # Convert contents to string
     def __str__(self):
-        string_out = "( Results:"
-        for result in sorted(self.get_results_iterator()):
-            string_out += str(result)
-        string_out += " )\n"
-        return string_out
+        return "( Results:" + "".join(str(result) for result in sorted(self.get_results_iterator())) + " )\n"
     
     # print contents
     def print_contents(self):
@@ -49,9 +52,80 @@ class ResultsSet:
             self.results[key] = result
         return result
     
+    # Merge the results from another ResultsSet into this one.  Results that are only in the
+    # other set are moved rather than copied so the other set shouldn't be used afterwards.
+    def merge(self, results_set):
+        for key, result in results_set.results.iteritems():
+            if key in self.results:
+                self.results[key].merge(result)
+            else:
+                self.results[key] = result
+    
+    # Add one genotype for a group label for every row of a SnpChunk, or counts[row] genotypes if
+    # a NumPy array of counts is passed
+    def add_chunk(self, label, snp_chunk, counts = None):
+        if counts is None:
+            for rsid, chromosome, position, genotype in snp_chunk.get_rows():
+                self.get_or_create_result(rsid, chromosome, position).add_one(label, genotype)
+        else:
+            for (rsid, chromosome, position, genotype), count in zip(snp_chunk.get_rows(), counts.tolist()):
+                self.get_or_create_result(rsid, chromosome, position).add_count(label, genotype, count)
+    
+    # Take away one genotype for a group label for every row of a SnpChunk added earlier with
+    # add_chunk.  Genotypes, groups and results left with nothing counted are removed.
+    def remove_chunk(self, label, snp_chunk):
+        for rsid, chromosome, position, genotype in snp_chunk.get_rows():
+            key = Result.get_key_static(rsid, chromosome, position)
+            result = self.results[key]
+            result.remove_count(label, genotype, 1)
+            if len(result.get_groups()) == 0:
+                del self.results[key]
+    
     # return an iterator of the results
     def get_results_iterator(self):
         return self.results.itervalues()
+    
+    # Get the counts for some group labels as arrays.  Returns a tuple of (rsids, chromosomes,
+    # positions, codes, counts) where the first three are lists with an entry for each result,
+    # codes is a list of the genotype codes counted and counts is a NumPy array with a row for
+    # each result, a column for each label and a count for each code.
+    def get_genotype_counts(self, labels):
+        results = self.results.values()
+        # Collect the cell of each count first and fill the array in one operation
+        cells = []
+        cell_codes = []
+        cell_counts = []
+        get_code = get_genotype_code
+        for index, result in enumerate(results):
+            groups = result.get_groups()
+            for label_index, label in enumerate(labels):
+                group = groups.get(label)
+                if group != None:
+                    for gtype, count in group.get_counts().iteritems():
+                        cells.append(index * len(labels) + label_index)
+                        cell_codes.append(get_code(gtype))
+                        cell_counts.append(count)
+        codes, slots = np.unique(np.array(cell_codes, dtype=np.int64), return_inverse=True)
+        size = len(results) * len(labels) * len(codes)
+        counts = np.bincount(np.array(cells, dtype=np.int64) * len(codes) + slots, weights=cell_counts,
+                             minlength=size).astype(np.int32).reshape((len(results), len(labels), len(codes)))
+        # The keys hold the rsid, chromosome and position of each result, in the sequence of the values
+        rsids, chromosomes, positions = zip(*self.results.keys()) if len(results) > 0 else ((), (), ())
+        return (list(rsids), list(chromosomes), list(positions), codes.tolist(), counts)
+    
+    # Count genotypes reported in different allele orders or from the opposite strand together
+    # (see snp_harmonize).  Genotypes that aren't recognized are left as they are.
+    def harmonize(self):
+        results = self.results.values()
+        labels = sorted(set(label for result in results for label in result.get_groups()))
+        codes, counts, changed = harmonize_counts(*self.get_genotype_counts(labels)[3:])
+        for index in np.flatnonzero(changed):
+            result = results[index]
+            for label_index, label in enumerate(labels):
+                group = result.get_groups().get(label)
+                if group != None:
+                    group.gtypes = dict((genotype_names[code], int(counts[index, label_index, slot]))
+                                        for slot, code in enumerate(codes) if counts[index, label_index, slot] != 0)
         
 ####################################################################################
 #
@@ -107,9 +181,30 @@ class Result:
     
     # Add one genotype for a given group label
     def add_one (self, label, gtype):
+        self.add_count(label, gtype, 1)
+    
+    # Add a number of instances of a genotype for a given group label
+    def add_count (self, label, gtype, count):
         if label not in self.groups:
             self.groups[ label ] = Group(label)
-        self.groups[ label ].add_genotype(gtype)
+        self.groups[ label ].add_genotype(gtype, count)
+    
+    # Take away a number of instances of a genotype for a given group label.  The group is removed
+    # once it has nothing counted.
+    def remove_count (self, label, gtype, count):
+        group = self.groups[ label ]
+        group.remove_genotype(gtype, count)
+        if len(group.get_counts()) == 0:
+            del self.groups[ label ]
+    
+    # Merge the groups from another Result for the same key into this one.  Groups that are only 
+    # in the other result are moved rather than copied.
+    def merge (self, result):
+        for label, group in result.groups.iteritems():
+            if label in self.groups:
+                self.groups[ label ].merge(group)
+            else:
+                self.groups[ label ] = group
     
     # Get the results for a group given the label
     def get_group (self, label):
@@ -135,14 +230,8 @@ class Group:
     
     # Convert the contents to a string
     def __str__(self):
-        string_out = "( Group: label '" + self.label + "': "
-        group_info = ""
-        for entry in sorted(self.gtypes.items()):
-            if len(group_info) > 0:
-                group_info += ", "
-            group_info += entry[0] + "=" + str(entry[1])   
-        string_out += group_info + " )"
-        return string_out
+        group_info = ", ".join(entry[0] + "=" + str(entry[1]) for entry in sorted(self.gtypes.items()))
+        return "( Group: label '" + self.label + "': " + group_info + " )"
     
     # print contents
     def print_contents(self):
@@ -160,12 +249,27 @@ class Group:
     def get_label (self):
         return self.label
     
-    # Add a single genotype instance for the group    
-    def add_genotype (self, gtype):
+    # Add a single genotype instance, or count instances, for the group    
+    def add_genotype (self, gtype, count = 1):
         if gtype in self.gtypes:
-            self.gtypes[gtype] += 1
+            self.gtypes[gtype] += count
         else:
-            self.gtypes[gtype] = 1
+            self.gtypes[gtype] = count
+    
+    # Take away a single genotype instance, or count instances, from the group.  The genotype is
+    # removed once its count reaches zero.
+    def remove_genotype (self, gtype, count = 1):
+        self.gtypes[gtype] -= count
+        if self.gtypes[gtype] <= 0:
+            del self.gtypes[gtype]
+    
+    # Add the genotype counts from another group with the same label to this group
+    def merge (self, group):
+        for gtype, count in group.gtypes.iteritems():
+            if gtype in self.gtypes:
+                self.gtypes[gtype] += count
+            else:
+                self.gtypes[gtype] = count
     
     # Get the count of a single genotype in the group
     def get_count (self, gtype):
@@ -191,10 +295,30 @@ class Params:
         self.chromosomes = None
         self.pos_start = 0
         self.pos_end = sys.maxint
+        self.rsid_list = None
+        self.region_list = None
         self.show_lines_progress_interval = 0
         self.show_file_progress = False
         self.show_selected_files = False
+        self.workers = 1
+        self.cache_dir = None
+        self.matrix_dir = None
+        self.incremental = False
+        self.results_backend = "DICT"
+        self.harmonize = False
+        self.association_labels = []
+        self.show_summary = False
+        self.min_maf = None
+        self.min_call_rate = None
+        self.min_hwe_p = None
+        self.output_path = None
+        self.metrics_path = None
+        self.profile_dir = None
+        self.output_format = "TEXT"
+        self.sort_output = False
         self.file_groups = []
+        self.file_group_matcher = None
+        self.query_plan = None
         # {{0,"Default"}, ["*"]}
     
     # Convert the contents to a string
@@ -203,10 +327,28 @@ class Params:
         string_out += "\n   chromosomes " + str(self.chromosomes)
         string_out += "\n   pos_start " + str(self.pos_start) 
         string_out += "\n   pos_end " + str(self.pos_end) 
+        string_out += "\n   rsid_list " + str(self.rsid_list)
+        string_out += "\n   region_list " + str(self.region_list)
         string_out += "\n   show_file_progress " + str(self.show_file_progress) 
         string_out += "\n   show_selected_files " + str(self.show_selected_files) 
         string_out += "\n   show_lines_progress_interval " + str(self.show_lines_progress_interval) 
+        string_out += "\n   workers " + str(self.workers) 
         string_out += "\n   dir " + self.dir
+        string_out += "\n   cache_dir " + str(self.cache_dir)
+        string_out += "\n   matrix_dir " + str(self.matrix_dir)
+        string_out += "\n   incremental " + str(self.incremental)
+        string_out += "\n   results_backend " + self.results_backend
+        string_out += "\n   harmonize " + str(self.harmonize)
+        string_out += "\n   association_labels " + str(self.association_labels)
+        string_out += "\n   show_summary " + str(self.show_summary)
+        string_out += "\n   min_maf " + str(self.min_maf)
+        string_out += "\n   min_call_rate " + str(self.min_call_rate)
+        string_out += "\n   min_hwe_p " + str(self.min_hwe_p)
+        string_out += "\n   output_path " + str(self.output_path)
+        string_out += "\n   metrics_path " + str(self.metrics_path)
+        string_out += "\n   profile_dir " + str(self.profile_dir)
+        string_out += "\n   output_format " + self.output_format
+        string_out += "\n   sort_output " + str(self.sort_output)
         string_out += "\n   file groups:"
         for file_group in self.file_groups:
             string_out += str(file_group)  
@@ -221,6 +363,10 @@ class Params:
         else:
             self.chromosomes.append(chromosome)
     
+    # Add a file group label to compare in the association tests (see snp_association)
+    def add_association_label (self, label):
+        self.association_labels.append(label.strip())
+    
     # Add a file group
     def add_file_group (self, file_group):
         i = 0
@@ -234,7 +380,13 @@ class Params:
             i += 1
         if not inserted:
             self.file_groups.append(file_group)
+        self.file_group_matcher = None
                 
+    # Get the file group labels to compare in the association tests (see snp_association).  If
+    # empty, the counts are listed instead.
+    def get_association_labels (self):
+        return self.association_labels
+    
     # Get the chromosomes to include.  If None, all are included
     def get_chromosomes (self):
         return self.chromosomes
@@ -243,17 +395,84 @@ class Params:
     def get_directory_location (self):
         return self.dir
     
-    # If the filename passed in matches a file group, return the group label    
+    # Get the directory holding binary copies of parsed SNP files (see snp_cache).  If None, files
+    # are always parsed from the text.
+    def get_cache_directory (self):
+        return self.cache_dir
+    
+    # Get the directory holding the genotype matrix (see snp_matrix).  If None, there is no matrix.
+    def get_matrix_directory (self):
+        return self.matrix_dir
+    
+    # If True, parse_snps keeps its results in the cache directory and later runs with the same
+    # selections only parse files that are new or have changed (see snp_manifest)
+    def get_incremental (self):
+        return self.incremental
+    
+    # Get the labels of the file groups in priority sequence.  If there are no file groups, every
+    # file is in the Default group.
+    def get_file_group_labels (self):
+        if len(self.file_groups) == 0:
+            return ["Default"]
+        labels = []
+        for file_group in self.file_groups:
+            if file_group.get_label() not in labels:
+                labels.append(file_group.get_label())
+        return labels
+    
+    # If True, genotypes reported in different allele orders or from the opposite strand are
+    # counted together (see snp_harmonize)
+    def get_harmonize (self):
+        return self.harmonize
+    
+    # If the filename passed in matches a file group, return the group label.  The file groups'
+    # selectors are compiled into a FileGroupMatcher the first time a file is matched after a group
+    # is added, so add a group's selectors before adding the group.
     def get_file_group_label (self, file_name):
         label = "Default"
         if len(self.file_groups) > 0:
-            label = None
-            for file_group in self.file_groups:
-                if file_group.matches(file_name):
-                    label = file_group.get_label()
-                    break
+            if self.file_group_matcher == None:
+                self.file_group_matcher = FileGroupMatcher(self.file_groups)
+            label = self.file_group_matcher.get_label(file_name)
         return label
     
+    # Get the name of the container results are counted in: DICT for a ResultsSet of Result and Group
+    # instances, or ARRAY for an ArrayResultsSet of NumPy arrays (see snp_results)
+    def get_results_backend (self):
+        return self.results_backend
+    
+    # Get the file a JSON report of the run's metrics is written to (see snp_metrics), or None
+    def get_metrics_path (self):
+        return self.metrics_path
+    
+    # Get the lowest call rate a SNP must have in every group to be summarized or tested (see
+    # snp_summary).  If None, SNPs aren't filtered on call rate.
+    def get_min_call_rate (self):
+        return self.min_call_rate
+    
+    # Get the lowest Hardy-Weinberg equilibrium p-value a SNP must have in every group to be
+    # summarized or tested (see snp_summary).  If None, SNPs aren't filtered on HWE.
+    def get_min_hwe_p (self):
+        return self.min_hwe_p
+    
+    # Get the lowest minor allele frequency a SNP must have in every group to be summarized or
+    # tested (see snp_summary).  If None, SNPs aren't filtered on MAF.
+    def get_min_maf (self):
+        return self.min_maf
+    
+    # Get the format the counts are written in (see snp_writers)
+    def get_output_format (self):
+        return self.output_format
+    
+    # Get the file the counts are written to.  If None, they are written to the console.
+    def get_output_path (self):
+        return self.output_path
+    
+    # Get the directory profiles of the run are written to (see snp_profile).  If None, the run
+    # isn't profiled.
+    def get_profile_directory (self):
+        return self.profile_dir
+    
     # Get the ending chromosome position to include. Ignore all positions in chromosomes greater than this value.
     def get_position_end (self):
         return self.pos_end
@@ -262,16 +481,40 @@ class Params:
     def get_position_start (self):
         return self.pos_start
     
+    # Get the selections compiled into a QueryPlan.  The plan is compiled again when a selection
+    # has changed since it was last compiled.
+    def get_query_plan (self):
+        selections = (self.rsid, self.chromosomes, self.pos_start, self.pos_end, self.rsid_list, self.region_list)
+        if self.query_plan == None or not self.query_plan.is_for(*selections):
+            self.query_plan = QueryPlan(*selections)
+        return self.query_plan
+    
+    # Get the RegionList (see snp_filters) of the chromosome regions to include, or None to include every region
+    def get_region_list (self):
+        return self.region_list
+    
     # Get the pattern of RSIDs to process.  Allows the selections to be limited 
     # to one or more specific or all RSIDs. The value can be specified with 
     # wild cards. E.g. RSID10403190 or RSID104*
     def get_rsid (self):
         return self.rsid
     
+    # Get the RsidList (see snp_filters) of the RSIDs to include, or None to include every RSID
+    def get_rsid_list (self):
+        return self.rsid_list
+    
     # If True and get_show_lines_progress_interval is zero, show progress information as each new file is processed
     def get_show_file_progress (self):
         return self.show_file_progress
     
+    # If True, list the summary statistics of each SNP for each group instead of the counts (see snp_summary)
+    def get_show_summary (self):
+        return self.show_summary
+    
+    # If True, the counts are written in chromosome, position and rsid sequence (see snp_writers)
+    def get_sort_output (self):
+        return self.sort_output
+    
     # Get the line progress interval.  For example, if this value is 100, update the line progress every 100th line.
     def get_show_lines_progress_interval (self):
         return self.show_lines_progress_interval
@@ -281,25 +524,94 @@ class Params:
     def get_show_selected_files (self):
         return self.show_selected_files
     
+    # Get the number of processes to parse files with.  If 1, files are parsed in this process.
+    def get_workers (self):
+        return self.workers
+    
+    # Return True if any quality control thresholds are set (see snp_summary)
+    def has_quality_filters (self):
+        return self.min_maf != None or self.min_call_rate != None or self.min_hwe_p != None
+    
     # Determine whether a SnpValues instance should be processed
     def process (self, snp_values):
-        chromosome_ok = False
-        if(self.chromosomes):
-            for chromosome in self.chromosomes:
-                chromosome_ok = fnmatch.fnmatch(snp_values.get_chromosome(), chromosome)
-                if chromosome_ok:
-                    break;
-        else:
-            chromosome_ok = True
-        return fnmatch.fnmatch(snp_values.get_rsid(), self.rsid) \
-            and chromosome_ok \
-            and snp_values.get_position() >= self.pos_start \
-            and snp_values.get_position() <= self.pos_end
+        return self.get_query_plan().matches(snp_values)
+    
+    # Determine which rows of a SnpChunk should be processed.  Returns a NumPy boolean array 
+    # with the same selections as process applied to each row
+    def process_chunk (self, snp_chunk):
+        return self.get_query_plan().select_chunk(snp_chunk)
+    
+    # Return True if the selections are limited to some chromosomes, a range of positions or a list of regions
+    def is_region_query (self):
+        return self.chromosomes != None or self.pos_start > 0 or self.pos_end < sys.maxint or self.region_list != None
+    
+    # Get the codes (see snp_codes) of the chromosomes to include.  If None, all are included
+    def get_chromosome_codes (self):
+        if self.chromosomes == None:
+            return None
+        return [code for code, name in enumerate(chromosome_names) 
+                if any(fnmatch.fnmatch(name, chromosome) for chromosome in self.chromosomes)]
+    
+    # Match an array of RSIDs against the RSID pattern.  Returns a NumPy boolean array.
+    def match_rsids (self, rsids):
+        return self.get_query_plan().match_rsids(rsids)
     
     # Set the directory containing the SNP files.  E.g. 'C:\\OpenSNP'
     def set_directory_location (self, dir):
         self.dir = dir.strip()
     
+    # Set the directory holding binary copies of parsed SNP files (see snp_cache).  If None, files
+    # are always parsed from the text.
+    def set_cache_directory (self, cache_dir):
+        self.cache_dir = cache_dir.strip() if cache_dir else None
+    
+    # Set the directory holding the genotype matrix (see snp_matrix).  If None, there is no matrix.
+    def set_matrix_directory (self, matrix_dir):
+        self.matrix_dir = matrix_dir.strip() if matrix_dir else None
+    
+    # If True, genotypes reported in different allele orders or from the opposite strand are
+    # counted together (see snp_harmonize)
+    def set_harmonize (self, harmonize):
+        self.harmonize = harmonize
+    
+    # If True, parse_snps keeps its results in the cache directory and later runs with the same
+    # selections only parse files that are new or have changed (see snp_manifest)
+    def set_incremental (self, incremental):
+        self.incremental = incremental
+    
+    # Set the file a JSON report of the run's metrics is written to (see snp_metrics).  If None or
+    # empty, no report is written.
+    def set_metrics_path (self, metrics_path):
+        self.metrics_path = metrics_path.strip() if metrics_path else None
+    
+    # Set the lowest call rate a SNP must have in every group to be summarized or tested (see
+    # snp_summary).  If None, SNPs aren't filtered on call rate.
+    def set_min_call_rate (self, min_call_rate):
+        self.min_call_rate = min_call_rate
+    
+    # Set the lowest Hardy-Weinberg equilibrium p-value a SNP must have in every group to be
+    # summarized or tested (see snp_summary).  If None, SNPs aren't filtered on HWE.
+    def set_min_hwe_p (self, min_hwe_p):
+        self.min_hwe_p = min_hwe_p
+    
+    # Set the lowest minor allele frequency a SNP must have in every group to be summarized or
+    # tested (see snp_summary).  If None, SNPs aren't filtered on MAF.
+    def set_min_maf (self, min_maf):
+        self.min_maf = min_maf
+    
+    # Set the format the counts are written in (see snp_writers)
+    def set_output_format (self, output_format):
+        self.output_format = output_format.strip().upper()
+    
+    # Set the file the counts are written to.  If None or empty, they are written to the console.
+    def set_output_path (self, output_path):
+        self.output_path = output_path or None
+    
+    # Set the directory profiles of the run are written to (see snp_profile).  If None or empty,
+    # the run isn't profiled.
+    def set_profile_directory (self, profile_dir):
+        self.profile_dir = profile_dir.strip() if profile_dir else None
+    
     # Set the ending chromosome position to include. Ignore all positions in chromosomes greater than this value.
     def set_position_end (self, pos_end):
         self.pos_end = pos_end
@@ -308,16 +620,39 @@ class Params:
     def set_position_start (self, pos_start):
         self.pos_start = pos_start
     
+    # Set the name of the container results are counted in: DICT for a ResultsSet of Result and Group
+    # instances, or ARRAY for an ArrayResultsSet of NumPy arrays (see snp_results)
+    def set_results_backend (self, results_backend):
+        self.results_backend = results_backend.strip().upper()
+    
+    # Set the RegionList (see snp_filters) of the chromosome regions to include.  Only SNPs in one of
+    # the regions are processed.  If None, SNPs in every region are processed.
+    def set_region_list (self, region_list):
+        self.region_list = region_list
+    
     # Set pattern of RSIDs to process.  Allows the selections to be limited 
     # to one or more specific or all RSIDs. The value can be specified with 
     # wild cards. E.g. RSID10403190 or RSID104*
     def set_rsid (self, rsid):
         self.rsid = rsid.strip().upper()
     
+    # Set the RsidList (see snp_filters) of the RSIDs to include.  Only SNPs with one of the RSIDs
+    # that also match the RSID pattern are processed.  If None, every RSID is processed.
+    def set_rsid_list (self, rsid_list):
+        self.rsid_list = rsid_list
+    
     # If True and get_show_lines_progress_interval is zero, show progress information as each new file is processed
     def set_show_file_progress (self, show_file_progress):
         self.show_file_progress = show_file_progress
     
+    # If True, list the summary statistics of each SNP for each group instead of the counts (see snp_summary)
+    def set_show_summary (self, show_summary):
+        self.show_summary = show_summary
+    
+    # If True, the counts are written in chromosome, position and rsid sequence (see snp_writers)
+    def set_sort_output (self, sort_output):
+        self.sort_output = sort_output
+    
     # Set the line progress interval.  For example, if this value is 100, update the line progress every 100th line.
     def set_show_lines_progress_interval (self, show_lines_progress_interval):
         self.show_lines_progress_interval = show_lines_progress_interval
@@ -326,6 +661,10 @@ class Params:
     # If True, also list files with no data to process that passes the selections in this file    
     def set_show_selected_files (self, show_selected_files):
         self.show_selected_files = show_selected_files
+    
+    # Set the number of processes to parse files with.  If 1, files are parsed in this process.
+    def set_workers (self, workers):
+        self.workers = max(1, workers)
 
 ####################################################################################
 #
@@ -338,20 +677,21 @@ class FileGroup:
         self.label = label
         self.priority_seq = priority_seq
         self.files = []
+        self.matcher = None
     
     # Convert the contents to a string
     def __str__(self):
         string_out = "\n      ( FileGroup: label " + self.label
         string_out += ", priority_seq " + str(self.priority_seq) 
         string_out += ", file selectors:"
-        for entry in sorted(self.files):
-            string_out += "\n         " + entry   
+        string_out += "".join("\n         " + entry for entry in sorted(self.files))
         string_out += "\n      )"
         return string_out
     
     # Add a file selector to the group
     def add_file_selector (self, file_selector):
         self.files.append(file_selector.strip())
+        self.matcher = None
     
     # Get the file group label
     def get_label (self):
@@ -360,15 +700,247 @@ class FileGroup:
     # Get the file group priority sequence    
     def get_priority_seq (self):
         return self.priority_seq
-    
+
+    # Get the file selectors of the group
+    def get_file_selectors (self):
+        return self.files
+
     # Return True if the file name matches a file selector in this group
     def matches(self, file_name):
-        matches = False;
-        for file_selector in self.files:
-            if (fnmatch.fnmatch(file_name, file_selector)):
-                matches = True
+        if self.matcher == None:
+            self.matcher = FileGroupMatcher([self])
+        return self.matcher.get_label(file_name) != None
+
+####################################################################################
+#
+# Class matching file names against the file selectors of a list of file groups at
+# once.  Selectors for one user's files, such as user894_*.txt, are kept in a
+# dictionary by user id; the rest are combined into one regular expression.  Either
+# way, the first group with a selector matching a name is found, as if each
+# selector had been tried in turn with fnmatch.
+#
+####################################################################################
+class FileGroupMatcher:
+    # A selector for one user's files, with the user id and the ending after the *
+    user_selector_pattern = re.compile(r"user(\d+)_\*([^*?\[]*)$")
+    # The start of the name of a user's file
+    user_file_pattern = re.compile(r"user(\d+)_")
+
+    # Number of file groups with wildcard selectors compiled into one regular expression
+    batch_size = 99
+
+    # Constructor.  file_groups is a list of FileGroups in priority sequence.
+    def __init__(self, file_groups):
+        self.labels = [file_group.get_label() for file_group in file_groups]
+        self.user_selectors = {}
+        patterns = []
+        for index, file_group in enumerate(file_groups):
+            wildcards = []
+            for file_selector in file_group.get_file_selectors():
+                # Names are compared as fnmatch compares them
+                file_selector = os.path.normcase(file_selector)
+                match = FileGroupMatcher.user_selector_pattern.match(file_selector)
+                if match:
+                    self.user_selectors.setdefault(match.group(1), []).append((index, match.group(2)))
+                else:
+                    wildcards.append(FileGroupMatcher.translate(file_selector))
+            if len(wildcards) > 0:
+                patterns.append((index, "(?P<g" + str(index) + ">" + "|".join(wildcards) + ")"))
+        # Alternatives are tried in sequence, so the first group matching is the one found.  re
+        # allows at most 100 groups in a pattern, so the groups are compiled in batches, each a
+        # tuple of (index of its first group, regular expression), in priority sequence.
+        self.wildcards = []
+        for start in range(0, len(patterns), FileGroupMatcher.batch_size):
+            batch = patterns[start:start + FileGroupMatcher.batch_size]
+            self.wildcards.append((batch[0][0], re.compile("|".join(pattern for index, pattern in batch), re.S)))
+
+    # Translate a file selector to a regular expression matching the whole of a name, without the
+    # flags fnmatch adds so it can be combined with others
+    @staticmethod
+    def translate(file_selector):
+        pattern = fnmatch.translate(file_selector)
+        if pattern.endswith("(?ms)"):
+            pattern = pattern[:-len("(?ms)")]
+        return "(?:" + pattern + ")"
+
+    # Get the label of the first group with a selector matching a file name, or None if no
+    # selector matches
+    def get_label(self, file_name):
+        file_name = os.path.normcase(file_name)
+        found = len(self.labels)
+        match = FileGroupMatcher.user_file_pattern.match(file_name)
+        if match:
+            for index, ending in self.user_selectors.get(match.group(1), ()):
+                if file_name.endswith(ending) and len(file_name) - match.end() >= len(ending):
+                    found = index
+                    break
+        for first_index, wildcards in self.wildcards:
+            if first_index >= found:
                 break
-        return matches
+            match = wildcards.match(file_name)
+            if match:
+                found = min(found, int(match.lastgroup[1:]))
+                break
+        if found < len(self.labels):
+            return self.labels[found]
+        return None
+
+####################################################################################
+#
+# Class holding the selections of a Params compiled once so they can be applied to
+# many rows cheaply.  The chromosome patterns become a table of the chromosome codes
+# selected and one regular expression, and the RSID pattern an exact RSID, a prefix
+# or a regular expression.  An RsidList and RegionList (see snp_filters) further limit
+# the rows to the RSIDs and regions listed; a row must pass every selection.
+# select_fields applies the selections to the split fields of a block of lines before
+# they are converted, checking the cheapest first, so the rows a query rejects are
+# never converted or encoded.
+#
+####################################################################################
+class QueryPlan:
+    # Characters that make an RSID pattern a wildcard
+    wildcard_pattern = re.compile(r"[*?[]")
+
+    # Constructor.  chromosomes is a list of chromosome patterns, or None to select every chromosome.
+    # rsid_list and region_list are None to select every RSID and region.
+    def __init__(self, rsid, chromosomes, pos_start, pos_end, rsid_list = None, region_list = None):
+        self.rsid = rsid
+        self.chromosomes = list(chromosomes) if chromosomes != None else None
+        self.pos_start = pos_start
+        self.pos_end = pos_end
+        self.rsid_list = rsid_list
+        self.region_list = region_list
+        self.chromosome_mask = None
+        self.chromosome_mask_size = 0
+        self.chromosome_regex = None
+        if self.chromosomes:
+            self.chromosome_mask = np.zeros(code_count, dtype=bool)
+            self.chromosome_regex = re.compile("|".join(FileGroupMatcher.translate(chromosome) for chromosome in self.chromosomes), re.S)
+        self.rsid_exact = None
+        self.rsid_prefix = None
+        self.rsid_regex = None
+        # Seconds spent selecting rows while files are parsed with the plan (see parse_lines)
+        self.select_seconds = 0.0
+        if not QueryPlan.wildcard_pattern.search(rsid):
+            self.rsid_exact = rsid
+        elif rsid.endswith("*") and not QueryPlan.wildcard_pattern.search(rsid.rstrip("*")):
+            # Patterns such as * select every RSID
+            self.rsid_prefix = rsid.rstrip("*") or None
+        else:
+            self.rsid_regex = re.compile(fnmatch.translate(rsid))
+
+    # Convert the contents to a string
+    def __str__(self):
+        return ("( QueryPlan: rsid " + self.rsid + ", chromosomes " + str(self.chromosomes) +
+                ", positions " + str(self.pos_start) + " to " + str(self.pos_end) + " )")
+
+    # Return True if the plan was compiled from these selections
+    def is_for(self, rsid, chromosomes, pos_start, pos_end, rsid_list = None, region_list = None):
+        return (self.rsid == rsid and self.chromosomes == chromosomes and
+                self.pos_start == pos_start and self.pos_end == pos_end and
+                self.rsid_list is rsid_list and self.region_list is region_list)
+
+    # Return True if the plan rejects any rows
+    def is_selective(self):
+        return self.selects_chromosomes() or self.selects_positions() or self.selects_rsids() or self.selects_regions()
+
+    # Return True if only some chromosomes are selected
+    def selects_chromosomes(self):
+        return self.chromosome_mask is not None
+
+    # Get a NumPy boolean array indexed by chromosome code, True for the codes of the selected
+    # chromosomes.  Chromosomes given codes since it was last called are matched first.
+    def get_chromosome_mask(self):
+        for code in range(self.chromosome_mask_size, len(chromosome_names)):
+            self.chromosome_mask[code] = self.chromosome_regex.match(chromosome_names[code]) != None
+        self.chromosome_mask_size = len(chromosome_names)
+        return self.chromosome_mask
+
+    # Return True if only a range of positions is selected
+    def selects_positions(self):
+        return self.pos_start > 0 or self.pos_end < sys.maxint
+
+    # Return True if only some RSIDs are selected
+    def selects_rsids(self):
+        return self.rsid_exact != None or self.rsid_prefix != None or self.rsid_regex != None or self.rsid_list != None
+
+    # Return True if only a list of regions is selected
+    def selects_regions(self):
+        return self.region_list != None
+
+    # Match an array of RSIDs against the RSID pattern and list.  Returns a NumPy boolean array.
+    # Exact RSIDs and prefixes such as RS104* are compared directly; other patterns use the regex.
+    def match_rsids(self, rsids):
+        if self.rsid_exact != None:
+            mask = rsids == self.rsid_exact
+        elif self.rsid_prefix != None:
+            mask = np.char.startswith(rsids, self.rsid_prefix)
+        elif self.rsid_regex != None:
+            regex = self.rsid_regex
+            mask = np.fromiter((regex.match(value) != None for value in rsids), dtype=bool, count=len(rsids))
+        else:
+            mask = np.ones(len(rsids), dtype=bool)
+        if self.rsid_list != None:
+            mask &= self.rsid_list.match(rsids)
+        return mask
+
+    # Determine whether a SnpValues instance is selected.  Chromosomes are matched by name.
+    def matches(self, snp_values):
+        position = snp_values.get_position()
+        if position < self.pos_start or position > self.pos_end:
+            return False
+        if self.chromosome_regex != None and self.chromosome_regex.match(snp_values.get_chromosome()) == None:
+            return False
+        if self.region_list != None and not self.region_list.contains(get_chromosome_code(snp_values.get_chromosome()), position):
+            return False
+        rsid = snp_values.get_rsid()
+        if self.rsid_list != None and not self.rsid_list.contains(rsid):
+            return False
+        if self.rsid_exact != None:
+            return rsid == self.rsid_exact
+        if self.rsid_prefix != None:
+            return rsid.startswith(self.rsid_prefix)
+        if self.rsid_regex != None:
+            return self.rsid_regex.match(rsid) != None
+        return True
+
+    # Determine which rows of a SnpChunk are selected.  Returns a NumPy boolean array.
+    def select_chunk(self, snp_chunk):
+        mask = np.ones(len(snp_chunk), dtype=bool)
+        if self.selects_chromosomes():
+            mask &= self.get_chromosome_mask()[snp_chunk.get_chromosome_codes()]
+        positions = snp_chunk.get_positions()
+        if self.pos_start > 0:
+            mask &= positions >= self.pos_start
+        if self.pos_end < sys.maxint:
+            mask &= positions <= self.pos_end
+        if self.selects_rsids():
+            mask &= self.match_rsids(snp_chunk.get_rsids())
+        if self.selects_regions():
+            mask &= self.region_list.match(snp_chunk.get_chromosome_codes(), positions)
+        return mask
+
+    # Select the rows of a block from its split fields, selecting the same rows as select_chunk.
+    # chromosome_codes are encoded (see snp_codes) while rsids and positions can still be strings.
+    # Each selection only looks at the rows the ones before it kept, and positions are only
+    # converted for rows of the selected chromosomes and RSIDs.  Returns a tuple of (the indexes of
+    # the rows selected, their positions as a NumPy int32 array).
+    def select_fields(self, rsids, chromosome_codes, positions):
+        rows = np.arange(len(rsids))
+        if self.selects_chromosomes():
+            rows = rows[self.get_chromosome_mask()[chromosome_codes]]
+        if self.selects_rsids():
+            rows = rows[self.match_rsids(rsids[rows])]
+        selected_positions = np.asarray(positions[rows]).astype(np.int32)
+        if self.selects_positions():
+            found = (selected_positions >= self.pos_start) & (selected_positions <= self.pos_end)
+            rows = rows[found]
+            selected_positions = selected_positions[found]
+        if self.selects_regions():
+            found = self.region_list.match(chromosome_codes[rows], selected_positions)
+            rows = rows[found]
+            selected_positions = selected_positions[found]
+        return (rows, selected_positions)
 
 ####################################################################################
 #
@@ -409,6 +981,123 @@ class SnpValues:
     def get_genotype (self):
         return self.genotype
 
+####################################################################################
+#
+# Immutable class holding a block of parsed SNP file lines as NumPy columns.  
+# Chromosomes and genotypes are held as codes (see snp_codes).
+#
+####################################################################################
+class SnpChunk:
+    
+    # Constructor.  valid is False if the lines following the chunk couldn't be parsed, and reason
+    # then says why.  lines_read is the number of file lines the chunk was parsed from.
+    def __init__(self, rsids, chromosome_codes, positions, genotype_codes, valid = True, lines_read = 0, reason = None):
+        self.rsids = rsids
+        self.chromosome_codes = chromosome_codes
+        self.positions = positions
+        self.genotype_codes = genotype_codes
+        self.valid = valid
+        self.lines_read = lines_read
+        self.reason = reason
+    
+    # Create a chunk from arrays of strings as read from a file
+    @staticmethod
+    def from_strings(rsids, chromosomes, positions, genotypes, valid = True, lines_read = 0, reason = None):
+        return SnpChunk(np.asarray(rsids, dtype="S"), encode_chromosomes(chromosomes), 
+                        np.asarray(positions).astype(np.int32), encode_genotypes(genotypes), valid, lines_read, reason)
+    
+    # Create a chunk from a list of SnpValues instances
+    @staticmethod
+    def from_snp_values(snp_values_list, valid = True, lines_read = 0, reason = None):
+        return SnpChunk.from_strings([snp_values.get_rsid() for snp_values in snp_values_list],
+                                     [snp_values.get_chromosome() for snp_values in snp_values_list],
+                                     [snp_values.get_position() for snp_values in snp_values_list],
+                                     [snp_values.get_genotype() for snp_values in snp_values_list],
+                                     valid, lines_read, reason)
+    
+    # Create an empty chunk that isn't valid because a block of lines had more distinct chromosome
+    # or genotype names than the code tables can hold.  error is the CodeTableFullError raised.
+    @staticmethod
+    def from_full_code_table(error, lines_read = 0):
+        return SnpChunk.from_strings([], [], [], [], False, lines_read,
+                                     "too many distinct genotype/chromosome names (" + str(error) + ")")
+    
+    # Join a list of chunks into one chunk.  The result is valid if all the chunks are valid, and
+    # has the reason of the first that isn't.
+    @staticmethod
+    def concatenate(snp_chunks):
+        if len(snp_chunks) == 0:
+            return SnpChunk.from_strings([], [], [], [])
+        return SnpChunk(np.concatenate([snp_chunk.get_rsids() for snp_chunk in snp_chunks]),
+                        np.concatenate([snp_chunk.get_chromosome_codes() for snp_chunk in snp_chunks]),
+                        np.concatenate([snp_chunk.get_positions() for snp_chunk in snp_chunks]),
+                        np.concatenate([snp_chunk.get_genotype_codes() for snp_chunk in snp_chunks]),
+                        all(snp_chunk.is_valid() for snp_chunk in snp_chunks),
+                        sum(snp_chunk.get_lines_read() for snp_chunk in snp_chunks),
+                        next((snp_chunk.get_reason() for snp_chunk in snp_chunks if not snp_chunk.is_valid()), None))
+    
+    # Get the state to pickle as plain arrays, with the names of the codes since they can differ
+    # in the process the chunk is unpickled in (see snp_codes.CodeTable)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ["rsids", "chromosome_codes", "positions", "genotype_codes"]:
+            state[name] = np.asarray(state[name])
+        state["code_names"] = get_code_names()
+        return state
+    
+    # Restore a pickled chunk, translating its codes to the codes of this process
+    def __setstate__(self, state):
+        code_names = state.pop("code_names", None)
+        self.__dict__.update(state)
+        self.chromosome_codes, self.genotype_codes = import_codes(code_names, self.chromosome_codes, self.genotype_codes)
+    
+    # Get the number of rows in the chunk
+    def __len__(self):
+        return len(self.rsids)
+    
+    # Convert the contents to a string
+    def __str__(self):
+        return "( SnpChunk: " + str(len(self)) + " rows, valid " + str(self.valid) + " )"
+    
+    # Get the RSIDs as a NumPy string array
+    def get_rsids (self):
+        return self.rsids
+    
+    # Get the chromosome codes as a NumPy array
+    def get_chromosome_codes (self):
+        return self.chromosome_codes
+    
+    # Get the positions as a NumPy array
+    def get_positions (self):
+        return self.positions
+    
+    # Get the genotype codes as a NumPy array
+    def get_genotype_codes (self):
+        return self.genotype_codes
+    
+    # Get the number of file lines the chunk was parsed from
+    def get_lines_read (self):
+        return self.lines_read
+    
+    # False if a line following the rows in this chunk couldn't be parsed
+    def is_valid (self):
+        return self.valid
+    
+    # Get why the chunk isn't valid, or None
+    def get_reason (self):
+        return self.reason
+    
+    # Get a new chunk holding the rows selected by a NumPy boolean array or array of indexes
+    def select (self, selection):
+        return SnpChunk(self.rsids[selection], self.chromosome_codes[selection], self.positions[selection],
+                        self.genotype_codes[selection], self.valid, self.lines_read, self.reason)
+    
+    # Get the rows as a list of (rsid, chromosome, position, genotype) tuples with the same 
+    # values a SnpValues instance would hold
+    def get_rows (self):
+        return zip(self.rsids.tolist(), decode_chromosomes(self.chromosome_codes).tolist(),
+                   self.positions.tolist(), decode_genotypes(self.genotype_codes).tolist())
+
 ####################################################################################
 #
 # Abstract class defining methods to process SNP files
@@ -416,6 +1105,9 @@ class SnpValues:
 ####################################################################################
 class AbstractSNPProcessor(object):
     
+    # A regular expression matching a header line naming the columns, or None if the files have none
+    header_pattern = None
+    
     # Return true if this processor is appropriate for the file passed in
     def handles_file(self, filename):
         raise NotImplementedError("Should have implemented parse_line")
@@ -428,6 +1120,130 @@ class AbstractSNPProcessor(object):
     def parse_line(self, line):
         raise NotImplementedError("Should have implemented parse_line")
     
+    # Get the function parsing one line of a layout returned by sniff_layout.  Processors with one
+    # layout parse every line with parse_line.
+    def get_line_parser(self, layout):
+        return self.parse_line
+    
+    # Work out the layout of a file from its first block of lines, after any header.  Returns the
+    # layout passed to parse_lines for every block of the file, or None if the first line of data
+    # can't be read.  Processors with one layout use their file type label as the layout.
+    def sniff_layout(self, lines):
+        line = AbstractSNPProcessor.get_first_data_line(lines)
+        if line != None and self.parse_line(line) == None:
+            return None
+        return self.get_file_type_label()
+    
+    # Get the first line of a block that isn't a comment, or None if there is none
+    @staticmethod
+    def get_first_data_line(lines):
+        return next((line for line in lines if not line.startswith("#")), None)
+    
+    # Turn a header line at the start of a file's first block into a comment, so it's counted in
+    # the lines read but not parsed.  Returns the lines.
+    def skip_header(self, lines):
+        if self.header_pattern != None:
+            for index, line in enumerate(lines):
+                if not line.startswith("#"):
+                    if self.header_pattern.match(line):
+                        lines[index] = "#" + line
+                    break
+        return lines
+    
+    # Parse a block of SNP file lines into a SnpChunk.  Comment lines are ignored.  If a line 
+    # can't be parsed, the chunk holds the lines before it and is flagged as not valid.  layout is
+    # returned by sniff_layout; the lines are parsed with parse_line if it is None.  If a QueryPlan
+    # is passed, the chunk only holds the rows it selects.  If the lines have more distinct
+    # chromosome or genotype names than can be coded, the chunk is empty and not valid.
+    # Subclasses override this with a faster version and fall back to it for unusual blocks.
+    def parse_lines(self, lines, layout = None, plan = None):
+        parse_line = self.get_line_parser(layout) if layout != None else self.parse_line
+        snp_values_list = []
+        valid = True
+        reason = None
+        for line in lines:
+            if not line.startswith("#"):
+                snp_values = parse_line(line)
+                if ( snp_values == None ) or ( len(snp_values.get_rsid()) > 20 ):
+                    valid = False
+                    reason = "can't parse the line " + repr(line.rstrip("\r\n"))
+                    break
+                snp_values_list.append(snp_values)
+        try:
+            snp_chunk = SnpChunk.from_snp_values(snp_values_list, valid, len(lines), reason)
+        except CodeTableFullError as error:
+            return SnpChunk.from_full_code_table(error, len(lines))
+        if plan != None and plan.is_selective():
+            started = time.time()
+            snp_chunk = snp_chunk.select(plan.select_chunk(snp_chunk))
+            plan.select_seconds += time.time() - started
+        return snp_chunk
+    
+    # Read an open SNP file in blocks of about chunk_size bytes and yield a SnpChunk for each block.
+    # The layout is worked out once from the first block.  If it can't be, a single empty chunk
+    # that isn't valid is yielded.  Reading stops after a chunk that isn't valid.  If a QueryPlan is
+    # passed, each chunk only holds the rows it selects (see chunk_from_columns).
+    def parse_file(self, f, chunk_size = 4194304, plan = None):
+        lines = self.skip_header(f.readlines(chunk_size))
+        layout = self.sniff_layout(lines)
+        if layout == None:
+            line = AbstractSNPProcessor.get_first_data_line(lines)
+            yield SnpChunk.from_strings([], [], [], [], False, len(lines), 
+                                        "no " + self.get_file_type_label() + " layout matches the line " + repr(line.rstrip("\r\n")))
+            return
+        while lines:
+            snp_chunk = self.parse_lines(lines, layout, plan)
+            yield snp_chunk
+            if not snp_chunk.is_valid():
+                break
+            lines = f.readlines(chunk_size)
+    
+    # Split a block of lines into a 2-D NumPy array of stripped fields with field_count columns,
+    # after removing any characters in delete_chars.  Fields keep the case they are written in.
+    # Comment lines are dropped.  Returns None if the lines don't all split into field_count fields.
+    def split_lines(self, lines, separator, field_count, delete_chars = None):
+        text = "".join(lines)
+        if "#" in text:
+            lines = [line for line in lines if not line.startswith("#")]
+            text = "".join(lines)
+        text = text.translate(None, "\r" + (delete_chars or ""))
+        fields = text.replace("\n", separator).split(separator)
+        if fields[-1] == "":
+            fields.pop()
+        if len(lines) == 0 or len(fields) != len(lines) * field_count:
+            return None
+        fields = np.array(fields).reshape(-1, field_count)
+        if separator != " " and " " in text:
+            fields = np.char.strip(fields)
+        return fields
+    
+    # Build a SnpChunk from columns of split fields, checking them the way parse_lines does.
+    # RSIDs and genotypes are upper-cased as SnpValues does, while chromosomes are kept as they
+    # are written.  Returns None if any row fails so the caller can fall back to parse_lines, or
+    # an empty chunk that isn't valid if the block has too many names to code.  If
+    # a QueryPlan is passed, every row is checked but only the rows it selects are converted.
+    def chunk_from_columns(self, rsids, chromosomes, positions, genotypes, lines_read, plan = None):
+        if rsids.dtype.itemsize > 20 and np.char.str_len(rsids).max() > 20:
+            return None
+        rsids = upper_case(rsids)
+        # Check the positions before converting them.  NumPy doesn't always raise an error
+        # when a large string array can't be converted to integers.
+        if positions.dtype.kind == "S" and not np.char.isdigit(positions).all():
+            return None
+        try:
+            if plan != None and plan.is_selective():
+                chromosome_codes = encode_chromosomes(chromosomes)
+                started = time.time()
+                rows, selected_positions = plan.select_fields(rsids, chromosome_codes, positions)
+                plan.select_seconds += time.time() - started
+                return SnpChunk(np.asarray(rsids[rows], dtype="S"), chromosome_codes[rows], selected_positions,
+                                encode_genotypes(genotypes[rows]), True, lines_read)
+            return SnpChunk.from_strings(rsids, chromosomes, positions, genotypes, True, lines_read)
+        except CodeTableFullError as error:
+            return SnpChunk.from_full_code_table(error, lines_read)
+        except ValueError:
+            return None
+    
     # Get a processor given the file name
     @staticmethod
     def get_processor(filename):
@@ -470,6 +1286,16 @@ class TwentyThreeAndMeSNPProcessor(AbstractSNPProcessor):
             except ValueError:
                 pass  # Nothing to do.  Returning None handles the issue
         return snp_values
+    
+    # Parse a block of SNP file lines into a SnpChunk
+    def parse_lines(self, lines, layout = None, plan = None):
+        snp_chunk = None
+        fields = self.split_lines(lines, "\t", 4)
+        if fields is not None:
+            snp_chunk = self.chunk_from_columns(fields[:, 0], fields[:, 1], fields[:, 2], fields[:, 3], len(lines), plan)
+        if snp_chunk == None:
+            snp_chunk = AbstractSNPProcessor.parse_lines(self, lines, layout, plan)
+        return snp_chunk
 
 ####################################################################################
 #
@@ -478,6 +1304,9 @@ class TwentyThreeAndMeSNPProcessor(AbstractSNPProcessor):
 ####################################################################################
 class IlluminaSNPProcessor(AbstractSNPProcessor):
     
+    # FTDNA files can start with a line naming the columns
+    header_pattern = re.compile(r'"?RSID"?[,\t ]', re.I)
+    
     # Constructor
     def __init__(self):
         pass
@@ -490,34 +1319,96 @@ class IlluminaSNPProcessor(AbstractSNPProcessor):
     def get_file_type_label(self):
         return "illumina"
     
-    # Parse a SNP file line of data for this file type
+    # Parse a SNP file line of data for this file type, working out which layout it has
     def parse_line(self, line):
-        snp_values = None
-        try:
-            # illumina can have two structures:
-            if (line[0:1] == "\""):
-                # RSID,CHROMOSOME,POSITION,RESULT
-                # "rs3094315","1","742429","AA"
-                data = map(strip_quotes, line.strip().split(",")) 
-                if (len(data) == 4):
-                    snp_values = SnpValues(data[0], data[1], int(data[2]), data[3])
-            else:
-                # rsid        chromosome   position    allele1    allele2
-                # rs4477212        1        82154    T    T
-                data = line.strip().split("\t")
-                if (len(data) == 5):
-                    # Example user1035_file518_yearofbirth_1986_sex_XX.ftdna-illumina.txt
-                    snp_values = SnpValues(data[0], data[1], int(data[2]), data[3] + data[4])
-                else:
-                    # rsid chromosome position allele1 allele2
-                    # rs11240777 1 788822 AA
-                    data = line.strip().split(" ")
-                    if (len(data) == 4):
-                        # Example user981_file487_yearofbirth_1966_sex_unknown.ftdna-illumina.txt
-                        snp_values = SnpValues(data[0], data[1], int(data[2]), data[3])
-        except ValueError:
-            pass  # Nothing to do.  Returning None handles the issue
-        return snp_values
+        layout = self.get_line_layout(line)
+        if layout == None:
+            return None
+        return self.get_line_parser(layout)(line)
+    
+    # Get the layout of a line: "quoted", "tab" or "space" (see the parse_*_line methods), or None
+    # if it has none of them
+    def get_line_layout(self, line):
+        if line[0:1] == "\"":
+            if len(line.split(",")) == 4:
+                return "quoted"
+        elif len(line.strip().split("\t")) == 5:
+            return "tab"
+        elif len(line.strip().split(" ")) == 4:
+            return "space"
+        return None
+    
+    # Work out the layout of a file from its first line of data (see get_line_layout)
+    def sniff_layout(self, lines):
+        line = AbstractSNPProcessor.get_first_data_line(lines)
+        if line == None:
+            return "quoted"
+        return self.get_line_layout(line)
+    
+    # Get the function parsing one line of a layout
+    def get_line_parser(self, layout):
+        return {"quoted": self.parse_quoted_line, "tab": self.parse_tab_line, "space": self.parse_space_line}[layout]
+    
+    # Parse a line of quoted, comma-separated values:
+    # RSID,CHROMOSOME,POSITION,RESULT
+    # "rs3094315","1","742429","AA"
+    def parse_quoted_line(self, line):
+        data = line.strip().replace("\"", "").split(",")
+        if len(data) == 4:
+            try:
+                return SnpValues(data[0], data[1], int(data[2]), data[3])
+            except ValueError:
+                pass  # Nothing to do.  Returning None handles the issue
+        return None
+    
+    # Parse a line of tab-separated values with an allele in each of the last two columns:
+    # rsid        chromosome   position    allele1    allele2
+    # rs4477212        1        82154    T    T
+    # Example user1035_file518_yearofbirth_1986_sex_XX.ftdna-illumina.txt
+    def parse_tab_line(self, line):
+        data = line.strip().split("\t")
+        if len(data) == 5:
+            try:
+                return SnpValues(data[0], data[1], int(data[2]), data[3] + data[4])
+            except ValueError:
+                pass  # Nothing to do.  Returning None handles the issue
+        return None
+    
+    # Parse a line of space-separated values:
+    # rsid chromosome position genotype
+    # rs11240777 1 788822 AA
+    # Example user981_file487_yearofbirth_1966_sex_unknown.ftdna-illumina.txt
+    def parse_space_line(self, line):
+        data = line.strip().split(" ")
+        if len(data) == 4:
+            try:
+                return SnpValues(data[0], data[1], int(data[2]), data[3])
+            except ValueError:
+                pass  # Nothing to do.  Returning None handles the issue
+        return None
+    
+    # Parse a block of SNP file lines into a SnpChunk.  If no layout is passed it is taken from the
+    # first line of the block.
+    def parse_lines(self, lines, layout = None, plan = None):
+        snp_chunk = None
+        if layout == None:
+            layout = self.sniff_layout(lines)
+        if layout == "quoted":
+            fields = self.split_lines(lines, ",", 4, "\"")
+            if fields is not None:
+                snp_chunk = self.chunk_from_columns(fields[:, 0], fields[:, 1], fields[:, 2], fields[:, 3], len(lines), plan)
+        elif layout == "tab":
+            fields = self.split_lines(lines, "\t", 5)
+            if fields is not None:
+                snp_chunk = self.chunk_from_columns(fields[:, 0], fields[:, 1], fields[:, 2], 
+                                                    np.char.add(fields[:, 3], fields[:, 4]), len(lines), plan)
+        elif layout == "space":
+            fields = self.split_lines(lines, " ", 4)
+            if fields is not None:
+                snp_chunk = self.chunk_from_columns(fields[:, 0], fields[:, 1], fields[:, 2], fields[:, 3], len(lines), plan)
+        if snp_chunk == None:
+            snp_chunk = AbstractSNPProcessor.parse_lines(self, lines, layout, plan)
+        return snp_chunk
 
 ####################################################################################
 #
@@ -551,6 +1442,20 @@ class IYGSNPProcessor(AbstractSNPProcessor):
             except ValueError:
                 pass  # Nothing to do.  Returning None handles the issue
         return snp_values
+    
+    # Parse a block of SNP file lines into a SnpChunk
+    def parse_lines(self, lines, layout = None, plan = None):
+        snp_chunk = None
+        fields = None
+        if not any("\"" in line for line in lines):
+            fields = self.split_lines(lines, "\t", 2)
+        if fields is not None:
+            count = len(fields)
+            snp_chunk = self.chunk_from_columns(fields[:, 0], np.zeros(count, dtype="S1"), np.zeros(count, dtype=np.int32), 
+                                                fields[:, 1], len(lines), plan)
+        if snp_chunk == None:
+            snp_chunk = AbstractSNPProcessor.parse_lines(self, lines, layout, plan)
+        return snp_chunk
 
 ####################################################################################
 #
@@ -559,6 +1464,9 @@ class IYGSNPProcessor(AbstractSNPProcessor):
 ####################################################################################
 class DecodeMeSNPProcessor(AbstractSNPProcessor):
     
+    # decodeme files can start with a line naming the columns
+    header_pattern = re.compile(r"NAME,VARIATION,", re.I)
+    
     # Constructor
     def __init__(self):
         pass
@@ -571,7 +1479,8 @@ class DecodeMeSNPProcessor(AbstractSNPProcessor):
     def get_file_type_label(self):
         return "decodeme"
     
-    # Parse a SNP file line of data for this file type
+    # Parse a SNP file line of data for this file type.  Genotypes reported on the - strand are
+    # complemented so every genotype is on the + strand.
     def parse_line(self, line):
         # decodeme structure:
         # Name,Variation,Chromosome,Position,Strand,YourCode
@@ -580,11 +1489,28 @@ class DecodeMeSNPProcessor(AbstractSNPProcessor):
         data = line.strip().split(",")
         if (len(data) == 6):
             try:
-                snp_values = SnpValues(data[0], data[2], int(data[3]), data[5])
+                genotype = data[5]
+                if data[4].strip() == "-":
+                    genotype = genotype.upper().translate(complement_translation)
+                snp_values = SnpValues(data[0], data[2], int(data[3]), genotype)
             except ValueError:
                 pass  # Nothing to do.  Returning None handles the issue
         return snp_values
     
+    # Parse a block of SNP file lines into a SnpChunk
+    def parse_lines(self, lines, layout = None, plan = None):
+        snp_chunk = None
+        fields = self.split_lines(lines, ",", 6)
+        if fields is not None:
+            genotypes = fields[:, 5]
+            minus_strand = fields[:, 4] == "-"
+            if minus_strand.any():
+                genotypes = np.where(minus_strand, np.char.translate(upper_case(genotypes), complement_translation), genotypes)
+            snp_chunk = self.chunk_from_columns(fields[:, 0], fields[:, 2], fields[:, 3], genotypes, len(lines), plan)
+        if snp_chunk == None:
+            snp_chunk = AbstractSNPProcessor.parse_lines(self, lines, layout, plan)
+        return snp_chunk
+    
 
 ####################################################################################
 #
@@ -593,6 +1519,17 @@ class DecodeMeSNPProcessor(AbstractSNPProcessor):
 ####################################################################################
 processors = [ TwentyThreeAndMeSNPProcessor(), IlluminaSNPProcessor(), IYGSNPProcessor(), DecodeMeSNPProcessor() ]
 
+# Translation of upper case genotype strings to the opposite strand
+complement_translation = string.maketrans("ACGT", "TGCA")
+
+# Upper-case a NumPy array of byte strings.  Only the ASCII letters are changed, a byte at a time,
+# which is quicker than np.char.upper.  Returns a new array.
+def upper_case(values):
+    values = np.array(values, dtype="S")
+    letters = values.view(np.uint8)
+    letters[(letters >= ord("a")) & (letters <= ord("z"))] -= 32
+    return values
+
 def strip(string):
     if string != None:
         string = string.strip()
@@ -4,7 +4,11 @@ This program is designed to test the classes in snp_classes
 Author: David Gray
 """
 import sys
+import StringIO
+import cPickle
+import snp_codes
 from snp_classes import *
+from snp_filters import RsidList, RegionList
 import unittest
 
 ####################################################################################
@@ -55,6 +59,20 @@ class ResultsSet_test(unittest.TestCase):
         self.assertTrue("RS12345" in output_string)
         self.assertTrue("chromosome 1," in output_string)
         self.assertTrue("123456" in output_string)
+        
+    def test_merge(self):
+        self.results_set.get_or_create_result('RS12345', 1, 123456).add_one("Group 1", "AA")
+        other = ResultsSet()
+        other.get_or_create_result('RS12345', 1, 123456).add_one("Group 1", "AA")
+        other.get_or_create_result('RS12345', 1, 123456).add_one("Group 2", "AG")
+        other.get_or_create_result('RS99999', 3, 5).add_one("Group 1", "CC")
+        self.results_set.merge(other)
+        self.assertEqual(5, len(self.results_set))
+        result = self.results_set.get_or_create_result('RS12345', 1, 123456)
+        self.assertEqual(2, result.get_group("Group 1").get_count("AA"))
+        self.assertEqual(1, result.get_group("Group 2").get_count("AG"))
+        result = self.results_set.get_or_create_result('RS99999', 3, 5)
+        self.assertEqual(1, result.get_group("Group 1").get_count("CC"))
 
 ####################################################################################
 #
@@ -151,6 +169,16 @@ class Group_test(unittest.TestCase):
         output_string = str(group)
         self.assertTrue("AA=2" in output_string)
         self.assertTrue("AT=2" in output_string)
+        
+    def test_merge(self):
+        group = self.group
+        group.add_genotype("AA")
+        other = Group("Group 1")
+        other.add_genotype("AA")
+        other.add_genotype("CT")
+        group.merge(other)
+        self.assertEqual(2, group.get_count("AA"))
+        self.assertEqual(1, group.get_count("CT"))
 
 ####################################################################################
 #
@@ -170,6 +198,7 @@ class Params_test(unittest.TestCase):
         self.assertEqual(0, self.params.get_show_lines_progress_interval())
         self.assertEqual(False, self.params.get_show_selected_files())
         self.assertEqual(None, self.params.get_chromosomes())
+        self.assertEqual(1, self.params.get_workers())
         
     def test_process(self):
         # Default should process all SNPs
@@ -200,6 +229,33 @@ class Params_test(unittest.TestCase):
         self.assertTrue(self.params.process(SnpValues("RS12345", "5", 125646, "AA")))
         self.assertFalse(self.params.process(SnpValues("RS22222", "3", 125646, "AA")))
         
+    def test_process_chunk(self):
+        snp_chunk = SnpChunk.from_strings(["RS12345", "RS22222", "RS12399", "RS12345"], ["4", "4", "5", "X"],
+                                          ["125646", "199", "250", "220"], ["AA", "AG", "--", "A"])
+        # Default should process all SNPs
+        self.assertEqual([True, True, True, True], self.params.process_chunk(snp_chunk).tolist())
+        
+        # Test RSID match
+        self.params.set_rsid("RS12*")
+        self.assertEqual([True, False, True, True], self.params.process_chunk(snp_chunk).tolist())
+        self.params.set_rsid("RS12345")
+        self.assertEqual([True, False, False, True], self.params.process_chunk(snp_chunk).tolist())
+        self.params.set_rsid("RS1?3*")
+        self.assertEqual([True, False, True, True], self.params.process_chunk(snp_chunk).tolist())
+        self.params.set_rsid("**")
+        
+        # Test position match
+        self.params.set_position_start(200)
+        self.params.set_position_end(250)
+        self.assertEqual([False, False, True, True], self.params.process_chunk(snp_chunk).tolist())
+        self.params.set_position_start(0)
+        self.params.set_position_end(sys.maxint)
+        
+        # Test chromosome match
+        self.params.add_chromosome("4")
+        self.params.add_chromosome("X")
+        self.assertEqual([True, True, False, True], self.params.process_chunk(snp_chunk).tolist())
+        
     def test_set_directory_location(self):
         self.params.set_directory_location("C:\OpenSNP")
         self.assertEqual("C:\OpenSNP", self.params.get_directory_location())
@@ -232,6 +288,33 @@ class Params_test(unittest.TestCase):
         self.params.set_show_lines_progress_interval(10000)
         self.assertEqual(10000, self.params.get_show_lines_progress_interval())
         
+    def test_is_region_query(self):
+        self.assertFalse(self.params.is_region_query())
+        self.params.set_position_end(100)
+        self.assertTrue(self.params.is_region_query())
+        self.params.set_position_end(sys.maxint)
+        self.params.add_chromosome("X")
+        self.assertTrue(self.params.is_region_query())
+        self.assertEqual([chromosome_codes["X"]], self.params.get_chromosome_codes())
+        
+    def test_get_query_plan(self):
+        query_plan = self.params.get_query_plan()
+        self.assertFalse(query_plan.is_selective())
+        self.assertTrue(query_plan is self.params.get_query_plan())
+        # The plan is compiled again after a selection changes
+        self.params.set_rsid("RS12*")
+        self.assertTrue(self.params.get_query_plan().selects_rsids())
+        self.params.add_chromosome("X")
+        self.assertTrue(self.params.get_query_plan().selects_chromosomes())
+        self.params.add_chromosome("Y")
+        self.assertEqual(["X", "Y"], self.params.get_query_plan().chromosomes)
+        
+    def test_set_workers(self):
+        self.params.set_workers(8)
+        self.assertEqual(8, self.params.get_workers())
+        self.params.set_workers(0)
+        self.assertEqual(1, self.params.get_workers())
+        
     def test_add_chromosome(self):
         self.params.add_chromosome('1')
         self.params.add_chromosome('5')
@@ -256,6 +339,14 @@ class Params_test(unittest.TestCase):
         self.assertEqual("Group 2", self.params.get_file_group_label("file_with_bde_in_name"))
         self.assertEqual("Group 3", self.params.get_file_group_label("file_with_hij_in_name"))
         self.assertEqual(None, self.params.get_file_group_label("non_matching_file_name"))
+        self.assertEqual(["Group 1", "Group 2", "Group 3"], self.params.get_file_group_labels())
+        
+    def test_quality_filters(self):
+        self.assertEqual(["Default"], self.params.get_file_group_labels())
+        self.assertFalse(self.params.has_quality_filters())
+        self.params.set_min_call_rate(0.95)
+        self.assertEqual(0.95, self.params.get_min_call_rate())
+        self.assertTrue(self.params.has_quality_filters())
         
     def test_string_output(self):
         params = self.params
@@ -332,10 +423,144 @@ class FileGroup_test(unittest.TestCase):
         output_string = str(file_group)
         self.assertTrue("*abc*" in output_string)
         self.assertTrue("*def*" in output_string)
+
+    def test_selector_added_after_matching(self):
+        file_group = self.file_group
+        file_group.add_file_selector("user1_*.txt")
+        self.assertFalse(file_group.matches("user2_file3.txt"))
+        file_group.add_file_selector("user2_*.txt")
+        self.assertTrue(file_group.matches("user2_file3.txt"))
+
+####################################################################################
+#
+# Test FileGroupMatcher class
+#
+####################################################################################
+class FileGroupMatcher_test(unittest.TestCase):
+
+    def setUp(self):
+        group1 = FileGroup("Group 1", 1)
+        for file_selector in ["user10_*.txt", "user2_*", "*exome*"]:
+            group1.add_file_selector(file_selector)
+        group2 = FileGroup("Group 2", 2)
+        for file_selector in ["user1*.txt", "user3_*.txt", "user3_*.gz"]:
+            group2.add_file_selector(file_selector)
+        group3 = FileGroup("Group 3", 3)
+        for file_selector in ["user10_*.csv", "user4_*[ab].txt"]:
+            group3.add_file_selector(file_selector)
+        self.matcher = FileGroupMatcher([group1, group2, group3])
+
+    def test_user_selectors(self):
+        self.assertEqual({"10": [(0, ".txt"), (2, ".csv")], "2": [(0, "")], "3": [(1, ".txt"), (1, ".gz")]},
+                         self.matcher.user_selectors)
+        self.assertEqual("Group 1", self.matcher.get_label("user10_file5_yearofbirth_unknown_sex_unknown.23andme.txt"))
+        self.assertEqual("Group 1", self.matcher.get_label("user2_"))
+        self.assertEqual("Group 2", self.matcher.get_label("user3_file7.gz"))
+        self.assertEqual("Group 3", self.matcher.get_label("user10_file6.csv"))
+        # The ending can't overlap the user id
+        self.assertEqual(None, self.matcher.get_label("user3_gz"))
+        self.assertEqual(None, self.matcher.get_label("user30_file8.gz"))
+
+    def test_wildcard_selectors(self):
+        self.assertEqual("Group 1", self.matcher.get_label("user3_file1-exome-.gz"))
+        self.assertEqual("Group 2", self.matcher.get_label("user105_file2.txt"))
+        self.assertEqual("Group 2", self.matcher.get_label("user1.txt"))
+        self.assertEqual("Group 3", self.matcher.get_label("user4_file9b.txt"))
+        self.assertEqual(None, self.matcher.get_label("user4_file9c.txt"))
+
+    def test_same_as_fnmatch(self):
+        file_groups = [FileGroup("Group 1", 1), FileGroup("Group 2", 2)]
+        for file_selector in ["user1_*.txt", "user2?.txt", "*[!x].csv"]:
+            file_groups[0].add_file_selector(file_selector)
+        for file_selector in ["user1_*", "user2*", "*.*"]:
+            file_groups[1].add_file_selector(file_selector)
+        matcher = FileGroupMatcher(file_groups)
+        for file_name in ["user1_a.txt", "user1_a.csv", "user1_x.csv", "user21.txt", "user2_b.txt", "user3_c.zip",
+                          "user1_", "user1_.txt", "user12_a.txt", "readme"]:
+            expected = None
+            for file_group in file_groups:
+                if any(fnmatch.fnmatch(file_name, file_selector) for file_selector in file_group.get_file_selectors()):
+                    expected = file_group.get_label()
+                    break
+            self.assertEqual(expected, matcher.get_label(file_name), file_name)
+
+    def test_many_groups(self):
+        # More groups with wildcards than a regular expression can hold
+        file_groups = []
+        for index in range(250):
+            file_groups.append(FileGroup("Group " + str(index), index))
+            file_groups[-1].add_file_selector("*_file" + str(index) + "_*.txt")
+        file_groups[120].add_file_selector("*_file5_*.txt")
+        file_groups[-1].add_file_selector("*.csv")
+        matcher = FileGroupMatcher(file_groups)
+        self.assertEqual(3, len(matcher.wildcards))
+        self.assertEqual("Group 0", matcher.get_label("user1_file0_x.txt"))
+        self.assertEqual("Group 5", matcher.get_label("user1_file5_x.txt"))
+        self.assertEqual("Group 150", matcher.get_label("user1_file150_x.txt"))
+        self.assertEqual("Group 249", matcher.get_label("user1_file249_x.csv"))
+        self.assertEqual(None, matcher.get_label("user1_file250_x.txt"))
+
+####################################################################################
+#
+# Test QueryPlan class
+#
+####################################################################################
+class QueryPlan_test(unittest.TestCase):
+
+    def setUp(self):
+        self.rsids = np.array(["RS12345", "RS22222", "RS12399", "RS12345"])
+        self.chromosome_codes = encode_chromosomes(np.array(["4", "4", "5", "X"]))
+        self.positions = np.array(["125646", "199", "250", "220"])
+        
+    def select(self, rsid, chromosomes, pos_start = 0, pos_end = sys.maxint, rsid_list = None, region_list = None):
+        query_plan = QueryPlan(rsid, chromosomes, pos_start, pos_end, rsid_list, region_list)
+        rows, positions = query_plan.select_fields(self.rsids, self.chromosome_codes, self.positions)
+        snp_chunk = SnpChunk(self.rsids, self.chromosome_codes, self.positions.astype(np.int32), self.chromosome_codes)
+        # The fields select the same rows as the chunk
+        self.assertEqual(np.flatnonzero(query_plan.select_chunk(snp_chunk)).tolist(), rows.tolist())
+        self.assertEqual(self.positions[rows].astype(np.int32).tolist(), positions.tolist())
+        return rows.tolist()
+        
+    def test_is_selective(self):
+        self.assertFalse(QueryPlan("*", None, 0, sys.maxint).is_selective())
+        self.assertFalse(QueryPlan("**", [], 0, sys.maxint).is_selective())
+        self.assertTrue(QueryPlan("RS1", None, 0, sys.maxint).selects_rsids())
+        self.assertTrue(QueryPlan("*", ["1"], 0, sys.maxint).selects_chromosomes())
+        self.assertTrue(QueryPlan("*", None, 5, sys.maxint).selects_positions())
+        
+    def test_select_fields(self):
+        self.assertEqual([0, 1, 2, 3], self.select("*", None))
+        self.assertEqual([0, 3], self.select("RS12345", None))
+        self.assertEqual([0, 2, 3], self.select("RS12*", None))
+        self.assertEqual([0, 2, 3], self.select("RS1?3*", None))
+        self.assertEqual([2, 3], self.select("*", None, 200, 250))
+        self.assertEqual([0, 1, 3], self.select("*", ["4", "X"]))
+        self.assertEqual([3], self.select("RS12*", ["[X5]"], 200, 249))
+        self.assertEqual([], self.select("RS9*", ["4"]))
+        
+    def test_lists(self):
+        self.assertEqual([0, 1, 3], self.select("*", None, rsid_list=RsidList(["rs12345", "rs22222"])))
+        self.assertEqual([1], self.select("RS2*", None, rsid_list=RsidList(["rs12345", "rs22222"])))
+        region_list = RegionList([(chromosome_codes["4"], 100, 200), (chromosome_codes["X"], 1, 1000)])
+        self.assertEqual([1, 3], self.select("*", None, region_list=region_list))
+        self.assertEqual([3], self.select("*", ["X"], region_list=region_list))
+        query_plan = QueryPlan("*", None, 0, sys.maxint, RsidList(["rs1"]), region_list)
+        self.assertTrue(query_plan.matches(SnpValues("RS1", "X", 500, "AA")))
+        # Chromosome names are compared in the case they are written
+        self.assertFalse(query_plan.matches(SnpValues("RS1", "x", 500, "AA")))
+        self.assertFalse(query_plan.matches(SnpValues("RS1", "4", 500, "AA")))
+        self.assertFalse(query_plan.matches(SnpValues("RS2", "X", 500, "AA")))
+        
+    def test_matches(self):
+        query_plan = QueryPlan("RS1?3*", ["4", "X*"], 200, 250)
+        self.assertTrue(query_plan.matches(SnpValues("RS12345", "XY", 200, "AA")))
+        self.assertFalse(query_plan.matches(SnpValues("RS12345", "5", 200, "AA")))
+        self.assertFalse(query_plan.matches(SnpValues("RS22345", "4", 200, "AA")))
+        self.assertFalse(query_plan.matches(SnpValues("RS12345", "4", 251, "AA")))
         
 ####################################################################################
 #
-# Test SnpValues class  
+# Test SnpValues class
 #
 ####################################################################################
 class SnpValues_test(unittest.TestCase):
@@ -364,6 +589,51 @@ class SnpValues_test(unittest.TestCase):
         self.assertTrue("125646" in output_string)
         self.assertTrue("AA" in output_string)
         
+####################################################################################
+#
+# Test SnpChunk class  
+#
+####################################################################################
+class SnpChunk_test(unittest.TestCase):
+
+    def setUp(self):
+        self.snp_chunk = SnpChunk.from_strings(["RS12345", "RS12346", "I3000"], ["4", "MT", "X"], 
+                                               ["125646", "200", "300"], ["AA", "--", "d"])
+        
+    def test_len(self):
+        self.assertEqual(3, len(self.snp_chunk))
+        
+    def test_get_rows(self):
+        self.assertEqual([("RS12345", "4", 125646, "AA"), ("RS12346", "MT", 200, "--"), ("I3000", "X", 300, "D")],
+                         self.snp_chunk.get_rows())
+        
+    def test_select(self):
+        selected = self.snp_chunk.select(np.array([False, True, True]))
+        self.assertEqual([("RS12346", "MT", 200, "--"), ("I3000", "X", 300, "D")], selected.get_rows())
+        
+    def test_unknown_values(self):
+        # Names the code tables don't start with are kept
+        snp_chunk = SnpChunk.from_strings(["RS1", "RS2", "RS3"], ["CHR99", "x", "0"], ["1", "2", "3"], ["NNN", "nn", "00"])
+        self.assertEqual([("RS1", "CHR99", 1, "NNN"), ("RS2", "x", 2, "NN"), ("RS3", "0", 3, "00")], snp_chunk.get_rows())
+        snp_chunk = SnpChunk.from_snp_values([SnpValues("rs2", "x", 2, "nn")])
+        self.assertEqual([("RS2", "x", 2, "NN")], snp_chunk.get_rows())
+        
+    def test_pickle(self):
+        restored = cPickle.loads(cPickle.dumps(self.snp_chunk, 2))
+        self.assertEqual(self.snp_chunk.get_rows(), restored.get_rows())
+        # Codes pickled by a process that gave them other names are translated
+        state = self.snp_chunk.__getstate__()
+        state["code_names"]["chromosome_names"][chromosome_codes["MT"]] = "PICKLED MT"
+        restored = SnpChunk([], [], [], [])
+        restored.__setstate__(state)
+        self.assertEqual(("RS12346", "PICKLED MT", 200, "--"), restored.get_rows()[1])
+        
+    def test_from_snp_values(self):
+        snp_chunk = SnpChunk.from_snp_values([SnpValues("rs1", "2", 3, "ag")], False, 5)
+        self.assertEqual([("RS1", "2", 3, "AG")], snp_chunk.get_rows())
+        self.assertFalse(snp_chunk.is_valid())
+        self.assertEqual(5, snp_chunk.get_lines_read())
+        
 ####################################################################################
 #
 # Test TwentyThreeAndMeSNPProcessor class  
@@ -390,6 +660,49 @@ class TwentyThreeAndMeSNPProcessor_test(unittest.TestCase):
         self.assertEquals(854250, snp_values.get_position())
         self.assertEquals("AG", snp_values.get_genotype())
         
+    def test_parse_lines(self):
+        snp_chunk = self.parser.parse_lines(["# rsid\tchromosome\tposition\tgenotype\n", 
+                                             "rs7537756\t1\t854250\tAG\r\n", "i3000\tMT\t16\tA\n"])
+        self.assertEquals([("RS7537756", "1", 854250, "AG"), ("I3000", "MT", 16, "A")], snp_chunk.get_rows())
+        self.assertTrue(snp_chunk.is_valid())
+        self.assertEquals(3, snp_chunk.get_lines_read())
+        
+        # Lines after one that can't be parsed are ignored
+        snp_chunk = self.parser.parse_lines(["rs7537756\t1\t854250\tAG\n", "bad line\n", "rs3\t1\t5\tAA\n"])
+        self.assertEquals([("RS7537756", "1", 854250, "AG")], snp_chunk.get_rows())
+        self.assertFalse(snp_chunk.is_valid())
+        
+    def test_parse_lines_with_plan(self):
+        lines = ["rs7537756\t1\t854250\tAG\n", "rs3\t2\t5\tAA\n", "i3000\tMT\t16\tA\n"]
+        snp_chunk = self.parser.parse_lines(lines, plan=QueryPlan("*", ["1", "MT"], 0, sys.maxint))
+        self.assertEquals([("RS7537756", "1", 854250, "AG"), ("I3000", "MT", 16, "A")], snp_chunk.get_rows())
+        self.assertEquals(3, snp_chunk.get_lines_read())
+        
+        # Every line is still checked, including those that aren't selected
+        snp_chunk = self.parser.parse_lines(lines + ["rs4\t2\tx\tAA\n"], plan=QueryPlan("RS3", None, 0, sys.maxint))
+        self.assertEquals([("RS3", "2", 5, "AA")], snp_chunk.get_rows())
+        self.assertFalse(snp_chunk.is_valid())
+        
+    def test_parse_lines_code_table_full(self):
+        # A block with more genotype names than can be coded is an empty chunk that isn't valid
+        genotype_table = snp_codes.genotype_table
+        snp_codes.genotype_table = CodeTable(genotype_table.get_names(), True, len(genotype_table) + 1)
+        try:
+            lines = ["rs1\t1\t1\tAG\n", "rs2\t1\t2\tXX\n", "rs3\t1\t3\tYY\n"]
+            for snp_chunk in [self.parser.parse_lines(lines), AbstractSNPProcessor.parse_lines(self.parser, lines)]:
+                self.assertEquals(0, len(snp_chunk))
+                self.assertFalse(snp_chunk.is_valid())
+                self.assertEquals(3, snp_chunk.get_lines_read())
+                self.assertTrue(snp_chunk.get_reason().startswith("too many distinct genotype/chromosome names"))
+        finally:
+            snp_codes.genotype_table = genotype_table
+        
+    def test_parse_file(self):
+        lines = ["rs%d\t1\t%d\tAG\n" % (i, i) for i in range(1000)]
+        snp_chunks = list(self.parser.parse_file(StringIO.StringIO("".join(lines)), 1000))
+        self.assertTrue(len(snp_chunks) > 1)
+        self.assertEquals(1000, sum(len(snp_chunk) for snp_chunk in snp_chunks))
+        
 ####################################################################################
 #
 # Test IlluminaSNPProcessor class  
@@ -431,6 +744,40 @@ class IlluminaSNPProcessor_test(unittest.TestCase):
         self.assertEquals(788822, snp_values.get_position())
         self.assertEquals("AA", snp_values.get_genotype())
         
+    def test_parse_lines(self):
+        expected = [("RS4475691", "1", 836671, "TT"), ("RS3131972", "1", 752721, "AG")]
+        snp_chunk = self.parser.parse_lines(['"rs4475691","1","836671","TT"\n', '"rs3131972","1","752721","AG"\n'])
+        self.assertEquals(expected, snp_chunk.get_rows())
+        snp_chunk = self.parser.parse_lines(["rs4475691\t1\t836671\tT\tT\n", "rs3131972\t1\t752721\tA\tG\n"])
+        self.assertEquals(expected, snp_chunk.get_rows())
+        snp_chunk = self.parser.parse_lines(["rs4475691 1 836671 TT\n", "rs3131972 1 752721 AG\n"])
+        self.assertEquals(expected, snp_chunk.get_rows())
+        
+    def test_sniff_layout(self):
+        self.assertEquals("quoted", self.parser.sniff_layout(['"rs4475691","1","836671","TT"\n']))
+        self.assertEquals("tab", self.parser.sniff_layout(["# comment\n", "rs4475691\t1\t836671\tT\tT\n"]))
+        self.assertEquals("space", self.parser.sniff_layout(["rs4475691 1 836671 TT\n"]))
+        self.assertEquals(None, self.parser.sniff_layout(["rs4475691,1,836671\n"]))
+        
+    def test_parse_file(self):
+        lines = ["RSID,CHROMOSOME,POSITION,RESULT\n"] + ['"rs%d","1","%d","AG"\n' % (i, i) for i in range(1000)]
+        snp_chunks = list(self.parser.parse_file(StringIO.StringIO("".join(lines)), 1000))
+        self.assertTrue(all(snp_chunk.is_valid() for snp_chunk in snp_chunks))
+        self.assertEquals(1000, sum(len(snp_chunk) for snp_chunk in snp_chunks))
+        self.assertEquals(1001, sum(snp_chunk.get_lines_read() for snp_chunk in snp_chunks))
+        
+        # The layout is taken from the first block, so a line in another layout isn't read
+        snp_chunks = list(self.parser.parse_file(StringIO.StringIO("rs1 1 5 AA\nrs2\t1\t6\tA\tG\n")))
+        self.assertEquals([("RS1", "1", 5, "AA")], snp_chunks[0].get_rows())
+        self.assertFalse(snp_chunks[0].is_valid())
+        self.assertEquals("can't parse the line 'rs2\\t1\\t6\\tA\\tG'", snp_chunks[0].get_reason())
+        
+        # Files with no layout this processor reads stop at the first block
+        snp_chunks = list(self.parser.parse_file(StringIO.StringIO("rs1;1;5;AA\n")))
+        self.assertEquals(1, len(snp_chunks))
+        self.assertEquals(0, len(snp_chunks[0]))
+        self.assertEquals("no illumina layout matches the line 'rs1;1;5;AA'", snp_chunks[0].get_reason())
+        
 ####################################################################################
 #
 # Test IYGSNPProcessor class  
@@ -457,6 +804,10 @@ class IYGSNPProcessor_test(unittest.TestCase):
         self.assertEquals(0, snp_values.get_position())
         self.assertEquals("AG", snp_values.get_genotype())
         
+    def test_parse_lines(self):
+        snp_chunk = self.parser.parse_lines(["rs1668873\tAG\n", "rs2131925\tTT\n"])
+        self.assertEquals([("RS1668873", "", 0, "AG"), ("RS2131925", "", 0, "TT")], snp_chunk.get_rows())
+        
 ####################################################################################
 #
 # Test DecodeMeSNPProcessor class  
@@ -482,6 +833,17 @@ class DecodeMeSNPProcessor_test(unittest.TestCase):
         self.assertEquals("1", snp_values.get_chromosome())
         self.assertEquals(758311, snp_values.get_position())
         self.assertEquals("GG", snp_values.get_genotype())
+        
+    def test_parse_lines(self):
+        snp_chunk = self.parser.parse_lines(["rs12562034,A/G,1,758311,+,GG\n", "rs3094315,C/T,1,742429,-,--\n"])
+        self.assertEquals([("RS12562034", "1", 758311, "GG"), ("RS3094315", "1", 742429, "--")], snp_chunk.get_rows())
+        
+    def test_parse_file(self):
+        text = "Name,Variation,Chromosome,Position,Strand,YourCode\nrs12562034,A/G,1,758311,+,GG\n"
+        snp_chunks = list(self.parser.parse_file(StringIO.StringIO(text)))
+        self.assertEquals([("RS12562034", "1", 758311, "GG")], snp_chunks[0].get_rows())
+        self.assertTrue(snp_chunks[0].is_valid())
+        self.assertEquals(2, snp_chunks[0].get_lines_read())
 
 
 
@@ -0,0 +1,37 @@
+"""
+This program sends a query to the server started by snp_server.py and prints the answer.
+
+The query is a parameter file (see parse_files.txt) naming the RSIDs, chromosomes, positions and
+file groups to count.  Only the standard library is imported, so the client starts quickly.
+
+Usage:
+    python snp_client.py [parameter file] [port]
+"""
+
+import sys
+import json
+import urllib2
+
+# Port the server listens on if none is given (see snp_server.default_port)
+default_port = 8237
+
+# Opener that never sends requests to this machine through a proxy
+opener = urllib2.build_opener(urllib2.ProxyHandler({}))
+
+# Send the text of a parameter file to the server listening on a port.  Returns the answer.
+# Raises urllib2.HTTPError if the server can't answer the query.
+def send_query(text, port = default_port, host = "127.0.0.1"):
+    return opener.open("http://%s:%d/query" % (host, port), text).read()
+
+# Get the status of the server listening on a port as a dictionary
+def get_status(port = default_port, host = "127.0.0.1"):
+    return json.load(opener.open("http://%s:%d/status" % (host, port)))
+
+if __name__ == "__main__":
+    with open(sys.argv[1]) as f:
+        text = f.read()
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else default_port
+    try:
+        sys.stdout.write(send_query(text, port))
+    except urllib2.HTTPError as error:
+        sys.exit(error.read().strip())
@@ -0,0 +1,250 @@
+"""
+This module contains the integer codes used when SNP data is held in NumPy arrays.
+Chromosomes and genotypes are stored as small integers so whole columns of a SNP file
+can be filtered and counted without creating a Python object for every line.  Names
+outside the usual chromosomes and genotypes are given codes as they are read (see CodeTable).
+"""
+
+import numpy as np
+
+# Number of codes a table can hold.  Codes are stored as uint8.
+code_count = 256
+
+####################################################################################
+#
+# Error raised when a CodeTable is asked to code a name after every code has been given out
+#
+####################################################################################
+class CodeTableFullError(ValueError):
+    pass
+
+####################################################################################
+#
+# Class giving names small integer codes.  The names every file uses are given codes
+# when the module is loaded, so their codes are the same in every run.  Any other name
+# read is given the next free code the first time it is seen, so no name is lost.
+# Those codes depend on the sequence names are seen in, so the names are stored with
+# arrays of codes written to disk or sent to another process, and read back through
+# import_names.
+#
+####################################################################################
+class CodeTable:
+    # Constructor.  names are the names given fixed codes, in code sequence.  If upper_case is
+    # True names are upper-cased before they are coded.  capacity is the number of codes the
+    # table can give out.
+    def __init__(self, names, upper_case, capacity = code_count):
+        self.names = []
+        self.codes = {}
+        self.upper_case = upper_case
+        self.capacity = capacity
+        self.name_array = np.zeros(code_count, dtype=object)
+        # Maps every one or two byte string, read as a little-endian 16 bit integer, to a code.
+        # 0 is also used for strings with no code, which are told apart by null_key.
+        self.lookup = np.zeros(65536, dtype=np.uint8)
+        self.null_key = CodeTable.get_key(names[0])
+        for name in names:
+            self.add(name)
+        self.fixed_count = len(self.names)
+
+    # Get the number of names with codes
+    def __len__(self):
+        return len(self.names)
+
+    # Convert the contents to a string
+    def __str__(self):
+        return "( CodeTable: " + str(len(self)) + " names, " + str(len(self) - self.fixed_count) + " added )"
+
+    # Get the lookup key of a one or two byte string
+    @staticmethod
+    def get_key(name):
+        padded = name + "\0" * (2 - len(name))
+        return ord(padded[0]) + (ord(padded[1]) << 8)
+
+    # Give a name the next free code.  Raises CodeTableFullError if every code has been given out.
+    def add(self, name):
+        if len(self.names) >= self.capacity:
+            raise CodeTableFullError("more than " + str(self.capacity) + " names to code, such as " + repr(name))
+        code = len(self.names)
+        self.names.append(name)
+        self.codes[name] = code
+        self.name_array[code] = name
+        # Lower case spellings are found by the lookup too when names are upper-cased
+        for variant in set([name, name.lower()] if self.upper_case else [name]):
+            if len(variant) <= 2:
+                self.lookup[CodeTable.get_key(variant)] = code
+        return code
+
+    # Get the code for a name, giving it a code if it hasn't got one
+    def get_code(self, name):
+        if self.upper_case:
+            name = name.upper()
+        code = self.codes.get(name)
+        if code == None:
+            code = self.add(name)
+        return code
+
+    # Get the names in code sequence, to store with codes written to disk (see import_names)
+    def get_names(self):
+        return list(self.names)
+
+    # Take the names codes were stored with, as returned by get_names, perhaps by another process.
+    # Returns a NumPy array giving the code in this table for each stored code, or None if the
+    # stored codes are the same as the codes in this table.
+    def import_names(self, names):
+        translation = np.arange(code_count, dtype=np.uint8)
+        for stored_code, name in enumerate(names):
+            translation[stored_code] = self.get_code(name)
+        if (translation[:len(names)] == np.arange(len(names))).all():
+            return None
+        return translation
+
+    # Convert an array of names to an array of codes
+    def encode(self, values):
+        values = np.asarray(values)
+        if values.dtype.kind != "S":
+            values = values.astype("S")
+        if len(values) == 0:
+            return np.zeros(0, dtype=np.uint8)
+        if values.dtype.itemsize <= 2:
+            keys = values.astype("S2").view("<u2")
+            codes = self.lookup[keys]
+            unknown = (codes == 0) & (keys != self.null_key)
+            if not unknown.any():
+                return codes
+            # Names without a code are given one below, so the next block with them is looked up
+            codes[unknown] = self.encode_distinct(values[unknown])
+            return codes
+        # Longer names are rare
+        return self.encode_distinct(values)
+
+    # Convert an array of names to an array of codes, coding each distinct name once
+    def encode_distinct(self, values):
+        distinct, inverse = np.unique(values, return_inverse=True)
+        distinct_codes = np.array([self.get_code(value) for value in distinct.tolist()], dtype=np.uint8)
+        return distinct_codes[inverse]
+
+    # Convert an array of codes to an array of names
+    def decode(self, codes):
+        return self.name_array[codes]
+
+####################################################################################
+#
+# Chromosome codes
+#
+####################################################################################
+
+# Chromosome names in code sequence.  Code 0 is used for files with no chromosome (IYG).  Names are
+# kept as they are written, so x and X are different chromosomes as they are to CHROMOSOMES.
+chromosome_table = CodeTable([""] + [str(i) for i in range(1, 23)] + ["X", "Y", "XY", "MT"], False)
+chromosome_names = chromosome_table.names
+chromosome_codes = chromosome_table.codes
+
+####################################################################################
+#
+# Genotype codes
+#
+####################################################################################
+
+# Alleles found in SNP files.  "-" and "0" are no-calls, "D" and "I" are deletions and insertions.
+alleles = "-0ACGTDI"
+
+# Genotype names in code sequence.  Single allele genotypes are found on X, Y and MT in some
+# files.  The last code is kept for no_genotype_code.
+unknown_genotype = "?"
+genotype_table = CodeTable([unknown_genotype] + list(alleles) + [a + b for a in alleles for b in alleles], True, code_count - 1)
+genotype_names = genotype_table.names
+genotype_codes = genotype_table.codes
+
+# Code for a SNP a file has no genotype for, used by the genotype matrix (see snp_matrix)
+no_genotype_code = code_count - 1
+
+# Alleles that are calls rather than no-calls
+called_alleles = "ACGTDI"
+
+# The genotypes with codes fixed when the module is loaded.  Tables of the properties of genotype
+# codes below are built from these; other genotypes, such as NN, are treated as no-calls.
+_fixed_genotype_names = genotype_names[:genotype_table.fixed_count]
+
+# Build an array with an entry for every genotype code from the entries of the fixed genotypes,
+# using default for the rest
+def _build_code_array(entries, default, dtype):
+    array = np.array([default] * code_count, dtype=dtype)
+    array[:len(entries)] = entries
+    return array
+
+# True for each genotype code that is a no-call, such as "--", or isn't a fixed genotype
+genotype_no_calls = _build_code_array([name == unknown_genotype or "-" in name or "0" in name for name in _fixed_genotype_names],
+                                      True, bool)
+
+# The number of each called allele in each genotype, as an array with a row for each genotype code.
+# Genotypes with a no-call allele count as no alleles.
+genotype_allele_counts = _build_code_array([[name.count(allele) if name != unknown_genotype and "-" not in name and "0" not in name else 0
+                                             for allele in called_alleles] for name in _fixed_genotype_names],
+                                           [0] * len(called_alleles), np.int32)
+
+# The genotype code for each pair of called alleles, as an array indexed by the positions of the
+# two alleles in called_alleles
+genotype_pair_codes = np.array([[genotype_codes[a + b] for b in called_alleles] for a in called_alleles], dtype=np.int64)
+
+# The complement of each allele on the opposite DNA strand
+allele_complements = {"A": "T", "C": "G", "G": "C", "T": "A"}
+
+# Get a genotype name with its alleles in the sequence of alleles, so AG and GA are the same
+def _unordered_name(name):
+    if name == unknown_genotype:
+        return name
+    return "".join(sorted(name, key=alleles.index))
+
+# Get the genotype name read from the opposite strand
+def _complement_name(name):
+    return "".join(allele_complements.get(allele, allele) for allele in name)
+
+# The code with its alleles in the sequence of alleles for each genotype code, and the code of the
+# genotype read from the opposite strand for each genotype code.  Other genotypes are left as they are.
+unordered_genotype_codes = np.arange(code_count, dtype=np.uint8)
+unordered_genotype_codes[:len(_fixed_genotype_names)] = [genotype_codes[_unordered_name(name)] for name in _fixed_genotype_names]
+complement_genotype_codes = np.arange(code_count, dtype=np.uint8)
+complement_genotype_codes[:len(_fixed_genotype_names)] = [genotype_codes[_complement_name(name)] for name in _fixed_genotype_names]
+
+# Convert an array of chromosome names to an array of chromosome codes
+def encode_chromosomes(values):
+    return chromosome_table.encode(values)
+
+# Convert an array of genotype strings to an array of genotype codes
+def encode_genotypes(values):
+    return genotype_table.encode(values)
+
+# Convert an array of chromosome codes to an array of chromosome names
+def decode_chromosomes(codes):
+    return chromosome_table.decode(codes)
+
+# Convert an array of genotype codes to an array of genotype strings
+def decode_genotypes(codes):
+    return genotype_table.decode(codes)
+
+# Get the code of a chromosome name, giving it a code if it hasn't got one
+def get_chromosome_code(name):
+    return chromosome_table.get_code(name)
+
+# Get the code of a genotype, giving it a code if it hasn't got one
+def get_genotype_code(name):
+    return genotype_table.get_code(name)
+
+# Get the names of the chromosome and genotype codes, to store with arrays of codes, as a
+# dictionary of {"chromosome_names": names, "genotype_names": names}
+def get_code_names():
+    return {"chromosome_names": chromosome_table.get_names(), "genotype_names": genotype_table.get_names()}
+
+# Translate arrays of codes stored with names returned by get_code_names to the codes of this
+# process.  names is None for codes stored before names were, which used the fixed codes.
+# Returns a tuple of (chromosome codes, genotype codes).
+def import_codes(names, stored_chromosome_codes, stored_genotype_codes):
+    if names == None:
+        return (stored_chromosome_codes, stored_genotype_codes)
+    chromosome_translation = chromosome_table.import_names(names["chromosome_names"])
+    genotype_translation = genotype_table.import_names(names["genotype_names"])
+    if chromosome_translation is not None:
+        stored_chromosome_codes = chromosome_translation[stored_chromosome_codes]
+    if genotype_translation is not None:
+        stored_genotype_codes = genotype_translation[stored_genotype_codes]
+    return (stored_chromosome_codes, stored_genotype_codes)
@@ -0,0 +1,72 @@
+"""
+This program is designed to test the classes and functions in snp_codes
+"""
+import sys
+import numpy as np
+from snp_codes import *
+import unittest
+
+####################################################################################
+#
+# Test CodeTable class
+#
+####################################################################################
+class CodeTable_test(unittest.TestCase):
+
+    def setUp(self):
+        self.table = CodeTable(["", "A", "BB"], True, 5)
+
+    def test_encode(self):
+        # Short names are looked up in either case; other names are given the next free code
+        self.assertEqual([0, 1, 2, 2, 3], self.table.encode(np.array(["", "a", "BB", "bb", "cc"])).tolist())
+        self.assertEqual([3, 4], self.table.encode(np.array(["CC", "LONGER"])).tolist())
+        self.assertEqual(["", "A", "BB", "CC", "LONGER"], self.table.decode(np.arange(5)).tolist())
+        self.assertEqual(3, self.table.fixed_count)
+        self.assertRaises(ValueError, self.table.get_code, "FULL")
+
+    def test_case_kept(self):
+        table = CodeTable(["", "X"], False)
+        self.assertEqual([1, 2, 2], table.encode(np.array(["X", "x", "x"])).tolist())
+        self.assertEqual(["", "X", "x"], table.get_names())
+
+    def test_import_names(self):
+        self.table.get_code("CC")
+        self.assertEqual(None, self.table.import_names(["", "A", "BB", "CC"]))
+        # Names stored by another process are given this table's codes
+        translation = self.table.import_names(["", "A", "BB", "DD", "CC"])
+        self.assertEqual([0, 1, 2, 4, 3], translation[:5].tolist())
+        self.assertEqual(["", "A", "BB", "CC", "DD"], self.table.get_names())
+
+####################################################################################
+#
+# Test the chromosome and genotype tables
+#
+####################################################################################
+class code_tables_test(unittest.TestCase):
+
+    def test_unknown_names(self):
+        codes = encode_chromosomes(np.array(["1", "0", "chr1"]))
+        self.assertEqual(["1", "0", "chr1"], decode_chromosomes(codes).tolist())
+        codes = encode_genotypes(np.array(["ag", "NN", "00", "N/A"]))
+        self.assertEqual(["AG", "NN", "00", "N/A"], decode_genotypes(codes).tolist())
+        self.assertTrue(genotype_no_calls[codes[1:]].all())
+        self.assertEqual(0, genotype_allele_counts[codes[1]].sum())
+        self.assertEqual(codes[1], unordered_genotype_codes[codes[1]])
+
+    def test_import_codes(self):
+        # Codes stored by another process that saw the names in another sequence
+        names = get_code_names()
+        get_chromosome_code("STORED CHROMOSOME B")
+        get_genotype_code("STORED GENOTYPE B")
+        names["chromosome_names"] += ["STORED CHROMOSOME A", "STORED CHROMOSOME B"]
+        names["genotype_names"] += ["STORED GENOTYPE A", "STORED GENOTYPE B"]
+        stored = len(names["chromosome_names"]) - 2
+        chromosome_codes, genotype_codes = import_codes(names, np.array([1, stored, stored + 1], dtype=np.uint8),
+                                                        np.array([len(names["genotype_names"]) - 1], dtype=np.uint8))
+        self.assertEqual(["1", "STORED CHROMOSOME A", "STORED CHROMOSOME B"], decode_chromosomes(chromosome_codes).tolist())
+        self.assertEqual(["STORED GENOTYPE B"], decode_genotypes(genotype_codes).tolist())
+        codes = np.array([1, 2], dtype=np.uint8)
+        self.assertTrue(import_codes(None, codes, codes)[0] is codes)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+"""
+This module holds long lists of RSIDs and chromosome regions that SNPs can be selected by, so a
+study of thousands of candidate SNPs or hundreds of genes is answered in one pass over the files.
+
+An RsidList is read from a file with an RSID on each line (RSIDFILE in parse_files.txt).  The RSIDs
+are kept in a set for testing single SNPs and in a sorted array for testing a column of them.
+
+A RegionList is read from a BED file (REGIONFILE in parse_files.txt): tab or space-separated
+chromosome, start and end on each line, with positions counted from 0 and the end not included, as
+UCSC writes them.  The regions are merged where they overlap and kept sorted by chromosome code and
+start, so the region holding a position is found by bisecting.  Positions in the files are counted
+from 1, so a BED line "chr1 999 2000" selects positions 1000 to 2000 of chromosome 1.  Regions on
+contigs that aren't chromosomes, such as the unplaced and alternate haplotype contigs of UCSC gene
+lists, can't hold a SNP in the files and are left out.
+"""
+
+import hashlib
+import numpy as np
+from snp_codes import *
+
+# Lines of a BED file that aren't regions start with one of these
+bed_header_prefixes = ("#", "track", "browser")
+
+# Get the chromosome code (see snp_codes) for a chromosome name as BED files write it, such as
+# chr1, chrX or chrM.  Returns None if the name isn't a chromosome.
+def get_bed_chromosome_code(name):
+    name = name.strip().upper()
+    if name.startswith("CHR"):
+        name = name[3:]
+    if name == "M":
+        name = "MT"
+    code = chromosome_codes.get(name)
+    return code if code else None
+
+####################################################################################
+#
+# Class holding a list of RSIDs to select
+#
+####################################################################################
+class RsidList:
+    # Constructor.  rsids is a sequence of RSIDs in any case.
+    def __init__(self, rsids):
+        self.rsids = set(rsid.strip().upper() for rsid in rsids)
+        self.rsid_array = np.array(sorted(self.rsids), dtype="S")
+
+    # Get the number of RSIDs in the list
+    def __len__(self):
+        return len(self.rsids)
+
+    # Convert the contents to a string
+    def __str__(self):
+        return "( RsidList: " + str(len(self)) + " RSIDs )"
+
+    # Read a file with an RSID in the first column of each line.  Blank lines, comments starting
+    # with # and a header line starting with "rsid" are skipped.
+    @staticmethod
+    def read(path):
+        rsids = []
+        with open(path) as f:
+            for line in f:
+                fields = line.replace(",", " ").split()
+                if len(fields) > 0 and not fields[0].startswith("#") and fields[0].upper() != "RSID":
+                    rsids.append(fields[0])
+        return RsidList(rsids)
+
+    # Get the RSIDs as a sorted NumPy string array
+    def get_rsids(self):
+        return self.rsid_array
+
+    # Return True if an upper case RSID is in the list
+    def contains(self, rsid):
+        return rsid in self.rsids
+
+    # Test a NumPy array of upper case RSIDs.  Returns a NumPy boolean array, True for each RSID in the list.
+    def match(self, rsids):
+        if len(self.rsid_array) == 0:
+            return np.zeros(len(rsids), dtype=bool)
+        return np.in1d(rsids, self.rsid_array)
+
+    # Get a digest of the RSIDs that changes when the list does
+    def get_digest(self):
+        return hashlib.md5(self.rsid_array.tostring()).hexdigest()
+
+####################################################################################
+#
+# Class holding a list of chromosome regions to select
+#
+####################################################################################
+class RegionList:
+    # Constructor.  regions is a sequence of (chromosome code, first position, last position)
+    # tuples, with positions counted from 1 and the last included.  skipped_contigs is a dictionary
+    # of {name: number of regions} for regions left out because their contig isn't a chromosome.
+    def __init__(self, regions, skipped_contigs = None):
+        self.skipped_contigs = dict(skipped_contigs) if skipped_contigs != None else {}
+        merged = []
+        for code, start, end in sorted(regions):
+            if len(merged) > 0 and merged[-1][0] == code and start <= merged[-1][2] + 1:
+                merged[-1][2] = max(merged[-1][2], end)
+            else:
+                merged.append([code, start, end])
+        self.chromosome_codes = np.array([region[0] for region in merged], dtype=np.int64)
+        self.starts = np.array([region[1] for region in merged], dtype=np.int64)
+        self.ends = np.array([region[2] for region in merged], dtype=np.int64)
+        # Each region as a range of keys ordering every position of every chromosome
+        self.start_keys = RegionList.get_keys(self.chromosome_codes, self.starts)
+        self.end_keys = RegionList.get_keys(self.chromosome_codes, self.ends)
+
+    # Get the number of regions after overlapping regions are merged
+    def __len__(self):
+        return len(self.starts)
+
+    # Convert the contents to a string
+    def __str__(self):
+        return "( RegionList: " + str(len(self)) + " regions )"
+
+    # Get a key for each chromosome code and position, ordered by chromosome and then position
+    @staticmethod
+    def get_keys(chromosome_codes, positions):
+        return (np.asarray(chromosome_codes, dtype=np.int64) << 32) + np.asarray(positions, dtype=np.int64)
+
+    # Read a BED file.  Regions on contigs that aren't chromosomes, such as chrUn_gl000220 or
+    # chr6_ssto_hap7, are left out and counted (see get_skipped_contigs), as are regions with the
+    # start equal to the end, which hold no positions.  Raises ValueError naming the line if a line
+    # isn't a region.
+    @staticmethod
+    def read(path):
+        regions = []
+        skipped_contigs = {}
+        with open(path) as f:
+            for number, line in enumerate(f, 1):
+                fields = line.split()
+                if len(fields) == 0 or fields[0].startswith(bed_header_prefixes):
+                    continue
+                if len(fields) < 3 or not fields[1].isdigit() or not fields[2].isdigit() or int(fields[1]) > int(fields[2]):
+                    raise ValueError("Line " + str(number) + " of " + path + " isn't a BED region: " + repr(line.rstrip("\r\n")))
+                code = get_bed_chromosome_code(fields[0])
+                if code == None:
+                    skipped_contigs[fields[0]] = skipped_contigs.get(fields[0], 0) + 1
+                elif int(fields[1]) < int(fields[2]):
+                    regions.append((code, int(fields[1]) + 1, int(fields[2])))
+        return RegionList(regions, skipped_contigs)
+
+    # Get the regions left out because their contig isn't a chromosome, as a dictionary of
+    # {contig name: number of regions}
+    def get_skipped_contigs(self):
+        return self.skipped_contigs
+
+    # Get the number of regions left out because their contig isn't a chromosome
+    def get_skipped_count(self):
+        return sum(self.skipped_contigs.values())
+
+    # Get the codes of the chromosomes with regions, in sequence
+    def get_chromosome_codes(self):
+        return np.unique(self.chromosome_codes).tolist()
+
+    # Return True if a position on the chromosome with a code is in a region
+    def contains(self, chromosome_code, position):
+        return self.match(np.array([chromosome_code]), np.array([position]))[0]
+
+    # Test NumPy arrays of chromosome codes and positions.  Returns a NumPy boolean array, True for
+    # each row in a region.
+    def match(self, chromosome_codes, positions):
+        keys = RegionList.get_keys(chromosome_codes, positions)
+        # The region starting nearest before each key is the only one that can hold it
+        found = np.searchsorted(self.start_keys, keys, side="right") - 1
+        if len(self.end_keys) == 0:
+            return np.zeros(len(keys), dtype=bool)
+        return (found >= 0) & (keys <= self.end_keys[np.maximum(found, 0)])
+
+    # Find the rows of arrays sorted by chromosome code and then position that are in a region.
+    # Only the rows near each region are read, so the arrays can be memory-mapped.  Returns a
+    # NumPy array of row numbers in sequence.
+    def find_rows(self, chromosome_codes, positions):
+        ranges = []
+        for code in self.get_chromosome_codes():
+            first = np.searchsorted(chromosome_codes, code, side="left")
+            last = np.searchsorted(chromosome_codes, code, side="right")
+            if first < last:
+                chromosome_positions = positions[first:last]
+                regions = self.chromosome_codes == code
+                starts = first + np.searchsorted(chromosome_positions, self.starts[regions], side="left")
+                ends = first + np.searchsorted(chromosome_positions, self.ends[regions], side="right")
+                ranges.extend(np.arange(start, end) for start, end in zip(starts.tolist(), ends.tolist()) if start < end)
+        if len(ranges) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(ranges)
+
+    # Get a digest of the regions that changes when the list does
+    def get_digest(self):
+        return hashlib.md5(self.start_keys.tostring() + self.end_keys.tostring()).hexdigest()
@@ -0,0 +1,138 @@
+"""
+This program is designed to test the classes in snp_filters
+"""
+import sys
+import os
+import tempfile
+from snp_classes import *
+from snp_filters import *
+from parse_SNPs import parse_snps
+from parse_SNPs_test import SnpDirectory_test
+import unittest
+
+# Write text to a temporary file.  Returns the path.
+def write_temp_file(text):
+    handle, path = tempfile.mkstemp()
+    with os.fdopen(handle, "w") as f:
+        f.write(text)
+    return path
+
+####################################################################################
+#
+# Test RsidList class
+#
+####################################################################################
+class RsidList_test(unittest.TestCase):
+
+    def test_read(self):
+        path = write_temp_file("rsid,gene\n# candidates\nrs4477212,SAMD11\n\nrs3094315\nRS4477212 duplicate\n")
+        try:
+            rsid_list = RsidList.read(path)
+        finally:
+            os.remove(path)
+        self.assertEqual(2, len(rsid_list))
+        self.assertEqual(["RS3094315", "RS4477212"], rsid_list.get_rsids().tolist())
+
+    def test_match(self):
+        rsid_list = RsidList(["rs1", "rs22"])
+        self.assertTrue(rsid_list.contains("RS22"))
+        self.assertFalse(rsid_list.contains("RS2"))
+        self.assertEqual([True, False, True], rsid_list.match(np.array(["RS1", "RS2", "RS22"])).tolist())
+        self.assertEqual([False], RsidList([]).match(np.array(["RS1"])).tolist())
+
+    def test_digest(self):
+        self.assertEqual(RsidList(["rs1", "RS2"]).get_digest(), RsidList(["rs2", "rs1"]).get_digest())
+        self.assertNotEqual(RsidList(["rs1"]).get_digest(), RsidList(["rs2"]).get_digest())
+
+####################################################################################
+#
+# Test RegionList class
+#
+####################################################################################
+class RegionList_test(unittest.TestCase):
+
+    def setUp(self):
+        # Overlapping and touching regions are merged
+        self.region_list = RegionList([(1, 100, 200), (1, 150, 300), (1, 301, 310), (1, 500, 600), (23, 5, 5)])
+
+    def test_merge(self):
+        self.assertEqual(3, len(self.region_list))
+        self.assertEqual([1, 23], self.region_list.get_chromosome_codes())
+
+    def test_read(self):
+        path = write_temp_file("track name=genes\n# comment\nchr1\t99\t200\tGENE1\n1 149 300\nchrX\t4\t5\nchrM\t0\t16569\n")
+        try:
+            region_list = RegionList.read(path)
+        finally:
+            os.remove(path)
+        self.assertEqual([1, 23, 26], region_list.get_chromosome_codes())
+        self.assertEqual([100, 5, 1], region_list.starts.tolist())
+        self.assertEqual([300, 5, 16569], region_list.ends.tolist())
+
+    def test_read_other_contigs(self):
+        path = write_temp_file("chr1\t99\t200\nchrUn_gl000220\t0\t100\nchr6_ssto_hap7\t5\t10\nchr6_ssto_hap7\t20\t30\nchr2\t50\t50\n")
+        try:
+            region_list = RegionList.read(path)
+        finally:
+            os.remove(path)
+        self.assertEqual([1], region_list.get_chromosome_codes())
+        self.assertEqual({"chrUn_gl000220": 1, "chr6_ssto_hap7": 2}, region_list.get_skipped_contigs())
+        self.assertEqual(3, region_list.get_skipped_count())
+        self.assertEqual(0, RegionList([]).get_skipped_count())
+
+    def test_read_bad_line(self):
+        for text in ["chr1\t200\t100\n", "chrUn_gl000220\t1\n", "chr1\t1\n", "chr1\tone\t2\n"]:
+            path = write_temp_file(text)
+            try:
+                self.assertRaises(ValueError, RegionList.read, path)
+            finally:
+                os.remove(path)
+
+    def test_match(self):
+        codes = np.array([1, 1, 1, 1, 1, 2, 23, 23], dtype=np.uint8)
+        positions = np.array([99, 100, 310, 311, 600, 150, 5, 6], dtype=np.int32)
+        self.assertEqual([False, True, True, False, True, False, True, False],
+                         self.region_list.match(codes, positions).tolist())
+        self.assertTrue(self.region_list.contains(23, 5))
+        self.assertFalse(RegionList([]).contains(1, 1))
+
+    def test_find_rows(self):
+        codes = np.array([0, 1, 1, 1, 1, 1, 23], dtype=np.uint8)
+        positions = np.array([0, 50, 100, 250, 400, 550, 5], dtype=np.int32)
+        self.assertEqual([2, 3, 5, 6], self.region_list.find_rows(codes, positions).tolist())
+
+####################################################################################
+#
+# Test selecting by RSID and region lists
+#
+####################################################################################
+class filters_test(SnpDirectory_test):
+
+    def test_rsid_list(self):
+        # One pass with a list counts the same as a run for each RSID
+        expected = {}
+        for rsid in ["rs4477212", "rs3131972"]:
+            self.params.set_rsid(rsid)
+            expected.update(self.get_counts(parse_snps(self.params)))
+        self.params.set_rsid("*")
+        self.params.set_rsid_list(RsidList(["rs4477212", "rs3131972", "rs1"]))
+        self.assertEqual(expected, self.get_counts(parse_snps(self.params)))
+
+    def test_region_list(self):
+        self.params.set_region_list(RegionList([(1, 72017, 72017), (2, 700000, 800000)]))
+        self.assertEqual([("RS3131972", "2", 742584), ("RS4477212", "1", 72017)],
+                         sorted(self.get_counts(parse_snps(self.params)).keys()))
+        self.params.set_workers(2)
+        self.assertEqual(2, len(parse_snps(self.params)))
+
+    def test_cache(self):
+        self.params.set_region_list(RegionList([(1, 700000, 800000)]))
+        self.params.set_rsid_list(RsidList(["rs3094315", "rs3131972"]))
+        expected = self.get_counts(parse_snps(self.params))
+        self.assertEqual([("RS3094315", "1", 742429)], expected.keys())
+        self.params.set_cache_directory(os.path.join(self.dir, "cache"))
+        parse_snps(self.params)
+        self.assertEqual(expected, self.get_counts(parse_snps(self.params)))
+
+if __name__ == '__main__':
+    unittest.main()
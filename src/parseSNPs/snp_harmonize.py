@@ -0,0 +1,91 @@
+"""
+This module harmonizes the genotypes counted for each SNP so the same genotype reported in
+different ways by different platforms is counted once.
+
+Two things are done to the counts of each SNP:
+    allele order    AG and GA are counted as AG, with the alleles in the sequence of snp_codes.alleles
+    strand          genotypes read from the opposite strand, such as TC for AG, are counted on the
+                    strand most of the SNP's alleles were reported on
+Which alleles of a SNP pair up across the strands is taken from its heterozygotes: A/G and T/C
+heterozygotes show an A/G SNP, A/C and T/G heterozygotes an A/C SNP.  SNPs with heterozygotes of
+both kinds, or of A/T or C/G, look the same from either strand and are only reordered.  With
+no reference genome available, the strand most alleles were reported on stands in for the
+forward strand.
+
+Each way a genotype can be changed is a lookup table over genotype codes, so the counts of every
+SNP are harmonized with a few NumPy operations per genotype rather than per SNP.
+"""
+
+import numpy as np
+from snp_codes import *
+
+# The genotype names of the heterozygotes that show how the alleles of a SNP pair up
+ag_heterozygotes = ["AG", "GA", "CT", "TC"]
+ac_heterozygotes = ["AC", "CA", "GT", "TG"]
+palindromic_heterozygotes = ["AT", "TA", "CG", "GC"]
+
+# The alleles reported on each strand of a SNP for each pairing, in the sequence of the cases of
+# fold_tables that fold them
+strand_alleles = [("AG", "CT"), ("AC", "GT")]
+
+# True for each genotype code in a list of genotype names
+def _is_genotype(names):
+    found = np.zeros(code_count, dtype=bool)
+    found[[genotype_codes[name] for name in names]] = True
+    return found
+
+is_ag_heterozygote = _is_genotype(ag_heterozygotes)
+is_ac_heterozygote = _is_genotype(ac_heterozygotes)
+is_palindromic_heterozygote = _is_genotype(palindromic_heterozygotes)
+
+# Build the table of the harmonized code of each genotype code when the genotypes with all their
+# called alleles in minority are read from the opposite strand
+def _build_fold_table(minority):
+    table = unordered_genotype_codes.copy()
+    for code, name in enumerate(genotype_names):
+        called = [allele for allele in name if allele in called_alleles]
+        if len(called) > 0 and all(allele in minority for allele in called):
+            table[code] = unordered_genotype_codes[complement_genotype_codes[code]]
+    return table
+
+# The harmonized code of each genotype code for each case: 0 only reorders the alleles, and the
+# others also fold the alleles of one strand of an A/G or A/C SNP onto the other
+fold_tables = np.array([unordered_genotype_codes] + [_build_fold_table(minority)
+                        for pair in strand_alleles for minority in pair])
+
+# Get the case of fold_tables that harmonizes each SNP from the total count of each genotype code.
+# totals is an array with a row for each SNP and a count for each code in codes.
+def get_fold_cases(codes, totals):
+    codes = np.asarray(codes, dtype=np.int64)
+    cases = np.zeros(len(totals), dtype=np.int64)
+    ag = totals[:, is_ag_heterozygote[codes]].sum(axis=1)
+    ac = totals[:, is_ac_heterozygote[codes]].sum(axis=1)
+    palindromic = totals[:, is_palindromic_heterozygote[codes]].sum(axis=1)
+    allele_totals = np.dot(totals, genotype_allele_counts[codes])
+    for pair_index, (pairing, other) in enumerate([(ag > 0, ac > 0), (ac > 0, ag > 0)]):
+        first, second = [allele_totals[:, [called_alleles.index(allele) for allele in strand]].sum(axis=1)
+                         for strand in strand_alleles[pair_index]]
+        rows = pairing & ~other & (palindromic == 0)
+        # Fold the strand with fewer alleles, keeping the first strand on a tie
+        cases[rows] = np.where(first[rows] < second[rows], 1, 2) + 2 * pair_index
+    return cases
+
+# Harmonize genotype counts, given as a list of genotype codes and an array with a row for each
+# SNP, a column for each group label and a count for each code.  Returns a tuple of (codes,
+# counts, changed) where codes and counts are in the same form and changed is a boolean array of
+# the SNPs whose counts were moved to other genotypes.  Genotypes that aren't recognized are left
+# as they are.
+def harmonize_counts(codes, counts):
+    codes = np.asarray(codes, dtype=np.int64)
+    totals = counts.sum(axis=1)
+    cases = get_fold_cases(codes, totals)
+    targets = fold_tables[:, codes].astype(np.int64)
+    changed = ((targets[cases] != codes) & (totals != 0)).any(axis=1)
+    harmonized_codes = np.unique(targets[np.unique(cases)])
+    target_slots = np.searchsorted(harmonized_codes, targets)
+    harmonized = np.zeros(counts.shape[:2] + (len(harmonized_codes),), dtype=counts.dtype)
+    rows = np.arange(len(counts))
+    for slot in range(len(codes)):
+        # Each SNP has one target for a slot, so no cell is added to twice here
+        harmonized[rows, :, target_slots[cases, slot]] += counts[:, :, slot]
+    return (harmonized_codes.tolist(), harmonized, changed)
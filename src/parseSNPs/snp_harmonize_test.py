@@ -0,0 +1,61 @@
+"""
+This program is designed to test the functions in snp_harmonize
+"""
+import sys
+import numpy as np
+from snp_classes import *
+from snp_results import ArrayResultsSet
+from snp_harmonize import *
+import unittest
+
+####################################################################################
+#
+# Test harmonizing genotype counts
+#
+####################################################################################
+class snp_harmonize_test(unittest.TestCase):
+
+    def setUp(self):
+        # RS1 is an A/G SNP with some genotypes from the opposite strand, RS2 an A/T SNP and
+        # RS3 has only homozygotes
+        self.chunks = {"Rollers": SnpChunk.from_strings(["RS1"] * 6 + ["RS2"] * 2 + ["RS3"] * 2, ["1"] * 10, [5] * 6 + [9] * 2 + [12] * 2,
+                                                        ["AG", "GA", "GA", "AA", "TC", "TT", "AT", "TA", "AA", "GG"]),
+                       "Non-Rollers": SnpChunk.from_strings(["RS1"] * 3 + ["RS3"], ["1"] * 4, [5] * 3 + [12],
+                                                            ["CT", "CC", "GG", "CC"])}
+
+    # Get the harmonized counts of a results set holding the sample chunks
+    def get_counts(self, results_set):
+        for label, snp_chunk in self.chunks.items():
+            results_set.add_chunk(label, snp_chunk)
+        results_set.harmonize()
+        return dict((result.get_rsid(), dict((label, result.get_group(label).get_counts()) for label in self.chunks))
+                    for result in results_set.get_results_iterator())
+
+    def test_tables(self):
+        self.assertEqual("AG", genotype_names[unordered_genotype_codes[genotype_codes["GA"]]])
+        self.assertEqual("TC", genotype_names[complement_genotype_codes[genotype_codes["AG"]]])
+        self.assertEqual("--", genotype_names[complement_genotype_codes[genotype_codes["--"]]])
+
+    def test_fold_cases(self):
+        codes = [genotype_codes[name] for name in ["AG", "TC", "AA", "AT", "AC"]]
+        totals = np.array([[3, 1, 4, 0, 0], [1, 3, 0, 0, 0], [3, 1, 0, 1, 0], [3, 1, 0, 0, 1], [0, 0, 4, 0, 0]])
+        # Fold T/C onto A/G, A/G onto T/C, and leave the palindromic, mixed and homozygous SNPs
+        self.assertEqual([2, 1, 0, 0, 0], get_fold_cases(codes, totals).tolist())
+
+    def test_harmonize(self):
+        for results_set in [ResultsSet(), ArrayResultsSet()]:
+            counts = self.get_counts(results_set)
+            self.assertEqual({"AG": 4, "AA": 2}, counts["RS1"]["Rollers"])
+            self.assertEqual({"AG": 1, "GG": 2}, counts["RS1"]["Non-Rollers"])
+            self.assertEqual({"AT": 2}, counts["RS2"]["Rollers"])
+            self.assertEqual({"AA": 1, "GG": 1}, counts["RS3"]["Rollers"])
+            self.assertEqual({"CC": 1}, counts["RS3"]["Non-Rollers"])
+
+    def test_decodeme_strand(self):
+        processor = DecodeMeSNPProcessor()
+        lines = ["rs1,A/G,1,5,-,TC\n", "rs2,A/G,1,6,+,TC\n"]
+        self.assertEqual(["AG", "TC"], decode_genotypes(processor.parse_lines(lines).get_genotype_codes()).tolist())
+        self.assertEqual("AG", processor.parse_line(lines[0]).get_genotype())
+
+if __name__ == '__main__':
+    unittest.main()
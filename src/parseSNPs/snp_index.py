@@ -0,0 +1,195 @@
+"""
+This module contains indexes used to find SNPs without checking every row of a file or matrix.
+
+Cached files (see snp_cache) and the genotype matrix (see snp_matrix) hold their rows sorted by
+chromosome code and then position, so the rows in a chromosome region can be found by bisecting.
+
+RsidIndex maps each rsid to the cached files and rows that hold it so single rsid queries read
+only those rows.  Rows are numbered in the sequence the cache wrote them in, which can differ
+from the sequence SnpCache.load sorts them into when this process codes chromosomes differently.
+To build the index in the cache directory named by the CACHEDIR keyword of a parameter file
+(see parse_files.txt) for the files it selects:
+    python snp_index.py parse_files.txt
+"""
+
+import sys
+import os
+import re
+import json
+import shutil
+import numpy as np
+from snp_codes import *
+from snp_classes import AbstractSNPProcessor
+
+# Find the rows of arrays sorted by chromosome code and then position that are on one of the
+# chromosomes in codes (or any chromosome if codes is None) between pos_start and pos_end inclusive.
+# Returns a NumPy array of row numbers in sequence.
+def find_region_rows(chromosome_codes, positions, codes, pos_start, pos_end):
+    if codes == None:
+        codes = range(len(chromosome_names))
+    ranges = []
+    for code in sorted(codes):
+        first = np.searchsorted(chromosome_codes, code, side="left")
+        last = np.searchsorted(chromosome_codes, code, side="right")
+        if first < last:
+            chromosome_positions = positions[first:last]
+            start = first + np.searchsorted(chromosome_positions, pos_start, side="left")
+            end = first + np.searchsorted(chromosome_positions, pos_end, side="right")
+            ranges.append(np.arange(start, end))
+    if len(ranges) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(ranges)
+
+# Find the rows of arrays sorted by chromosome code and then position that are in the region the
+# selections in params are limited to (see Params.is_region_query): on the chromosomes, between the
+# positions and in one of the regions of its RegionList.  Returns a NumPy array of row numbers in sequence.
+def find_query_rows(chromosome_codes, positions, params):
+    rows = find_region_rows(chromosome_codes, positions, params.get_chromosome_codes(),
+                            params.get_position_start(), params.get_position_end())
+    if params.get_region_list() != None:
+        rows = np.intersect1d(rows, params.get_region_list().find_rows(chromosome_codes, positions), assume_unique=True)
+    return rows
+
+# Get the order that sorts rows by chromosome code and then position
+def get_region_order(chromosome_codes, positions):
+    return np.lexsort((positions, chromosome_codes))
+
+####################################################################################
+#
+# Class to find the cached rows holding an rsid across all the cached SNP files
+#
+####################################################################################
+class RsidIndex:
+    # Version of the index layout.  An index with a different version isn't used.
+    version = 1
+
+    # Constructor.  Opens the index in index_dir.
+    # The index is held as sorted unique rsids (keys) and, for each key, a run of entries
+    # offsets[key]:offsets[key + 1] in the files and rows arrays giving the file and the row in
+    # that file's cached copy (see snp_cache).
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self.keys = self.load_array("keys")
+        self.offsets = self.load_array("offsets")
+        self.files = self.load_array("files")
+        self.rows = self.load_array("rows")
+        with open(os.path.join(index_dir, "sources.json")) as f:
+            self.sources = json.load(f)
+
+    # Convert the contents to a string
+    def __str__(self):
+        return "( RsidIndex: " + self.index_dir + ", " + str(len(self.sources)) + " files, " + \
+            str(len(self.keys)) + " rsids )"
+
+    # Memory-map one of the arrays in the index directory
+    def load_array(self, name):
+        return np.load(os.path.join(self.index_dir, name + ".npy"), mmap_mode="r")
+
+    # Get the directory the index is kept in for a cache directory
+    @staticmethod
+    def get_index_directory(cache_dir):
+        return os.path.join(cache_dir, "rsid_index")
+
+    # Return True if an index has been built in index_dir with the current layout
+    @staticmethod
+    def exists(index_dir):
+        path = os.path.join(index_dir, "sources.json")
+        if not os.path.exists(path):
+            return False
+        with open(os.path.join(index_dir, "version.json")) as f:
+            return json.load(f) == RsidIndex.version
+
+    # Get the cache meta data (see SnpCache.read_meta) recorded for each file name when the index was
+    # built.  The index rows for a file are only correct while its cached copy is unchanged.
+    def get_sources(self):
+        return dict((entry["filename"], entry["meta"]) for entry in self.sources)
+
+    # Find the entries for an rsid pattern.  Exact rsids and prefixes such as RS104* are looked up
+    # in the sorted keys.  Returns a dictionary of {filename: NumPy array of rows} or None if the
+    # pattern has other wild cards and can't be looked up.
+    def find(self, rsid):
+        rsid = rsid.upper()
+        if not re.search(r"[*?[]", rsid):
+            start = np.searchsorted(self.keys, rsid, side="left")
+            end = np.searchsorted(self.keys, rsid, side="right")
+        elif rsid.endswith("*") and len(rsid.rstrip("*")) > 0 and not re.search(r"[*?[]", rsid.rstrip("*")):
+            prefix = rsid.rstrip("*")
+            start = np.searchsorted(self.keys, prefix, side="left")
+            end = np.searchsorted(self.keys, prefix + "\xff", side="left")
+        else:
+            return None
+        files = np.asarray(self.files[self.offsets[start]:self.offsets[end]])
+        rows = np.asarray(self.rows[self.offsets[start]:self.offsets[end]])
+        found = {}
+        for file_id in np.unique(files):
+            found[self.sources[file_id]["filename"]] = np.sort(rows[files == file_id])
+        return found
+
+    # Build an index in the cache for the source files, replacing any earlier index.  Files that
+    # haven't been cached, or have changed since they were, are parsed into the cache first.
+    # The entries are placed with a counting sort so only the unique rsids are ever sorted.
+    @staticmethod
+    def build(cache, source_paths):
+        index_dir = RsidIndex.get_index_directory(cache.get_cache_directory())
+        source_paths = [path for path in source_paths if AbstractSNPProcessor.get_processor(path) != None]
+        for path in source_paths:
+            if not cache.is_current(path):
+                for snp_chunk in cache.parse_file(path, AbstractSNPProcessor.get_processor(path)):
+                    pass
+
+        # Find the unique rsids and the number of entries for each
+        keys = set()
+        for path in source_paths:
+            keys.update(cache.load(path, stored_order=True).get_rsids().tolist())
+        keys = np.array(sorted(keys), dtype="S")
+        key_ids = dict((key, key_id) for key_id, key in enumerate(keys.tolist()))
+        counts = np.zeros(len(keys), dtype=np.int64)
+        for path in source_paths:
+            counts += np.bincount(RsidIndex.get_key_ids(key_ids, cache.load(path, stored_order=True)), minlength=len(keys))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        if os.path.exists(index_dir):
+            shutil.rmtree(index_dir)
+        os.makedirs(index_dir)
+        np.save(os.path.join(index_dir, "keys.npy"), keys)
+        np.save(os.path.join(index_dir, "offsets.npy"), offsets)
+
+        # Place each file's entries after the entries already placed for the same rsid
+        files = np.lib.format.open_memmap(os.path.join(index_dir, "files.npy"), mode="w+", dtype=np.int32, shape=(offsets[-1],))
+        rows = np.lib.format.open_memmap(os.path.join(index_dir, "rows.npy"), mode="w+", dtype=np.int32, shape=(offsets[-1],))
+        next_entry = offsets[:-1].copy()
+        for file_id, path in enumerate(source_paths):
+            ids = RsidIndex.get_key_ids(key_ids, cache.load(path, stored_order=True))
+            order = np.argsort(ids, kind="mergesort")
+            sorted_ids = ids[order]
+            # An rsid can be in a file more than once.  Number the repeats 0, 1, 2...
+            firsts = np.searchsorted(sorted_ids, sorted_ids, side="left")
+            entries = next_entry[sorted_ids] + np.arange(len(sorted_ids)) - firsts
+            files[entries] = file_id
+            rows[entries] = order
+            next_entry += np.bincount(ids, minlength=len(keys))
+        files.flush()
+        rows.flush()
+        del files, rows
+
+        # sources.json is written last.  Its presence shows the index is complete.
+        with open(os.path.join(index_dir, "version.json"), "w") as f:
+            json.dump(RsidIndex.version, f)
+        with open(os.path.join(index_dir, "sources.json"), "w") as f:
+            json.dump([{"filename": os.path.basename(path), "meta": cache.read_meta(path)} for path in source_paths], f)
+        return RsidIndex(index_dir)
+
+    # Get the key ids for the rsids of a SnpChunk as a NumPy array
+    @staticmethod
+    def get_key_ids(key_ids, snp_chunk):
+        return np.fromiter(map(key_ids.__getitem__, snp_chunk.get_rsids().tolist()), dtype=np.int64, count=len(snp_chunk))
+
+if __name__ == "__main__":
+    from parse_files import read_params
+    from parse_SNPs import select_files
+    from snp_cache import SnpCache
+    params = read_params(sys.argv[1])
+    if params.get_cache_directory() == None:
+        sys.exit("Set CACHEDIR in the parameter file to the cache directory the index should be built in")
+    source_paths = [os.path.join(params.get_directory_location(), filename) for filename, label in select_files(params)[0]]
+    print str(RsidIndex.build(SnpCache(params.get_cache_directory()), source_paths))
@@ -0,0 +1,86 @@
+"""
+This program is designed to test the classes in snp_index
+"""
+import sys
+import os
+import multiprocessing
+from snp_classes import *
+from snp_codes import get_chromosome_code
+from snp_cache import SnpCache
+from snp_index import *
+from parse_SNPs import parse_snps, select_files, find_indexed_rows
+from parse_SNPs_test import SnpDirectory_test
+import unittest
+
+####################################################################################
+#
+# Test RsidIndex class
+#
+####################################################################################
+class RsidIndex_test(SnpDirectory_test):
+
+    def setUp(self):
+        SnpDirectory_test.setUp(self)
+        self.cache_dir = os.path.join(self.dir, "cache")
+        self.params.set_cache_directory(self.cache_dir)
+        self.cache = SnpCache(self.cache_dir)
+        self.source_paths = [os.path.join(self.dir, filename) for filename, label in select_files(self.params)[0]]
+        self.rsid_index = RsidIndex.build(self.cache, self.source_paths)
+
+    def test_build(self):
+        self.assertTrue(RsidIndex.exists(RsidIndex.get_index_directory(self.cache_dir)))
+        self.assertEqual(["RS2131925", "RS3094315", "RS3131972", "RS4477212"], self.rsid_index.keys.tolist())
+        self.assertEqual(5, len(self.rsid_index.get_sources()))
+
+    def test_find(self):
+        found = self.rsid_index.find("rs3094315")
+        self.assertEqual(["user1_file1_yearofbirth_unknown_sex_unknown.23andme.txt",
+                          "user2_file2_yearofbirth_1986_sex_XX.ftdna-illumina.txt"], sorted(found.keys()))
+        for filename, rows in found.items():
+            snp_chunk = self.cache.load(os.path.join(self.dir, filename), stored_order=True).select(rows)
+            self.assertEqual(["RS3094315"], snp_chunk.get_rsids().tolist())
+        self.assertEqual({}, self.rsid_index.find("rs1"))
+        self.assertEqual(2, len(self.rsid_index.find("RS3*")["user1_file1_yearofbirth_unknown_sex_unknown.23andme.txt"]))
+        self.assertEqual(None, self.rsid_index.find("RS3?94315"))
+
+    def test_parse_snps(self):
+        for rsid in ["rs3094315", "RS31*", "rs1"]:
+            self.params.set_rsid(rsid)
+            self.params.set_cache_directory(None)
+            expected = self.get_counts(parse_snps(self.params))
+            self.params.set_cache_directory(self.cache_dir)
+            self.assertEqual(expected, self.get_counts(parse_snps(self.params)))
+
+    def test_source_changed(self):
+        self.params.set_rsid("rs3094315")
+        self.assertEqual(5, len(find_indexed_rows(self.params, select_files(self.params)[0])))
+        with open(self.source_paths[0], "a") as f:
+            f.write("rs3094315\t1\t742429\tAA\n")
+        self.assertEqual(4, len(find_indexed_rows(self.params, select_files(self.params)[0])))
+        expected = self.get_counts(parse_snps(self.params))
+        self.params.set_cache_directory(None)
+        self.assertEqual(expected, self.get_counts(parse_snps(self.params)))
+
+    def test_chromosome_codes(self):
+        # A file with chromosomes this process hasn't coded yet, cached and indexed by another process
+        source_path = os.path.join(self.dir, "user7_file7_yearofbirth_unknown_sex_unknown.23andme.txt")
+        with open(source_path, "w") as f:
+            f.write("rs10\tINDEX_TEST_A\t100\tAA\nrs11\tINDEX_TEST_B\t200\tCC\n")
+        process = multiprocessing.Process(target=RsidIndex.build, args=(self.cache, self.source_paths + [source_path]))
+        process.start()
+        process.join()
+        self.assertEqual(0, process.exitcode)
+        # Coded in the other sequence here, so loading sorts the rows the other way round
+        get_chromosome_code("INDEX_TEST_B")
+        get_chromosome_code("INDEX_TEST_A")
+        self.assertEqual(["RS11", "RS10"], self.cache.load(source_path).get_rsids().tolist())
+        self.params.set_rsid("rs10")
+        found = find_indexed_rows(self.params, select_files(self.params)[0])
+        rows = found["user7_file7_yearofbirth_unknown_sex_unknown.23andme.txt"]
+        self.assertEqual([("RS10", "INDEX_TEST_A", 100, "AA")], self.cache.load(source_path, stored_order=True).select(rows).get_rows())
+        expected = self.get_counts(parse_snps(self.params))
+        self.params.set_cache_directory(None)
+        self.assertEqual(expected, self.get_counts(parse_snps(self.params)))
+
+if __name__ == '__main__':
+    unittest.main()
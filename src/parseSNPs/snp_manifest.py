@@ -0,0 +1,168 @@
+"""
+This module keeps a manifest of the SNP files in a dump and the results counted from them so a new
+dump only costs the time to parse the files that were added or changed.
+
+The manifest (manifest.json in the cache directory) records the size, modification time, content
+hash and processor of every file seen.  Results for each set of row selections (RSID, chromosomes
+and positions) are kept in a results directory named for the selections, holding the ResultsSet,
+the hash and group label each file was counted with, and the rows each file contributed.  A file
+that has been removed or changed since has its rows taken away from the ResultsSet again.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import cPickle
+import numpy as np
+from snp_classes import *
+from snp_sources import open_file, is_file, get_file_info
+from snp_results import new_results_set
+
+####################################################################################
+#
+# Class to manage the manifest and stored results in a cache directory
+#
+####################################################################################
+class SnpManifest:
+    # Version of the manifest and stored results.  Stored results with a different version are
+    # discarded.
+    version = 2
+
+    # Number of bytes hashed at a time
+    block_size = 4194304
+
+    # Constructor.  Reads the manifest in cache_dir if there is one.
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.files = {}
+        path = os.path.join(cache_dir, "manifest.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+            if manifest["version"] == SnpManifest.version:
+                self.files = manifest["files"]
+
+    # Convert the contents to a string
+    def __str__(self):
+        return "( SnpManifest: " + self.cache_dir + ", " + str(len(self.files)) + " files )"
+
+    # Get the manifest entry for a file name as a dictionary with size, mtime, hash and processor.
+    # Returns None if the file isn't in the manifest.
+    def get_entry(self, filename):
+        return self.files.get(filename)
+
+    # Get the md5 hash of the uncompressed contents of a file
+    @staticmethod
+    def get_hash(path):
+        md5 = hashlib.md5()
+        with open_file(path) as f:
+            for block in iter(lambda: f.read(SnpManifest.block_size), ""):
+                md5.update(block)
+        return md5.hexdigest()
+
+    # Bring the entries for the named files in a directory up to date and save the manifest.  A file
+    # is only hashed if it is new or its size or modification time has changed.  Directories, such
+    # as a cache directory kept with the SNP files, are recorded with no hash.
+    def update(self, directory, filenames):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            info = get_file_info(path)
+            entry = self.files.get(filename)
+            if entry == None or entry["size"] != info["size"] or entry["mtime"] != info["mtime"]:
+                processor = AbstractSNPProcessor.get_processor(filename)
+                self.files[filename] = {"size": info["size"],
+                                        "mtime": info["mtime"],
+                                        "hash": SnpManifest.get_hash(path) if is_file(path) else None,
+                                        "processor": processor.get_file_type_label() if processor != None else None}
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        self.write_json("manifest.json", {"version": SnpManifest.version, "files": self.files})
+
+    # Write a JSON file to the cache directory through a temporary file so readers never see part of it
+    def write_json(self, name, value):
+        handle, temp_path = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(handle, "w") as f:
+            json.dump(value, f)
+        if os.path.exists(os.path.join(self.cache_dir, name)):
+            os.remove(os.path.join(self.cache_dir, name))
+        os.rename(temp_path, os.path.join(self.cache_dir, name))
+
+    # Get the directory holding the stored results for the row selections and results backend in
+    # params.  File groups aren't part of the name since each file's rows are kept and can be moved
+    # between groups.
+    def get_results_path(self, params):
+        selections = [SnpManifest.version, params.get_rsid(), params.get_chromosomes(),
+                      params.get_position_start(), params.get_position_end(), params.get_results_backend()]
+        # Lists of RSIDs and regions are named by their contents
+        for selection_list in [params.get_rsid_list(), params.get_region_list()]:
+            if selection_list != None:
+                selections.append(selection_list.get_digest())
+        selections = json.dumps(selections)
+        return os.path.join(self.cache_dir, "results", hashlib.md5(selections).hexdigest())
+
+    # Read the results stored for the row selections in params.  Returns a tuple of (results_set,
+    # files) where files is a dictionary of {filename: {hash, label, lines_read, lines_processed,
+    # valid}} for the files counted in results_set.  Returns an empty ResultsSet and no files if
+    # nothing has been stored.
+    def load_results(self, params):
+        results_path = self.get_results_path(params)
+        if not os.path.exists(os.path.join(results_path, "files.json")):
+            return (new_results_set(params), {})
+        with open(os.path.join(results_path, "results.pkl"), "rb") as f:
+            results_set = cPickle.load(f)
+        with open(os.path.join(results_path, "files.json")) as f:
+            files = json.load(f)
+        return (results_set, files)
+
+    # Store the results for the row selections in params with the files they were counted from
+    # (see load_results)
+    def save_results(self, params, results_set, files):
+        results_path = self.get_results_path(params)
+        if not os.path.isdir(os.path.join(results_path, "files")):
+            os.makedirs(os.path.join(results_path, "files"))
+        # files.json is removed first and written last.  Its presence shows the results are complete.
+        if os.path.exists(os.path.join(results_path, "files.json")):
+            os.remove(os.path.join(results_path, "files.json"))
+        with open(os.path.join(results_path, "results.pkl"), "wb") as f:
+            cPickle.dump(results_set, f, cPickle.HIGHEST_PROTOCOL)
+        with open(os.path.join(results_path, "files.json"), "w") as f:
+            json.dump(files, f)
+
+    # Get the path of the rows a file contributed to the results stored for params
+    def get_file_rows_path(self, params, filename):
+        return os.path.join(self.get_results_path(params), "files", filename + ".npz")
+
+    # Read the rows a file contributed to the results stored for params as a SnpChunk
+    def load_file_rows(self, params, filename):
+        with np.load(self.get_file_rows_path(params, filename)) as arrays:
+            code_names = json.loads(str(arrays["code_names"])) if "code_names" in arrays.files else None
+            chromosome_codes, genotype_codes = import_codes(code_names, arrays["chromosome_codes"], arrays["genotype_codes"])
+            return SnpChunk(arrays["rsids"], chromosome_codes, arrays["positions"], genotype_codes)
+
+    # Save the rows a file contributes to the results stored for params from its SnpChunks
+    def save_file_rows(self, params, filename, snp_chunks):
+        path = self.get_file_rows_path(params, filename)
+        try:
+            os.makedirs(os.path.dirname(path))
+        except OSError:
+            # Another worker may have made the directory first
+            if not os.path.isdir(os.path.dirname(path)):
+                raise
+        snp_chunk = SnpChunk.concatenate(snp_chunks)
+        np.savez(path, rsids=snp_chunk.get_rsids(), chromosome_codes=snp_chunk.get_chromosome_codes(),
+                 positions=snp_chunk.get_positions(), genotype_codes=snp_chunk.get_genotype_codes(),
+                 code_names=np.array(json.dumps(get_code_names())))
+
+    # Take the rows of files that have been removed, changed or moved to another group since they
+    # were counted away from results_set.  selected_files is a list of (filename, label) tuples.
+    # Returns the list of selected files that still need to be parsed into results_set.
+    def remove_stale_files(self, params, results_set, files, selected_files):
+        labels = dict(selected_files)
+        for filename, counted in files.items():
+            entry = self.get_entry(filename)
+            if labels.get(filename) != counted["label"] or entry == None or entry["hash"] != counted["hash"]:
+                results_set.remove_chunk(counted["label"], self.load_file_rows(params, filename))
+                os.remove(self.get_file_rows_path(params, filename))
+                del files[filename]
+        return [(filename, label) for filename, label in selected_files if filename not in files]
@@ -0,0 +1,83 @@
+"""
+This program is designed to test the classes in snp_manifest
+"""
+import sys
+import os
+import shutil
+from snp_classes import *
+from snp_manifest import *
+from snp_filters import RsidList
+from parse_SNPs import parse_snps
+from parse_SNPs_test import SnpDirectory_test
+import unittest
+
+####################################################################################
+#
+# Test SnpManifest class and incremental runs of parse_snps
+#
+####################################################################################
+class SnpManifest_test(SnpDirectory_test):
+
+    def setUp(self):
+        SnpDirectory_test.setUp(self)
+        # Kept apart from the SNP files so the cache directory isn't one of the selected files
+        self.cache_dir = self.dir + "_cache"
+        self.manifest = SnpManifest(self.cache_dir)
+        self.filename = "user1_file1_yearofbirth_unknown_sex_unknown.23andme.txt"
+
+    def tearDown(self):
+        SnpDirectory_test.tearDown(self)
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    # Get the counts from an incremental run and check they match a full run
+    def get_incremental_counts(self):
+        self.params.set_cache_directory(self.cache_dir)
+        self.params.set_incremental(True)
+        counts = self.get_counts(parse_snps(self.params))
+        self.params.set_incremental(False)
+        self.params.set_cache_directory(None)
+        self.assertEqual(self.get_counts(parse_snps(self.params)), counts)
+        return counts
+
+    def test_update(self):
+        self.manifest.update(self.dir, [self.filename])
+        entry = self.manifest.get_entry(self.filename)
+        self.assertEqual(SnpManifest.get_hash(os.path.join(self.dir, self.filename)), entry["hash"])
+        self.assertEqual("23andme", entry["processor"])
+        self.assertEqual(entry, SnpManifest(self.cache_dir).get_entry(self.filename))
+        self.assertEqual(None, self.manifest.get_entry("user2_file2_yearofbirth_1986_sex_XX.ftdna-illumina.txt"))
+
+    def test_unchanged_files(self):
+        self.get_incremental_counts()
+        results_set, files = self.manifest.load_results(self.params)
+        self.assertEqual(5, len(files))
+        self.assertEqual(4, len(results_set))
+        self.get_incremental_counts()
+        self.assertTrue("Unchanged files: 5  files to parse: 0" in sys.stdout.getvalue())
+
+    def test_changed_files(self):
+        self.get_incremental_counts()
+        with open(os.path.join(self.dir, self.filename), "a") as f:
+            f.write("rs3131972\t2\t742584\tAG\nrs1\t3\t5\tCC\n")
+        os.remove(os.path.join(self.dir, "user3_file3_yearofbirth_1966_sex_unknown.illumina.txt"))
+        counts = self.get_incremental_counts()
+        self.assertEqual({"Default": {"GG": 1, "AG": 1}}, counts[("RS3131972", "2", 742584)])
+        self.assertTrue("Unchanged files: 3  files to parse: 1" in sys.stdout.getvalue())
+
+    def test_file_groups(self):
+        self.get_incremental_counts()
+        group1 = FileGroup("Group 1", 1)
+        group1.add_file_selector("user1_*.txt")
+        self.params.add_file_group(group1)
+        counts = self.get_incremental_counts()
+        self.assertEqual({"Group 1": {"AA": 1}}, counts[("RS4477212", "1", 72017)])
+
+    def test_selections(self):
+        self.get_incremental_counts()
+        self.params.add_chromosome("2")
+        self.assertEqual(1, len(self.get_incremental_counts()))
+        self.params.set_rsid_list(RsidList(["rs1"]))
+        self.assertEqual(0, len(self.get_incremental_counts()))
+
+if __name__ == '__main__':
+    unittest.main()
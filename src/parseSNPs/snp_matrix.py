@@ -0,0 +1,334 @@
+"""
+This module builds and reads a genotype matrix holding every selected SNP file.
+
+Rows of the matrix are SNP files and columns are SNPs sorted by chromosome, position and rsid.
+Each cell holds a genotype code (see snp_codes), or no_genotype_code where the file has no
+genotype for the SNP.  The matrix and its side tables are NumPy .npy files in one directory and
+are memory-mapped when read, so group counts and lookups are array slices instead of passes over
+the SNP files.  codes.json holds the names of the codes the matrix was built with, and
+build.json the directory and selections it was built from.  files.json records the size and
+modification time of each file, so a query is only answered from the matrix while the files it
+selects are the files the matrix was built from and its selections stay within those of the build
+(see open_matrix).  Otherwise the files are parsed.
+
+To build a matrix from the files selected by a parameter file (see parse_files.txt) into the
+directory named by its MATRIXDIR keyword:
+    python snp_matrix.py parse_files.txt
+"""
+
+import sys
+import os
+import re
+import json
+import shutil
+import numpy as np
+from snp_classes import *
+from snp_index import find_query_rows
+from snp_results import new_results_set
+from snp_sources import get_file_info
+from parse_SNPs import select_files, iter_file_chunks
+
+####################################################################################
+#
+# Class to build and query a genotype matrix
+#
+####################################################################################
+class GenotypeMatrix:
+    # Number of SNP columns counted at a time.  Limits the memory used for slices of the matrix.
+    block_size = 65536
+
+    # Constructor.  Opens the matrix in matrix_dir.
+    def __init__(self, matrix_dir):
+        self.matrix_dir = matrix_dir
+        self.genotypes = self.load_array("genotypes")
+        self.rsids = self.load_array("rsids")
+        self.chromosome_codes = self.load_array("chromosome_codes")
+        self.positions = self.load_array("positions")
+        self.rsid_order = self.load_array("rsid_order")
+        with open(os.path.join(matrix_dir, "files.json")) as f:
+            self.files = json.load(f)
+        with open(os.path.join(matrix_dir, "codes.json")) as f:
+            code_names = json.load(f)
+        self.build_info = None
+        if os.path.exists(os.path.join(matrix_dir, "build.json")):
+            with open(os.path.join(matrix_dir, "build.json")) as f:
+                self.build_info = json.load(f)
+        # Codes this process gives other names to are translated.  The genotypes are translated
+        # as they are read, so the matrix needn't be.
+        chromosome_translation = chromosome_table.import_names(code_names["chromosome_names"])
+        self.genotype_translation = genotype_table.import_names(code_names["genotype_names"])
+        self.region_ordered = True
+        if chromosome_translation is not None:
+            self.chromosome_codes = chromosome_translation[self.chromosome_codes]
+            self.region_ordered = bool((np.diff(self.chromosome_codes.astype(np.int64)) >= 0).all())
+        self.rows = dict((entry["filename"], row) for row, entry in enumerate(self.files))
+
+    # Convert the contents to a string
+    def __str__(self):
+        return "( GenotypeMatrix: " + self.matrix_dir + ", " + str(self.get_file_count()) + " files, " + \
+            str(self.get_snp_count()) + " SNPs )"
+
+    # Memory-map one of the arrays in the matrix directory
+    def load_array(self, name):
+        return np.load(os.path.join(self.matrix_dir, name + ".npy"), mmap_mode="r")
+
+    # Return True if a matrix has been built in matrix_dir.  Matrices built before the names of
+    # the codes were stored used code 0 for missing genotypes, and need building again.
+    @staticmethod
+    def exists(matrix_dir):
+        return os.path.exists(os.path.join(matrix_dir, "files.json")) and os.path.exists(os.path.join(matrix_dir, "codes.json"))
+
+    # Get the selections in params that decide which SNPs are in a matrix, as a dictionary that
+    # can be written as JSON.  Lists of RSIDs and regions are recorded by their digests.
+    @staticmethod
+    def get_selections(params):
+        return {"rsid": params.get_rsid(),
+                "chromosomes": params.get_chromosomes(),
+                "pos_start": params.get_position_start(),
+                "pos_end": params.get_position_end(),
+                "rsid_list": params.get_rsid_list().get_digest() if params.get_rsid_list() != None else None,
+                "region_list": params.get_region_list().get_digest() if params.get_region_list() != None else None}
+
+    # Get why the matrix can't answer a query with params, or None if it can.  It can't if the
+    # files the query selects aren't the files the matrix was built from, as they were then, or
+    # the query's selections can reach SNPs the matrix was built without.
+    def get_stale_reason(self, params):
+        if self.build_info == None:
+            return "it was built before its sources were recorded; build it again with snp_matrix.py"
+        return self.get_changed_files(params) or self.get_wider_selection(params)
+
+    # Get why the files params selects differ from those the matrix was built from, or None if they
+    # don't: the query reads another directory, or a file has been added, changed or removed since.
+    # Files with no processor add nothing to the counts, so they are left out.
+    def get_changed_files(self, params):
+        directory = params.get_directory_location()
+        if os.path.abspath(directory) != self.build_info["directory"]:
+            return "it was built from " + self.build_info["directory"] + ", not " + directory
+        selected_files = [(filename, label) for filename, label in select_files(params)[0]
+                          if AbstractSNPProcessor.get_processor(filename) != None]
+        for filename, label in selected_files:
+            row = self.get_row(filename)
+            if row == None:
+                return filename + " has been added since it was built"
+            if get_file_info(os.path.join(directory, filename)) != self.files[row]["source"]:
+                return filename + " has changed since it was built"
+        selected = set(filename for filename, label in selected_files)
+        for entry in self.files:
+            if entry["filename"] not in selected and params.get_file_group_label(entry["filename"]) != None and \
+                    AbstractSNPProcessor.get_processor(entry["filename"]) != None:
+                return entry["filename"] + " has been removed since it was built"
+        return None
+
+    # Get why the selections in params can reach SNPs the matrix was built without, or None if they
+    # can't.  Each selection the matrix was built with has to be kept by the query, or narrowed to
+    # values it matches.  Lists of RSIDs and regions have to be the same lists.
+    def get_wider_selection(self, params):
+        built = self.build_info["selections"]
+        built_chromosomes = [str(chromosome) for chromosome in built["chromosomes"] or []]
+        plan = QueryPlan(str(built["rsid"]), built_chromosomes, built["pos_start"], built["pos_end"])
+        rsid = params.get_rsid()
+        if plan.selects_rsids() and rsid != built["rsid"] and \
+                (QueryPlan.wildcard_pattern.search(rsid) or not plan.match_rsids(np.array([rsid]))[0]):
+            return "RSID " + rsid + " isn't within the RSID " + built["rsid"] + " it was built with"
+        if plan.selects_chromosomes():
+            if not params.get_chromosomes():
+                return "every chromosome is selected, not only the CHROMOSOMES " + ",".join(built_chromosomes) + " it was built with"
+            for chromosome in params.get_chromosomes():
+                if chromosome not in built_chromosomes and \
+                        (QueryPlan.wildcard_pattern.search(chromosome) or plan.chromosome_regex.match(chromosome) == None):
+                    return "chromosome " + chromosome + " isn't within the CHROMOSOMES " + ",".join(built_chromosomes) + " it was built with"
+        if params.get_position_start() < built["pos_start"] or params.get_position_end() > built["pos_end"]:
+            return "the positions aren't within POSSTART " + str(built["pos_start"]) + " and POSEND " + str(built["pos_end"]) + " it was built with"
+        selections = GenotypeMatrix.get_selections(params)
+        for name, keyword in [("rsid_list", "RSIDFILE"), ("region_list", "REGIONFILE")]:
+            if built[name] != None and selections[name] != built[name]:
+                return "it was built with another " + keyword
+        return None
+
+    # Get the number of files (rows) in the matrix
+    def get_file_count(self):
+        return self.genotypes.shape[0]
+
+    # Get the number of SNPs (columns) in the matrix
+    def get_snp_count(self):
+        return self.genotypes.shape[1]
+
+    # Get the file names in row sequence
+    def get_filenames(self):
+        return [entry["filename"] for entry in self.files]
+
+    # Get the row for a file name.  Returns None if the file isn't in the matrix.
+    def get_row(self, filename):
+        return self.rows.get(filename)
+
+    # Get a NumPy array of the columns for an rsid.  An rsid can be found at more than one position.
+    def get_columns(self, rsid):
+        rsid = rsid.upper()
+        start = np.searchsorted(self.rsids, rsid, side="left", sorter=self.rsid_order)
+        end = np.searchsorted(self.rsids, rsid, side="right", sorter=self.rsid_order)
+        return np.sort(self.rsid_order[start:end])
+
+    # Get the SNPs (the matrix columns) as a SnpChunk with no genotypes
+    def get_snps(self):
+        return SnpChunk(self.rsids, self.chromosome_codes, self.positions, np.zeros(len(self.rsids), dtype=np.uint8))
+
+    # Get the genotype codes for one column as an array in row sequence
+    def get_column_genotypes(self, column):
+        return self.translate_genotypes(np.asarray(self.genotypes[:, column]))
+
+    # Translate genotype codes read from the matrix to the codes of this process
+    def translate_genotypes(self, codes):
+        if self.genotype_translation is None:
+            return codes
+        return self.genotype_translation[codes]
+
+    # Get a NumPy array of the columns holding SNPs that pass the selections in params
+    def select_columns(self, params):
+        if len(params.get_rsid().strip("*")) > 0 and not re.search(r"[*?[]", params.get_rsid()):
+            # A single rsid can be found without checking every column
+            columns = self.get_columns(params.get_rsid())
+        elif params.get_rsid_list() != None:
+            # So can each rsid in a list
+            columns = np.unique(np.concatenate([self.get_columns(rsid) for rsid in params.get_rsid_list().get_rsids().tolist()] +
+                                               [np.zeros(0, dtype=np.int64)]))
+        elif params.is_region_query() and self.region_ordered:
+            # Columns are sorted by chromosome and position so a region can be found by bisecting
+            columns = find_query_rows(self.chromosome_codes, self.positions, params)
+        else:
+            return np.flatnonzero(params.process_chunk(self.get_snps()))
+        return columns[params.process_chunk(self.get_snps().select(columns))]
+
+    # Get the rows for each file group in params as a list of (label, rows) tuples, where rows is a
+    # NumPy array.  Groups are listed in the sequence their first file appears in the matrix.
+    def get_group_rows(self, params):
+        group_rows = {}
+        labels = []
+        for row, entry in enumerate(self.files):
+            label = params.get_file_group_label(entry["filename"])
+            if label != None:
+                if label not in group_rows:
+                    group_rows[label] = []
+                    labels.append(label)
+                group_rows[label].append(row)
+        return [(label, np.array(group_rows[label])) for label in labels]
+
+    # Count the genotypes in each file group for the SNPs that pass the selections in params, a
+    # block of columns at a time so only part of the matrix is read and counted at once.  Yields a
+    # tuple of (label, columns, codes, counts) for each group in each block, where the three NumPy
+    # arrays hold each column and genotype code counted, as stored in the matrix, and its count.
+    # SNPs a file has no genotype for aren't counted.
+    def iter_group_counts(self, params):
+        columns = self.select_columns(params)
+        group_rows = self.get_group_rows(params)
+        blocks = columns // GenotypeMatrix.block_size
+        for block in np.unique(blocks):
+            block_columns = columns[blocks == block]
+            start = block * GenotypeMatrix.block_size
+            end = min(start + GenotypeMatrix.block_size, self.get_snp_count())
+            for label, rows in group_rows:
+                codes = np.asarray(self.genotypes[rows, start:end])[:, block_columns - start]
+                # Number the codes found in the block from 0 so only those are counted for each column
+                found_codes = np.flatnonzero(np.bincount(codes.ravel(), minlength=code_count))
+                found_codes = found_codes[found_codes != no_genotype_code]
+                if len(found_codes) == 0:
+                    continue
+                slots = np.zeros(code_count, dtype=np.int64) - 1
+                slots[found_codes] = np.arange(len(found_codes))
+                code_slots = slots[codes]
+                cells = (code_slots + np.arange(len(block_columns)) * len(found_codes))[code_slots >= 0]
+                counts = np.bincount(cells, minlength=len(block_columns) * len(found_codes))
+                cells = np.flatnonzero(counts)
+                yield (label, block_columns[cells // len(found_codes)], found_codes[cells % len(found_codes)].astype(np.uint8),
+                       counts[cells])
+
+    # Get a ResultsSet for the SNPs and file groups selected by params, holding the same counts
+    # parse_snps would return for the files in the matrix
+    def get_results_set(self, params):
+        results_set = new_results_set(params)
+        for label, columns, codes, counts in self.iter_group_counts(params):
+            snp_chunk = SnpChunk(self.rsids[columns], self.chromosome_codes[columns], self.positions[columns],
+                                 self.translate_genotypes(codes))
+            results_set.add_chunk(label, snp_chunk, counts)
+        return results_set
+
+    # Build a matrix in matrix_dir from the files selected by params, replacing any earlier matrix.
+    # Only the lines that pass the selections in params are included.  Each file is read twice,
+    # once to find the SNPs and once to fill in the genotypes, so setting a cache directory in
+    # params (see snp_cache) saves parsing the text files a second time.
+    @staticmethod
+    def build(params, matrix_dir):
+        selected_files = sorted(select_files(params)[0])
+        # Files are recorded as they were before they were read, so a change while the matrix is
+        # built is found by the next query
+        sources = dict((filename, get_file_info(os.path.join(params.get_directory_location(), filename)))
+                       for filename, label in selected_files)
+
+        # Find every SNP in the selected files
+        keys = set()
+        for filename, label in selected_files:
+            for snp_chunk in iter_file_chunks(params, filename):
+                keys.update(GenotypeMatrix.get_keys(snp_chunk))
+        keys = sorted(keys)
+        key_columns = dict((key, column) for column, key in enumerate(keys))
+
+        if os.path.exists(matrix_dir):
+            shutil.rmtree(matrix_dir)
+        os.makedirs(matrix_dir)
+        chromosome_codes = np.array([key[0] for key in keys], dtype=np.uint8)
+        positions = np.array([key[1] for key in keys], dtype=np.int32)
+        rsids = np.array([key[2] for key in keys], dtype="S")
+        np.save(os.path.join(matrix_dir, "chromosome_codes.npy"), chromosome_codes)
+        np.save(os.path.join(matrix_dir, "positions.npy"), positions)
+        np.save(os.path.join(matrix_dir, "rsids.npy"), rsids)
+        np.save(os.path.join(matrix_dir, "rsid_order.npy"), np.argsort(rsids, kind="mergesort").astype(np.int32))
+
+        # Fill in the genotypes a file at a time
+        genotypes = np.lib.format.open_memmap(os.path.join(matrix_dir, "genotypes.npy"), mode="w+",
+                                              dtype=np.uint8, shape=(len(selected_files), len(keys)))
+        genotypes[:] = no_genotype_code
+        for row, (filename, label) in enumerate(selected_files):
+            for snp_chunk in iter_file_chunks(params, filename):
+                columns = np.fromiter(map(key_columns.__getitem__, GenotypeMatrix.get_keys(snp_chunk)),
+                                      dtype=np.int64, count=len(snp_chunk))
+                genotypes[row, columns] = snp_chunk.get_genotype_codes()
+        genotypes.flush()
+        del genotypes
+
+        with open(os.path.join(matrix_dir, "codes.json"), "w") as f:
+            json.dump(get_code_names(), f)
+        with open(os.path.join(matrix_dir, "build.json"), "w") as f:
+            json.dump({"directory": os.path.abspath(params.get_directory_location()),
+                       "selections": GenotypeMatrix.get_selections(params)}, f)
+        # files.json is written last.  Its presence shows the matrix is complete.
+        with open(os.path.join(matrix_dir, "files.json"), "w") as f:
+            json.dump([{"filename": filename, "label": label, "source": sources[filename]} for filename, label in selected_files], f)
+        return GenotypeMatrix(matrix_dir)
+
+    # Get the (chromosome code, position, rsid) keys for the rows of a SnpChunk.  Sorting the keys
+    # sorts them into the matrix column sequence.
+    @staticmethod
+    def get_keys(snp_chunk):
+        return zip(snp_chunk.get_chromosome_codes().tolist(), snp_chunk.get_positions().tolist(),
+                   snp_chunk.get_rsids().tolist())
+
+# Open the genotype matrix in the matrix directory named by params if one has been built and it
+# can answer the query (see GenotypeMatrix.get_stale_reason).  Returns None, saying why if a matrix
+# has been built, if the query has to be answered from the files.
+def open_matrix(params):
+    matrix_dir = params.get_matrix_directory()
+    if matrix_dir == None or not GenotypeMatrix.exists(matrix_dir):
+        return None
+    matrix = GenotypeMatrix(matrix_dir)
+    reason = matrix.get_stale_reason(params)
+    if reason != None:
+        print "Not using the genotype matrix in " + matrix_dir + ": " + reason
+        return None
+    return matrix
+
+if __name__ == "__main__":
+    from parse_files import read_params
+    params = read_params(sys.argv[1])
+    if params.get_matrix_directory() == None:
+        sys.exit("Set MATRIXDIR in the parameter file to the directory the matrix should be built in")
+    matrix = GenotypeMatrix.build(params, params.get_matrix_directory())
+    print str(matrix)
@@ -0,0 +1,145 @@
+"""
+This program is designed to test the classes in snp_matrix
+"""
+import sys
+import os
+from snp_classes import *
+from snp_matrix import *
+from snp_filters import RsidList, RegionList
+from parse_SNPs import parse_snps
+from parse_SNPs_test import SnpDirectory_test
+import unittest
+
+####################################################################################
+#
+# Test GenotypeMatrix class
+#
+####################################################################################
+class GenotypeMatrix_test(SnpDirectory_test):
+
+    def setUp(self):
+        SnpDirectory_test.setUp(self)
+        self.matrix_dir = os.path.join(self.dir, "matrix")
+        self.matrix = GenotypeMatrix.build(self.params, self.matrix_dir)
+
+    def test_build(self):
+        self.assertTrue(GenotypeMatrix.exists(self.matrix_dir))
+        self.assertEqual(5, self.matrix.get_file_count())
+        self.assertEqual(4, self.matrix.get_snp_count())
+        # Columns are in chromosome and position sequence
+        self.assertEqual(["RS2131925", "RS4477212", "RS3094315", "RS3131972"], self.matrix.get_snps().get_rsids().tolist())
+
+    def test_lookups(self):
+        row = self.matrix.get_row("user2_file2_yearofbirth_1986_sex_XX.ftdna-illumina.txt")
+        columns = self.matrix.get_columns("rs3094315")
+        self.assertEqual([2], columns.tolist())
+        self.assertEqual("GG", genotype_names[self.matrix.get_column_genotypes(columns[0])[row]])
+        self.assertEqual(None, self.matrix.get_row("user99_file99.23andme.txt"))
+        self.assertEqual(0, len(self.matrix.get_columns("rs1")))
+
+    def test_get_results_set(self):
+        group1 = FileGroup("Group 1", 1)
+        group1.add_file_selector("user1_*.txt")
+        group2 = FileGroup("Group 2", 2)
+        group2.add_file_selector("*.txt")
+        self.params.add_file_group(group1)
+        self.params.add_file_group(group2)
+        for rsid in ["*", "rs3094315", "rs30*"]:
+            self.params.set_rsid(rsid)
+            self.assertEqual(self.get_counts(parse_snps(self.params)), self.get_counts(self.matrix.get_results_set(self.params)))
+        self.params.set_rsid("*")
+        self.params.add_chromosome("2")
+        self.assertEqual(self.get_counts(parse_snps(self.params)), self.get_counts(self.matrix.get_results_set(self.params)))
+        self.params.set_rsid_list(RsidList(["rs4477212", "rs3131972"]))
+        self.assertEqual(self.get_counts(parse_snps(self.params)), self.get_counts(self.matrix.get_results_set(self.params)))
+        self.params.set_rsid_list(None)
+        self.params.set_region_list(RegionList([(2, 1, 1000000)]))
+        self.assertEqual(self.get_counts(parse_snps(self.params)), self.get_counts(self.matrix.get_results_set(self.params)))
+
+    def test_blocks(self):
+        # Columns are counted a block at a time
+        expected = self.get_counts(self.matrix.get_results_set(self.params))
+        GenotypeMatrix.block_size = 3
+        try:
+            self.assertEqual(expected, self.get_counts(self.matrix.get_results_set(self.params)))
+            self.params.set_rsid("rs3131972")
+            self.assertEqual(self.get_counts(parse_snps(self.params)), self.get_counts(self.matrix.get_results_set(self.params)))
+        finally:
+            GenotypeMatrix.block_size = 65536
+
+    def test_unknown_names(self):
+        # A genotype of ? is counted, while SNPs a file has no genotype for aren't
+        with open(os.path.join(self.dir, "user7_file7_yearofbirth_unknown_sex_unknown.23andme.txt"), "w") as f:
+            f.write("rs7\t0\t700\tNN\nrs8\t1\t5\t?\nrs9\tx\t900\tAG\n")
+        self.matrix = GenotypeMatrix.build(self.params, self.matrix_dir)
+        counts = self.get_counts(self.matrix.get_results_set(self.params))
+        self.assertEqual(self.get_counts(parse_snps(self.params)), counts)
+        self.assertEqual({"Default": {"?": 1}}, counts[("RS8", "1", 5)])
+        self.params.add_chromosome("x")
+        self.assertEqual([("RS9", "x", 900)], self.get_counts(self.matrix.get_results_set(self.params)).keys())
+
+    def test_exists(self):
+        # Matrices built before codes.json was written are built again
+        os.remove(os.path.join(self.matrix_dir, "codes.json"))
+        self.assertFalse(GenotypeMatrix.exists(self.matrix_dir))
+
+    def test_changed_files(self):
+        self.params.set_matrix_directory(self.matrix_dir)
+        self.assertEqual(None, self.matrix.get_stale_reason(self.params))
+        self.assertTrue(open_matrix(self.params) != None)
+        # Added, changed and removed files are found
+        added = os.path.join(self.dir, "user7_file7_yearofbirth_unknown_sex_unknown.23andme.txt")
+        with open(added, "w") as f:
+            f.write("rs7\t1\t700\tAA\n")
+        self.assertTrue("added" in self.matrix.get_stale_reason(self.params))
+        self.assertEqual(None, open_matrix(self.params))
+        group = FileGroup("Group 1", 1)
+        group.add_file_selector("user1_*.txt")
+        self.params.add_file_group(group)
+        self.assertEqual(None, self.matrix.get_stale_reason(self.params))
+        with open(os.path.join(self.dir, "user1_file1_yearofbirth_unknown_sex_unknown.23andme.txt"), "a") as f:
+            f.write("rs7\t1\t700\tAA\n")
+        self.assertTrue("changed" in self.matrix.get_stale_reason(self.params))
+        os.remove(os.path.join(self.dir, "user1_file1_yearofbirth_unknown_sex_unknown.23andme.txt"))
+        self.assertTrue("removed" in self.matrix.get_stale_reason(self.params))
+        self.params.set_directory_location(self.matrix_dir)
+        self.assertTrue("built from" in self.matrix.get_stale_reason(self.params))
+        # Matrices built before build.json was written are built again
+        os.remove(os.path.join(self.matrix_dir, "build.json"))
+        self.assertTrue("build it again" in GenotypeMatrix(self.matrix_dir).get_stale_reason(self.params))
+
+    def test_wider_selection(self):
+        params = self.new_params("rs3*", "1", 1000)
+        self.matrix = GenotypeMatrix.build(params, self.matrix_dir)
+        self.assertEqual(None, self.matrix.get_stale_reason(params))
+        # Narrower selections are answered from the matrix
+        params.set_rsid("rs3094315")
+        params.set_position_end(800000)
+        self.assertEqual(None, self.matrix.get_stale_reason(params))
+        self.assertEqual(self.get_counts(parse_snps(params)), self.get_counts(self.matrix.get_results_set(params)))
+        for wider in [self.new_params("rs4477212", "1", 1000), self.new_params("rs*", "1", 1000),
+                      self.new_params("rs3*", "2", 1000), self.new_params("rs3*", None, 1000), self.new_params("rs3*", "1", 999)]:
+            self.assertTrue(self.matrix.get_stale_reason(wider) != None, str(wider))
+        # A matrix of every SNP can answer any selection
+        params.set_region_list(RegionList([(1, 1, 1000000)]))
+        self.matrix = GenotypeMatrix.build(self.params, self.matrix_dir)
+        self.assertEqual(None, self.matrix.get_stale_reason(params))
+        # Lists of regions have to be the same
+        self.params.set_region_list(RegionList([(1, 1, 2000000)]))
+        self.matrix = GenotypeMatrix.build(self.params, self.matrix_dir)
+        self.assertTrue("REGIONFILE" in self.matrix.get_stale_reason(params))
+        params.set_region_list(RegionList([(1, 1, 2000000)]))
+        self.assertEqual(None, self.matrix.get_stale_reason(params))
+
+    # Get params for the test directory with an RSID, a chromosome or None, and a first position
+    def new_params(self, rsid, chromosome, pos_start):
+        params = Params()
+        params.set_directory_location(self.dir)
+        params.set_rsid(rsid)
+        if chromosome != None:
+            params.add_chromosome(chromosome)
+        params.set_position_start(pos_start)
+        return params
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+"""
+This module records what parse_snps did in a run so slow file types and stages can be found.
+
+A FileMetrics is kept for each file parsed, holding the bytes and lines read, the lines accepted
+and rejected by the selections, and the seconds spent parsing lines into SnpChunks, filtering the
+rows and adding them to the results set.  RunMetrics holds the FileMetrics of a run, the files
+skipped and why, and the peak resident memory of the processes that did the parsing.  It totals
+the files by processor and can be written as a JSON report (METRICS in parse_files.txt).
+"""
+
+import os
+import json
+import time
+import psutil
+
+# Reasons files are skipped
+bypassed_reason = "bypassed"
+no_processor_reason = "no processor for the file type"
+invalid_reason = "has a line that can't be parsed"
+
+# Get the resident memory of this process in bytes
+def get_rss():
+    return psutil.Process(os.getpid()).memory_info().rss
+
+####################################################################################
+#
+# Metrics for one parsed file
+#
+####################################################################################
+class FileMetrics:
+    # Names of the values listed by to_dict
+    fields = ["filename", "label", "file_type", "source", "bytes_read", "lines_read", "lines_accepted",
+              "lines_rejected", "parse_seconds", "filter_seconds", "aggregate_seconds", "lines_per_second",
+              "peak_rss", "valid", "reason"]
+
+    # Constructor.  file_type is the processor's file type label, or None if there is no processor.
+    def __init__(self, filename, label, file_type):
+        self.filename = filename
+        self.label = label
+        self.file_type = file_type
+        # Where the rows were read from: "text", "cache" or "index"
+        self.source = "text"
+        self.bytes_read = 0
+        self.lines_read = 0
+        self.lines_accepted = 0
+        self.parse_seconds = 0.0
+        self.filter_seconds = 0.0
+        self.aggregate_seconds = 0.0
+        self.peak_rss = 0
+        self.valid = file_type != None
+        # Why the file isn't valid, if the processor gave a reason
+        self.reason = None
+
+    # Convert the contents to a string
+    def __str__(self):
+        return ("( FileMetrics: " + self.filename + ", " + str(self.file_type) + " from " + self.source +
+                ", lines read " + str(self.lines_read) + ", accepted " + str(self.lines_accepted) +
+                ", %.3f seconds )" % self.get_seconds())
+
+    # Record a block of lines read, and how many of them were accepted
+    def add_lines(self, lines_read, lines_accepted):
+        self.lines_read += lines_read
+        self.lines_accepted += lines_accepted
+
+    # Record the resident memory of the process parsing the file
+    def sample_memory(self):
+        self.peak_rss = max(self.peak_rss, get_rss())
+
+    # Get the number of lines read that weren't accepted by the selections
+    def get_lines_rejected(self):
+        return self.lines_read - self.lines_accepted
+
+    # Get the seconds spent parsing, filtering and adding the rows
+    def get_seconds(self):
+        return self.parse_seconds + self.filter_seconds + self.aggregate_seconds
+
+    # Get the lines read per second of parsing, filtering and adding the rows
+    def get_lines_per_second(self):
+        seconds = self.get_seconds()
+        return self.lines_read / seconds if seconds > 0 else 0.0
+
+    # Get the metrics as a dictionary of the values named in fields
+    def to_dict(self):
+        values = dict(self.__dict__)
+        values["lines_rejected"] = self.get_lines_rejected()
+        values["lines_per_second"] = self.get_lines_per_second()
+        return dict((field, values[field]) for field in FileMetrics.fields)
+
+####################################################################################
+#
+# Metrics for a run of parse_snps
+#
+####################################################################################
+class RunMetrics:
+    # Totals listed for each processor by get_processor_totals
+    totals = ["bytes_read", "lines_read", "lines_accepted", "lines_rejected", "parse_seconds",
+              "filter_seconds", "aggregate_seconds"]
+
+    # Constructor.  The run is timed from when this is created.
+    def __init__(self):
+        self.start = time.time()
+        self.elapsed_seconds = 0.0
+        self.files = []
+        self.skipped = {}
+        self.peak_rss = 0
+        self.sample_memory()
+
+    # Get the number of files parsed
+    def __len__(self):
+        return len(self.files)
+
+    # Convert the contents to a string
+    def __str__(self):
+        string_out = "( RunMetrics: " + str(len(self.files)) + " files parsed, " + str(len(self.skipped)) + " skipped"
+        string_out += ", %.3f seconds" % self.elapsed_seconds
+        for file_type, totals in sorted(self.get_processor_totals().items()):
+            string_out += "\n   " + str(file_type) + ": " + str(totals["files"]) + " files, " + str(totals["lines_read"]) + " lines"
+            string_out += ", %.3f parse, %.3f filter, %.3f aggregate seconds, %d lines/second" % (
+                totals["parse_seconds"], totals["filter_seconds"], totals["aggregate_seconds"], totals["lines_per_second"])
+        string_out += "\n)"
+        return string_out
+
+    # Add the metrics of a parsed file.  The file is recorded as skipped if it isn't valid.
+    def add_file(self, file_metrics):
+        self.files.append(file_metrics)
+        self.peak_rss = max(self.peak_rss, file_metrics.peak_rss)
+        if not file_metrics.valid:
+            if file_metrics.file_type == None:
+                self.add_skipped(file_metrics.filename, no_processor_reason)
+            else:
+                self.add_skipped(file_metrics.filename, file_metrics.reason or invalid_reason)
+
+    # Record a file that was skipped and why
+    def add_skipped(self, filename, reason):
+        self.skipped[filename] = reason
+
+    # Get the files skipped as a dictionary of {filename: reason}
+    def get_skipped(self):
+        return self.skipped
+
+    # Get the metrics of the files parsed, in the sequence they were added
+    def get_files(self):
+        return self.files
+
+    # Record the resident memory of this process
+    def sample_memory(self):
+        self.peak_rss = max(self.peak_rss, get_rss())
+
+    # Record the end of the run
+    def finish(self):
+        self.sample_memory()
+        self.elapsed_seconds = time.time() - self.start
+
+    # Get the totals of the files parsed by each processor as a dictionary of {file type: {name: total}}
+    # with the totals named in totals, the number of files and the lines read per second
+    def get_processor_totals(self):
+        processor_totals = {}
+        for file_metrics in self.files:
+            values = file_metrics.to_dict()
+            totals = processor_totals.setdefault(file_metrics.file_type, dict((name, 0) for name in RunMetrics.totals + ["files"]))
+            totals["files"] += 1
+            for name in RunMetrics.totals:
+                totals[name] += values[name]
+        for totals in processor_totals.values():
+            seconds = totals["parse_seconds"] + totals["filter_seconds"] + totals["aggregate_seconds"]
+            totals["lines_per_second"] = totals["lines_read"] / seconds if seconds > 0 else 0.0
+        return processor_totals
+
+    # Get the metrics as a dictionary that can be written as JSON
+    def to_dict(self):
+        return {"elapsed_seconds": self.elapsed_seconds,
+                "peak_rss": self.peak_rss,
+                "processors": dict((str(file_type), totals) for file_type, totals in self.get_processor_totals().items()),
+                "files": [file_metrics.to_dict() for file_metrics in self.files],
+                "skipped": self.skipped}
+
+    # Write the metrics to a JSON file
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
@@ -0,0 +1,95 @@
+"""
+This program is designed to test the classes in snp_metrics
+"""
+import sys
+import os
+import json
+import shutil
+from snp_classes import *
+from snp_metrics import *
+from parse_SNPs import parse_snps_with_metrics
+from parse_SNPs_test import SnpDirectory_test
+import unittest
+
+####################################################################################
+#
+# Test FileMetrics class
+#
+####################################################################################
+class FileMetrics_test(unittest.TestCase):
+
+    def test_lines(self):
+        metrics = FileMetrics("user1_file1.23andme.txt", "Default", "23andme")
+        metrics.add_lines(10, 4)
+        metrics.add_lines(5, 5)
+        metrics.parse_seconds = 1.5
+        metrics.aggregate_seconds = 1.5
+        values = metrics.to_dict()
+        self.assertEqual((15, 9, 6), (values["lines_read"], values["lines_accepted"], values["lines_rejected"]))
+        self.assertEqual(5.0, values["lines_per_second"])
+        self.assertEqual(sorted(FileMetrics.fields), sorted(values.keys()))
+
+####################################################################################
+#
+# Test RunMetrics class and parse_snps_with_metrics
+#
+####################################################################################
+class RunMetrics_test(SnpDirectory_test):
+
+    def test_parse_snps(self):
+        results_set, metrics = parse_snps_with_metrics(self.params)
+        self.assertEqual(4, len(results_set))
+        self.assertEqual(5, len(metrics))
+        self.assertEqual({"user4_file4_yearofbirth_1956_sex_XY.decodeme.txt": "can't parse the line 'not,a,valid,line,for,decodeme'",
+                          "user6_file6-exome-yearofbirth_unknown_sex_unknown.23andme.txt": bypassed_reason},
+                         metrics.get_skipped())
+        files = dict((file_metrics.filename, file_metrics) for file_metrics in metrics.get_files())
+        file_metrics = files["user1_file1_yearofbirth_unknown_sex_unknown.23andme.txt"]
+        self.assertEqual(("23andme", "text", 4, 3), (file_metrics.file_type, file_metrics.source,
+                                                     file_metrics.lines_read, file_metrics.lines_accepted))
+        self.assertTrue(file_metrics.bytes_read > 0)
+        self.assertTrue(file_metrics.peak_rss > 0)
+        totals = metrics.get_processor_totals()
+        self.assertEqual(1, totals["23andme"]["files"])
+        self.assertTrue(metrics.peak_rss >= file_metrics.peak_rss)
+
+    def test_selections(self):
+        self.params.add_chromosome("2")
+        metrics = parse_snps_with_metrics(self.params)[1]
+        files = dict((file_metrics.filename, file_metrics) for file_metrics in metrics.get_files())
+        file_metrics = files["user1_file1_yearofbirth_unknown_sex_unknown.23andme.txt"]
+        self.assertEqual((4, 1, 3), (file_metrics.lines_read, file_metrics.lines_accepted, file_metrics.get_lines_rejected()))
+
+    def test_plan_applied(self):
+        # Blocks parsed from the text are selected once, as they are parsed, and the time taken counts as filtering
+        self.params.set_rsid("rs3094315")
+        process_chunk = self.params.process_chunk
+        calls = []
+        self.params.process_chunk = lambda snp_chunk: calls.append(len(snp_chunk)) or process_chunk(snp_chunk)
+        metrics = parse_snps_with_metrics(self.params)[1]
+        self.assertEqual([], calls)
+        plan = self.params.get_query_plan()
+        self.assertTrue(plan.select_seconds > 0)
+        self.assertTrue(sum(file_metrics.filter_seconds for file_metrics in metrics.get_files()) >= plan.select_seconds - 1e-9)
+
+    def test_workers(self):
+        self.params.set_workers(2)
+        metrics = parse_snps_with_metrics(self.params)[1]
+        self.assertEqual(5, len(metrics))
+        self.assertEqual(2, len(metrics.get_skipped()))
+
+    def test_write_json(self):
+        metrics = parse_snps_with_metrics(self.params)[1]
+        path = os.path.join(self.dir + "_metrics.json")
+        try:
+            metrics.write_json(path)
+            with open(path) as f:
+                report = json.load(f)
+        finally:
+            os.remove(path)
+        self.assertEqual(5, len(report["files"]))
+        self.assertEqual(set(["23andme", "illumina", "decodeme", "iyg"]), set(report["processors"].keys()))
+        self.assertEqual(metrics.peak_rss, report["peak_rss"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+This module profiles a run of parse_snps when PROFILE in parse_files.txt names a directory.
+
+Each file is parsed under its own cProfile profiler and the results are totaled by file type, so
+the functions that are slow for one format can be seen apart from the rest.  Files parsed in a
+process pool are profiled in the worker and their statistics sent back with the results.  The
+rest of the run, such as selecting the files and merging results, is profiled separately.
+
+The directory gets a profile for each file type ([file type].prof), one for the rest of the run
+(run.prof) and one of everything (all.prof).  Each can be read with "python -m pstats [file]".
+summary.txt lists the time each file type spent in each stage (see snp_metrics) and its hot
+functions: those with the most time spent in the function itself.
+
+Nothing is profiled when PROFILE isn't set, so the only cost is a check for each file.
+"""
+
+import os
+import pstats
+import cProfile
+
+# Number of hot functions listed for each file type in the summary
+hot_function_count = 10
+
+# Run a function under a new profiler.  Returns a tuple of (the function's result, the profile
+# statistics) where the statistics are a dictionary that can be sent between processes.
+def run_profiled(function, *args, **kwargs):
+    profile = cProfile.Profile()
+    result = profile.runcall(function, *args, **kwargs)
+    profile.create_stats()
+    return (result, profile.stats)
+
+# Get a name for a file type that can be used in a file name
+def get_profile_name(file_type):
+    return file_type if file_type != None else "unknown"
+
+####################################################################################
+#
+# Holds the statistics sent back by run_profiled so pstats.Stats can load them
+#
+####################################################################################
+class ProfileStats:
+    # Constructor
+    def __init__(self, stats):
+        self.stats = stats
+
+    # Called by pstats.Stats.  The statistics have already been created.
+    def create_stats(self):
+        pass
+
+####################################################################################
+#
+# Class collecting the profiles of a run by file type
+#
+####################################################################################
+class PipelineProfiler:
+    # Constructor.  The profiles are written to profile_dir.
+    def __init__(self, profile_dir):
+        self.profile_dir = profile_dir
+        self.run_profile = cProfile.Profile()
+        self.running = False
+        self.file_type_stats = {}
+
+    # Convert the contents to a string
+    def __str__(self):
+        return "( PipelineProfiler: " + self.profile_dir + ", " + str(len(self.file_type_stats)) + " file types )"
+
+    # Start profiling the rest of the run
+    def start(self):
+        self.running = True
+        self.run_profile.enable()
+
+    # Stop profiling the rest of the run
+    def stop(self):
+        self.run_profile.disable()
+        self.running = False
+
+    # Call a function that parses a file of a file type, profiling it with the other files of that
+    # type.  Returns the function's result.
+    def profile_call(self, file_type, function, *args, **kwargs):
+        # Only one profiler can be enabled at a time
+        if self.running:
+            self.run_profile.disable()
+        try:
+            result, stats = run_profiled(function, *args, **kwargs)
+        finally:
+            if self.running:
+                self.run_profile.enable()
+        self.add_stats(file_type, stats)
+        return result
+
+    # Add the statistics returned by run_profiled for a file of a file type
+    def add_stats(self, file_type, stats):
+        if file_type in self.file_type_stats:
+            self.file_type_stats[file_type].add(ProfileStats(stats))
+        else:
+            self.file_type_stats[file_type] = pstats.Stats(ProfileStats(stats))
+
+    # Get the statistics for each file type as a dictionary of {file type: pstats.Stats}
+    def get_file_type_stats(self):
+        return self.file_type_stats
+
+    # Get the hot functions in some statistics as a list of (seconds in the function itself,
+    # cumulative seconds, calls, "file:line(function)") tuples, most time first
+    @staticmethod
+    def get_hot_functions(stats, count = hot_function_count):
+        functions = [(tottime, cumtime, calls, "%s:%d(%s)" % (os.path.basename(filename), line, name))
+                     for (filename, line, name), (primitive_calls, calls, tottime, cumtime, callers) in stats.stats.items()]
+        return sorted(functions, reverse=True)[:count]
+
+    # Format the summary of the profiles.  metrics is the RunMetrics of the run.
+    def format_summary(self, metrics):
+        lines = []
+        processor_totals = metrics.get_processor_totals()
+        for file_type, stats in sorted(self.file_type_stats.items()):
+            totals = processor_totals.get(file_type, {})
+            lines.append("%s: %d files, %d lines, %.3f parse, %.3f filter, %.3f aggregate seconds" % (
+                get_profile_name(file_type), totals.get("files", 0), totals.get("lines_read", 0),
+                totals.get("parse_seconds", 0), totals.get("filter_seconds", 0), totals.get("aggregate_seconds", 0)))
+            lines.append("   %10s %10s %10s  %s" % ("own secs", "cum secs", "calls", "function"))
+            for tottime, cumtime, calls, function in PipelineProfiler.get_hot_functions(stats):
+                lines.append("   %10.3f %10.3f %10d  %s" % (tottime, cumtime, calls, function))
+            lines.append("")
+        return "\n".join(lines)
+
+    # Write the profiles and summary to the profile directory.  metrics is the RunMetrics of the
+    # run.  Returns the path of the summary.
+    def write(self, metrics):
+        if not os.path.isdir(self.profile_dir):
+            os.makedirs(self.profile_dir)
+        self.run_profile.create_stats()
+        all_stats = pstats.Stats(ProfileStats(self.run_profile.stats))
+        all_stats.dump_stats(os.path.join(self.profile_dir, "run.prof"))
+        for file_type, stats in self.file_type_stats.items():
+            stats.dump_stats(os.path.join(self.profile_dir, get_profile_name(file_type) + ".prof"))
+            all_stats.add(stats)
+        all_stats.dump_stats(os.path.join(self.profile_dir, "all.prof"))
+        path = os.path.join(self.profile_dir, "summary.txt")
+        with open(path, "w") as f:
+            f.write(self.format_summary(metrics))
+        return path
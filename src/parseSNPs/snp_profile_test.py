@@ -0,0 +1,60 @@
+"""
+This program is designed to test the classes in snp_profile
+"""
+import sys
+import os
+import shutil
+import pstats
+from snp_classes import *
+from snp_profile import *
+from parse_SNPs import parse_snps, parse_snps_with_metrics
+from parse_SNPs_test import SnpDirectory_test
+import unittest
+
+####################################################################################
+#
+# Test PipelineProfiler class and profiled runs of parse_snps
+#
+####################################################################################
+class PipelineProfiler_test(SnpDirectory_test):
+
+    def setUp(self):
+        SnpDirectory_test.setUp(self)
+        # Kept apart from the SNP files so the profiles aren't selected
+        self.profile_dir = self.dir + "_profile"
+
+    def tearDown(self):
+        SnpDirectory_test.tearDown(self)
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+    # Check the profiles written by a run
+    def check_profiles(self):
+        self.assertEqual(sorted(["23andme.prof", "illumina.prof", "decodeme.prof", "iyg.prof", "run.prof", "all.prof", "summary.txt"]),
+                         sorted(os.listdir(self.profile_dir)))
+        with open(os.path.join(self.profile_dir, "summary.txt")) as f:
+            summary = f.read()
+        self.assertTrue("illumina: 2 files" in summary)
+        self.assertTrue("(parse_lines)" in summary)
+        stats = pstats.Stats(os.path.join(self.profile_dir, "23andme.prof"))
+        self.assertTrue(any(name == "parse_file" for filename, line, name in stats.stats.keys()))
+
+    def test_profile(self):
+        expected = self.get_counts(parse_snps(self.params))
+        self.params.set_profile_directory(self.profile_dir)
+        self.assertEqual(expected, self.get_counts(parse_snps(self.params)))
+        self.check_profiles()
+
+    def test_workers(self):
+        self.params.set_profile_directory(self.profile_dir)
+        self.params.set_workers(2)
+        parse_snps(self.params)
+        self.check_profiles()
+
+    def test_get_hot_functions(self):
+        result, stats = run_profiled(sorted, range(1000), reverse=True)
+        self.assertEqual(range(999, -1, -1), result)
+        hot_functions = PipelineProfiler.get_hot_functions(pstats.Stats(ProfileStats(stats)), 1)
+        self.assertEqual(1, len(hot_functions))
+
+if __name__ == '__main__':
+    unittest.main()
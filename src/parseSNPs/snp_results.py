@@ -0,0 +1,419 @@
+"""
+This module holds a compact alternative to ResultsSet for runs over many SNPs.
+
+ArrayResultsSet keeps the genotype counts in one NumPy array with a row for each SNP, a column for
+each file group and a slot for each genotype code seen so far, instead of a Result, Group and
+dictionary per SNP.  SNPs are found through a dictionary of rsids.  Results and groups are returned
+as views on the array, so code written against ResultsSet, Result and Group works with either.
+
+The backend is chosen with the BACKEND keyword in parse_files.txt (see Params.get_results_backend).
+
+ChunkResultsSet keeps the rows added to it instead of counting them.  Process pool workers parse
+into one and send the rows back, which are far smaller to pickle than counts held in Result and
+Group objects, and the parent process counts them in an ArrayResultsSet (see new_file_counts).
+"""
+
+import numpy as np
+from snp_classes import *
+from snp_harmonize import harmonize_counts
+
+# Names of the results backends
+results_backends = ["DICT", "ARRAY"]
+
+# Create an empty results set for the backend named in params
+def new_results_set(params):
+    if params.get_results_backend() == "ARRAY":
+        return ArrayResultsSet()
+    return ResultsSet()
+
+# Get the ArrayResultsSet to count the rows sent back by process pool workers in before they are
+# added to a results set with add_file_counts.  An ArrayResultsSet counts them itself.
+def new_file_counts(results_set):
+    if isinstance(results_set, ArrayResultsSet):
+        return results_set
+    return ArrayResultsSet()
+
+# Add the counts returned by new_file_counts to the results set they were made for
+def add_file_counts(results_set, file_counts):
+    if file_counts is not results_set:
+        file_counts.add_to(results_set)
+
+####################################################################################
+#
+# A container for holding all the results as arrays of counts
+#
+####################################################################################
+class ArrayResultsSet:
+    # Number of SNPs room is made for when the arrays are first allocated
+    initial_capacity = 1024
+
+    # Constructor
+    def __init__(self):
+        self.rsids = []
+        self.chromosome_codes = np.zeros(ArrayResultsSet.initial_capacity, dtype=np.uint8)
+        self.positions = np.zeros(ArrayResultsSet.initial_capacity, dtype=np.int32)
+        self.live = np.zeros(ArrayResultsSet.initial_capacity, dtype=bool)
+        self.counts = np.zeros((ArrayResultsSet.initial_capacity, 0, 0), dtype=np.int32)
+        # {rsid: index} for the first position an rsid is found at, and
+        # {(rsid, chromosome code, position): index} for any others
+        self.index = {}
+        self.alternates = {}
+        self.labels = []
+        self.label_indexes = {}
+        # The genotype code held in each slot, and the slot for each genotype code or -1
+        self.slot_codes = []
+        self.code_slots = np.zeros(code_count, dtype=np.int64) - 1
+
+    # Get the state to pickle, with the names of the codes since they can differ in the process
+    # the results set is unpickled in (see snp_codes.CodeTable)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["code_names"] = get_code_names()
+        return state
+
+    # Restore a pickled results set, translating its codes to the codes of this process
+    def __setstate__(self, state):
+        code_names = state.pop("code_names", None)
+        self.__dict__.update(state)
+        self.chromosome_codes, slot_codes = import_codes(code_names, self.chromosome_codes, np.array(self.slot_codes, dtype=np.int64))
+        self.slot_codes = slot_codes.tolist()
+        self.code_slots = np.zeros(code_count, dtype=np.int64) - 1
+        self.code_slots[self.slot_codes] = np.arange(len(self.slot_codes))
+        # The alternate positions of rsids are keyed by chromosome code
+        self.alternates = dict(((rsid, int(self.chromosome_codes[index]), position), index)
+                               for (rsid, chromosome_code, position), index in self.alternates.items())
+
+    # Get the number of results
+    def __len__(self):
+        return int(np.count_nonzero(self.live))
+
+    # Convert contents to string
+    def __str__(self):
+        results = sorted(self.get_results_iterator(), key=lambda result: result.get_key())
+        return "( Results:" + "".join(str(result) for result in results) + " )\n"
+
+    # print contents
+    def print_contents(self):
+        print "( Results:"
+        for result in self.get_results_iterator():
+            result.print_contents()
+        print ")"
+
+    # Get a result if found or create a result for the rsid, chromosome and position and return it
+    def get_or_create_result(self, rsid, chromosome, position):
+        code = int(encode_chromosomes([chromosome])[0])
+        return ResultView(self, self.get_or_create_index(rsid, code, position))
+
+    # Merge the results from another ArrayResultsSet into this one
+    def merge(self, results_set):
+        rows = np.flatnonzero(results_set.live)
+        indexes = self.get_indexes([results_set.rsids[row] for row in rows],
+                                   results_set.chromosome_codes[rows], results_set.positions[rows])
+        # Add every label and slot first since adding them reallocates the counts
+        label_indexes = [self.get_label_index(label) for label in results_set.labels]
+        slots = self.get_slots(results_set.slot_codes)
+        for label_index, to_label_index in enumerate(label_indexes):
+            for slot, to_slot in enumerate(slots):
+                self.counts[indexes, to_label_index, to_slot] += results_set.counts[rows, label_index, slot]
+
+    # Add the counts in this results set to a ResultsSet, a genotype at a time
+    def add_to(self, results_set):
+        rows = np.flatnonzero(self.live)
+        snps, label_indexes, slots = np.nonzero(self.counts[rows])
+        counts = self.counts[rows[snps], label_indexes, slots].tolist()
+        rsids = [self.rsids[row] for row in rows]
+        chromosomes = decode_chromosomes(self.chromosome_codes[rows]).tolist()
+        positions = self.positions[rows].tolist()
+        genotypes = [genotype_names[code] for code in self.slot_codes]
+        for snp, label_index, slot, count in zip(snps.tolist(), label_indexes.tolist(), slots.tolist(), counts):
+            result = results_set.get_or_create_result(rsids[snp], chromosomes[snp], positions[snp])
+            result.add_count(self.labels[label_index], genotypes[slot], count)
+
+    # Add one genotype for a group label for every row of a SnpChunk, or counts[row] genotypes if
+    # a NumPy array of counts is passed
+    def add_chunk(self, label, snp_chunk, counts = None):
+        if counts is None:
+            counts = np.ones(len(snp_chunk), dtype=np.int32)
+        self.add_rows(label, snp_chunk, counts)
+
+    # Take away one genotype for a group label for every row of a SnpChunk added earlier with
+    # add_chunk.  Results left with nothing counted are removed.
+    def remove_chunk(self, label, snp_chunk):
+        indexes = np.unique(self.add_rows(label, snp_chunk, -np.ones(len(snp_chunk), dtype=np.int32)))
+        for index in indexes[~self.counts[indexes].any(axis=(1, 2))]:
+            self.remove_index(index)
+
+    # return an iterator of the results
+    def get_results_iterator(self):
+        return (ResultView(self, index) for index in np.flatnonzero(self.live))
+
+    # Get the counts for some group labels as arrays (see ResultsSet.get_genotype_counts)
+    def get_genotype_counts(self, labels):
+        rows = np.flatnonzero(self.live)
+        counts = np.zeros((len(rows), len(labels), len(self.slot_codes)), dtype=np.int32)
+        for label_index, label in enumerate(labels):
+            if label in self.label_indexes:
+                counts[:, label_index, :] = self.counts[rows, self.label_indexes[label], :]
+        return ([self.rsids[row] for row in rows], decode_chromosomes(self.chromosome_codes[rows]).tolist(),
+                self.positions[rows].tolist(), list(self.slot_codes), counts)
+
+    # Count genotypes reported in different allele orders or from the opposite strand together
+    # (see snp_harmonize)
+    def harmonize(self):
+        codes, self.counts = harmonize_counts(self.slot_codes, self.counts)[:2]
+        self.slot_codes = codes
+        self.code_slots = np.zeros(code_count, dtype=np.int64) - 1
+        self.code_slots[codes] = np.arange(len(codes))
+
+    # Add counts of the genotypes in the rows of a SnpChunk for a group label.  Returns the index
+    # of the SNP for each row.
+    def add_rows(self, label, snp_chunk, counts):
+        indexes = self.get_indexes(snp_chunk.get_rsids().tolist(), snp_chunk.get_chromosome_codes(), snp_chunk.get_positions())
+        slots = self.get_slots(snp_chunk.get_genotype_codes())
+        label_index = self.get_label_index(label)
+        # Total the counts for each cell first since a cell can be in the chunk more than once
+        cells, inverse = np.unique((indexes * len(self.labels) + label_index) * len(self.slot_codes) + slots, return_inverse=True)
+        self.counts.reshape(-1)[cells] += np.bincount(inverse, weights=counts).astype(np.int32)
+        return indexes
+
+    # Get the SNP index for each of a list of rsids and arrays of chromosome codes and positions,
+    # adding SNPs that haven't been seen
+    def get_indexes(self, rsids, chromosome_codes, positions):
+        get = self.index.get
+        indexes = np.fromiter((get(rsid, -1) for rsid in rsids), dtype=np.int64, count=len(rsids))
+        found = indexes >= 0
+        # An rsid can be found at more than one position.  Those and new SNPs are looked up one at a time.
+        found[found] = (self.chromosome_codes[indexes[found]] == chromosome_codes[found]) & \
+                       (self.positions[indexes[found]] == positions[found])
+        # The first row of each rsid that hasn't been seen is added together with the others
+        first_rows = {}
+        for row in np.flatnonzero(indexes < 0).tolist():
+            first_rows.setdefault(rsids[row], row)
+        if len(first_rows) > 0:
+            new_rows = np.array(sorted(first_rows.values()), dtype=np.int64)
+            indexes[new_rows] = self.add_snps([rsids[row] for row in new_rows], chromosome_codes[new_rows], positions[new_rows])
+            found[new_rows] = True
+        for row in np.flatnonzero(~found):
+            indexes[row] = self.get_or_create_index(rsids[row], int(chromosome_codes[row]), int(positions[row]))
+        return indexes
+
+    # Add SNPs with rsids that haven't been seen and are all different.  Returns their indexes.
+    def add_snps(self, rsids, chromosome_codes, positions):
+        start = len(self.rsids)
+        end = start + len(rsids)
+        if end > len(self.live):
+            self.resize(max(2 * len(self.live), end), len(self.labels), len(self.slot_codes))
+        self.rsids.extend(rsids)
+        self.chromosome_codes[start:end] = chromosome_codes
+        self.positions[start:end] = positions
+        self.live[start:end] = True
+        self.index.update(zip(rsids, range(start, end)))
+        return np.arange(start, end)
+
+    # Get the index of a SNP, adding it if it hasn't been seen
+    def get_or_create_index(self, rsid, chromosome_code, position):
+        index = self.index.get(rsid)
+        if index != None and self.chromosome_codes[index] == chromosome_code and self.positions[index] == position:
+            return index
+        key = (rsid, chromosome_code, position)
+        if key in self.alternates:
+            return self.alternates[key]
+        index = len(self.rsids)
+        if index == len(self.live):
+            self.resize(2 * index, len(self.labels), len(self.slot_codes))
+        self.rsids.append(rsid)
+        self.chromosome_codes[index] = chromosome_code
+        self.positions[index] = position
+        self.live[index] = True
+        if rsid in self.index:
+            self.alternates[key] = index
+        else:
+            self.index[rsid] = index
+        return index
+
+    # Remove a SNP with nothing counted.  Its row stays in the arrays but is no longer found.
+    def remove_index(self, index):
+        rsid = self.rsids[index]
+        if self.index.get(rsid) == index:
+            del self.index[rsid]
+        else:
+            del self.alternates[(rsid, int(self.chromosome_codes[index]), int(self.positions[index]))]
+        self.live[index] = False
+
+    # Get the column for a group label, adding it if it hasn't been seen
+    def get_label_index(self, label):
+        if label not in self.label_indexes:
+            self.label_indexes[label] = len(self.labels)
+            self.labels.append(label)
+            self.resize(len(self.live), len(self.labels), len(self.slot_codes))
+        return self.label_indexes[label]
+
+    # Get the slot for each of an array of genotype codes, adding slots for codes that haven't been seen
+    def get_slots(self, genotype_codes):
+        genotype_codes = np.asarray(genotype_codes, dtype=np.int64)
+        new_codes = [code for code in np.unique(genotype_codes).tolist() if self.code_slots[code] < 0]
+        if len(new_codes) > 0:
+            for code in new_codes:
+                self.code_slots[code] = len(self.slot_codes)
+                self.slot_codes.append(code)
+            self.resize(len(self.live), len(self.labels), len(self.slot_codes))
+        return self.code_slots[genotype_codes]
+
+    # Reallocate the arrays with room for more SNPs, labels or genotype slots
+    def resize(self, capacity, label_count, slot_count):
+        counts = np.zeros((capacity, label_count, slot_count), dtype=np.int32)
+        old_capacity, old_label_count, old_slot_count = self.counts.shape
+        counts[:old_capacity, :old_label_count, :old_slot_count] = self.counts
+        self.counts = counts
+        if capacity > len(self.live):
+            self.chromosome_codes = np.concatenate([self.chromosome_codes, np.zeros(capacity - len(self.live), dtype=np.uint8)])
+            self.positions = np.concatenate([self.positions, np.zeros(capacity - len(self.live), dtype=np.int32)])
+            self.live = np.concatenate([self.live, np.zeros(capacity - len(self.live), dtype=bool)])
+
+####################################################################################
+#
+# A results set that keeps the SnpChunks added to it instead of counting them
+#
+####################################################################################
+class ChunkResultsSet:
+    # Constructor
+    def __init__(self):
+        self.snp_chunks = []
+
+    # Get the number of rows added
+    def __len__(self):
+        return sum(len(snp_chunk) for snp_chunk in self.snp_chunks)
+
+    # Convert contents to string
+    def __str__(self):
+        return "( ChunkResultsSet: " + str(len(self.snp_chunks)) + " chunks, " + str(len(self)) + " rows )"
+
+    # Keep the rows of a SnpChunk.  The group label is passed back with the rows by the caller.
+    def add_chunk(self, label, snp_chunk):
+        self.snp_chunks.append(snp_chunk)
+
+    # Get the rows added as one SnpChunk
+    def get_snp_chunk(self):
+        return SnpChunk.concatenate(self.snp_chunks)
+
+####################################################################################
+#
+# View of the counts for one SNP in an ArrayResultsSet, with the methods of Result
+#
+####################################################################################
+class ResultView:
+    # Constructor
+    def __init__(self, results_set, index):
+        self.results_set = results_set
+        self.index = index
+
+    # Convert the contents to a String
+    def __str__(self):
+        return str(self.to_result())
+
+    # print contents
+    def print_contents(self):
+        self.to_result().print_contents()
+
+    # Copy the counts to a Result
+    def to_result(self):
+        result = Result(self.get_rsid(), self.get_chromosome(), self.get_position())
+        for label, group in self.get_groups().iteritems():
+            for gtype, count in group.get_counts().iteritems():
+                result.add_count(label, gtype, count)
+        return result
+
+    # Get a key that can be used when placing these in a dictionary
+    def get_key(self):
+        return Result.get_key_static(self.get_rsid(), self.get_chromosome(), self.get_position())
+
+    # Get the RSID for these results
+    def get_rsid (self):
+        return self.results_set.rsids[self.index]
+
+    # Get the chromosome number for these results
+    def get_chromosome (self):
+        return chromosome_names[self.results_set.chromosome_codes[self.index]]
+
+    # Get the position for these results
+    def get_position (self):
+        return int(self.results_set.positions[self.index])
+
+    # Add one genotype for a given group label
+    def add_one (self, label, gtype):
+        self.add_count(label, gtype, 1)
+
+    # Add a number of instances of a genotype for a given group label
+    def add_count (self, label, gtype, count):
+        self.get_group(label).add_genotype(gtype, count)
+
+    # Take away a number of instances of a genotype for a given group label
+    def remove_count (self, label, gtype, count):
+        self.get_group(label).remove_genotype(gtype, count)
+        if not self.results_set.counts[self.index].any():
+            self.results_set.remove_index(self.index)
+
+    # Get the results for a group given the label
+    def get_group (self, label):
+        return GroupView(self.results_set, self.index, label)
+
+    # Get all the groups with something counted as a dictionary of {label : group}
+    def get_groups(self):
+        counts = self.results_set.counts[self.index]
+        return dict((label, GroupView(self.results_set, self.index, label))
+                    for label_index, label in enumerate(self.results_set.labels) if counts[label_index].any())
+
+####################################################################################
+#
+# View of the counts for one SNP and file group in an ArrayResultsSet, with the methods of Group
+#
+####################################################################################
+class GroupView:
+    # Constructor
+    def __init__(self, results_set, index, label):
+        self.results_set = results_set
+        self.index = index
+        self.label = label
+
+    # Convert the contents to a string
+    def __str__(self):
+        return str(self.to_group())
+
+    # print contents
+    def print_contents(self):
+        self.to_group().print_contents()
+
+    # Copy the counts to a Group
+    def to_group(self):
+        group = Group(self.label)
+        for gtype, count in self.get_counts().iteritems():
+            group.add_genotype(gtype, count)
+        return group
+
+    # Get the group label
+    def get_label (self):
+        return self.label
+
+    # Add a single genotype instance, or count instances, for the group
+    def add_genotype (self, gtype, count = 1):
+        # Add the label and slot first since adding them reallocates the counts
+        label_index = self.results_set.get_label_index(self.label)
+        slot = self.results_set.get_slots([get_genotype_code(gtype)])[0]
+        self.results_set.counts[self.index, label_index, slot] += count
+
+    # Take away a single genotype instance, or count instances, from the group
+    def remove_genotype (self, gtype, count = 1):
+        self.add_genotype(gtype, -count)
+
+    # Get the count of a single genotype in the group
+    def get_count (self, gtype):
+        return self.get_counts().get(gtype, 0)
+
+    # Get all the genotype counts in the group as a dictionary in the format {genotype : count}
+    def get_counts(self):
+        label_index = self.results_set.label_indexes.get(self.label)
+        if label_index == None:
+            return {}
+        counts = self.results_set.counts[self.index, label_index]
+        return dict((genotype_names[code], int(counts[slot]))
+                    for slot, code in enumerate(self.results_set.slot_codes) if counts[slot] != 0)
@@ -0,0 +1,132 @@
+"""
+This program is designed to test the classes in snp_results
+"""
+import sys
+import cPickle
+import numpy as np
+from snp_classes import *
+from snp_results import *
+from parse_SNPs import parse_snps
+from parse_SNPs_test import SnpDirectory_test
+import unittest
+
+####################################################################################
+#
+# Test ArrayResultsSet class
+#
+####################################################################################
+class ArrayResultsSet_test(unittest.TestCase):
+
+    def setUp(self):
+        self.results_set = ArrayResultsSet()
+        self.snp_chunk = SnpChunk.from_strings(["RS1", "RS1", "RS2", "RS1"], ["1", "1", "X", "2"],
+                                               [10, 10, 20, 30], ["AA", "AG", "CC", "AA"])
+
+    def test_add_chunk(self):
+        self.results_set.add_chunk("Group 1", self.snp_chunk)
+        self.assertEqual(3, len(self.results_set))
+        result = self.results_set.get_or_create_result("RS1", "1", 10)
+        self.assertEqual(("RS1", "1", 10), result.get_key())
+        self.assertEqual({"AA": 1, "AG": 1}, result.get_group("Group 1").get_counts())
+        self.assertEqual(0, result.get_group("Group 2").get_count("AA"))
+        self.assertEqual(["Group 1"], result.get_groups().keys())
+        self.assertEqual(1, self.results_set.get_or_create_result("RS1", "2", 30).get_group("Group 1").get_count("AA"))
+
+    def test_add_count(self):
+        result = self.results_set.get_or_create_result("RS3", "MT", 5)
+        result.add_one("Group 1", "TT")
+        result.add_count("Group 2", "TT", 3)
+        self.assertEqual(3, result.get_group("Group 2").get_count("TT"))
+        self.assertEqual(str(result.to_result()), str(result))
+        self.results_set.add_chunk("Group 1", self.snp_chunk, np.array([2, 0, 1, 1]))
+        self.assertEqual(2, self.results_set.get_or_create_result("RS1", "1", 10).get_group("Group 1").get_count("AA"))
+
+    def test_remove_chunk(self):
+        self.results_set.add_chunk("Group 1", self.snp_chunk)
+        self.results_set.add_chunk("Group 1", self.snp_chunk.select(np.array([0])))
+        self.results_set.remove_chunk("Group 1", self.snp_chunk)
+        self.assertEqual(1, len(self.results_set))
+        self.assertEqual({"AA": 1}, self.results_set.get_or_create_result("RS1", "1", 10).get_group("Group 1").get_counts())
+
+    def test_merge(self):
+        other = ArrayResultsSet()
+        other.add_chunk("Group 2", SnpChunk.from_strings(["RS2", "RS4"], ["X", "3"], [20, 40], ["DI", "CC"]))
+        self.results_set.add_chunk("Group 1", self.snp_chunk)
+        self.results_set.merge(other)
+        self.assertEqual(4, len(self.results_set))
+        result = self.results_set.get_or_create_result("RS2", "X", 20)
+        self.assertEqual({"Group 1": {"CC": 1}, "Group 2": {"DI": 1}},
+                         dict((label, group.get_counts()) for label, group in result.get_groups().items()))
+
+    def test_new_snps(self):
+        # An rsid found twice in the rows of new SNPs, and again at another position
+        self.results_set.add_chunk("Group 1", SnpChunk.from_strings(["RS5", "RS6", "RS5"], ["1", "1", "1"], [5, 6, 5], ["AA", "CC", "AG"]))
+        self.results_set.add_chunk("Group 1", SnpChunk.from_strings(["RS6", "RS5", "RS7"], ["1", "2", "1"], [6, 5, 7], ["CC", "TT", "GG"]))
+        self.assertEqual(4, len(self.results_set))
+        self.assertEqual({"AA": 1, "AG": 1}, self.results_set.get_or_create_result("RS5", "1", 5).get_group("Group 1").get_counts())
+        self.assertEqual({"TT": 1}, self.results_set.get_or_create_result("RS5", "2", 5).get_group("Group 1").get_counts())
+        self.assertEqual({"CC": 2}, self.results_set.get_or_create_result("RS6", "1", 6).get_group("Group 1").get_counts())
+
+    def test_add_to(self):
+        self.results_set.add_chunk("Group 1", self.snp_chunk)
+        self.results_set.add_chunk("Group 2", self.snp_chunk.select(np.array([2])))
+        results_set = ResultsSet()
+        results_set.add_chunk("Group 2", self.snp_chunk.select(np.array([0])))
+        self.results_set.add_to(results_set)
+        expected = ResultsSet()
+        expected.add_chunk("Group 1", self.snp_chunk)
+        expected.add_chunk("Group 2", self.snp_chunk.select(np.array([2, 0])))
+        self.assertEqual(self.get_counts(expected), self.get_counts(results_set))
+
+    # Get the counts in a results set as {key: {label: {genotype: count}}}
+    def get_counts(self, results_set):
+        return dict((result.get_key(), dict((label, group.get_counts()) for label, group in result.get_groups().items()))
+                    for result in results_set.get_results_iterator())
+
+    def test_pickle(self):
+        self.results_set.add_chunk("Group 1", self.snp_chunk)
+        self.assertEqual(str(self.results_set), str(cPickle.loads(cPickle.dumps(self.results_set))))
+        # Codes pickled by a process that gave them other names are translated
+        state = self.results_set.__getstate__()
+        state["code_names"]["chromosome_names"][chromosome_codes["X"]] = "PICKLED X"
+        state["code_names"]["genotype_names"][genotype_codes["CC"]] = "PICKLED CC"
+        restored = ArrayResultsSet()
+        restored.__setstate__(state)
+        self.assertEqual({"PICKLED CC": 1}, restored.get_or_create_result("RS2", "PICKLED X", 20).get_group("Group 1").get_counts())
+        self.assertEqual({"AA": 1}, restored.get_or_create_result("RS1", "2", 30).get_group("Group 1").get_counts())
+        self.assertEqual(3, len(restored))
+
+####################################################################################
+#
+# Test ChunkResultsSet class
+#
+####################################################################################
+class ChunkResultsSet_test(unittest.TestCase):
+
+    def test_add_chunk(self):
+        results_set = ChunkResultsSet()
+        snp_chunk = SnpChunk.from_strings(["RS1", "RS2"], ["1", "X"], [10, 20], ["AA", "CC"], lines_read=3)
+        results_set.add_chunk("Group 1", snp_chunk)
+        results_set.add_chunk("Group 1", snp_chunk.select(np.array([1])))
+        self.assertEqual(3, len(results_set))
+        self.assertEqual(snp_chunk.get_rows() + [("RS2", "X", 20, "CC")], results_set.get_snp_chunk().get_rows())
+        self.assertEqual(6, results_set.get_snp_chunk().get_lines_read())
+
+####################################################################################
+#
+# Test parse_snps with the array backend
+#
+####################################################################################
+class array_backend_test(SnpDirectory_test):
+
+    def test_parse_snps(self):
+        expected = self.get_counts(parse_snps(self.params))
+        self.params.set_results_backend("array")
+        results_set = parse_snps(self.params)
+        self.assertTrue(isinstance(results_set, ArrayResultsSet))
+        self.assertEqual(expected, self.get_counts(results_set))
+        self.params.set_workers(2)
+        self.assertEqual(expected, self.get_counts(parse_snps(self.params)))
+
+if __name__ == '__main__':
+    unittest.main()
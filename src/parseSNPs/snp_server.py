@@ -0,0 +1,220 @@
+"""
+This program keeps the genotype data of the SNP files in memory and answers queries over localhost
+HTTP, so a question is answered without starting Python, listing the directory or parsing the files.
+
+The data is loaded once when the server starts, as selected by a parameter file (see
+parse_files.txt): from the genotype matrix in MATRIXDIR if one has been built from the files as
+they are now, for selections that hold those of the parameter file (see snp_matrix), otherwise by
+parsing the selected files, through the cache in CACHEDIR if it is set, into one SnpChunk for each
+file sorted by chromosome and position.  Selections in that file, such as CHROMOSOMES, limit the
+rows kept in memory.
+
+A query is the text of a parameter file.  RSID, RSIDFILE, CHROMOSOMES, POSSTART, POSEND,
+REGIONFILE, FILES groups, BACKEND, HARMONIZE, FORMAT and SORT are used; the files queried are
+those the server loaded, so DIR and the other keywords are ignored.  The counts are returned as
+parse_files.py would write them in FORMAT.  The answers to the last few distinct queries are
+kept, so a repeated query is answered from memory.
+
+Start the server with:
+    python snp_server.py [parameter file] [port]
+and send it queries with snp_client.py.  The requests are:
+    POST /query    the body is the parameter file text; returns the counts
+    GET /status    returns JSON describing the data loaded and the queries answered
+"""
+
+import sys
+import json
+import time
+import traceback
+import StringIO
+import collections
+import BaseHTTPServer
+import numpy as np
+from snp_classes import *
+from snp_index import find_query_rows, get_region_order
+from snp_matrix import GenotypeMatrix, open_matrix
+from snp_results import new_results_set
+from snp_writers import new_writer
+from parse_SNPs import select_files, iter_file_chunks
+from parse_files import read_params, read_params_lines
+
+# Port the server listens on if none is given.  snp_client uses the same one.
+default_port = 8237
+
+# Number of distinct queries whose answers are kept
+answer_cache_size = 64
+
+####################################################################################
+#
+# Class holding the rows of the selected SNP files in memory
+#
+####################################################################################
+class ResidentFiles:
+    # Constructor.  files is a list of (filename, SnpChunk) tuples with each chunk sorted by
+    # chromosome and position.
+    def __init__(self, files):
+        self.files = files
+
+    # Convert the contents to a string
+    def __str__(self):
+        return "( ResidentFiles: " + str(len(self.files)) + " files, " + str(self.get_row_count()) + " rows )"
+
+    # Parse the files selected by params, keeping the rows that pass its selections
+    @staticmethod
+    def load(params):
+        files = []
+        for filename, label in select_files(params)[0]:
+            # Only SNP files are held, not a matrix or cache directory kept among them
+            if AbstractSNPProcessor.get_processor(filename) == None:
+                continue
+            snp_chunk = SnpChunk.concatenate(list(iter_file_chunks(params, filename)))
+            files.append((filename, snp_chunk.select(get_region_order(snp_chunk.get_chromosome_codes(), snp_chunk.get_positions()))))
+        return ResidentFiles(files)
+
+    # Get the number of rows held
+    def get_row_count(self):
+        return sum(len(snp_chunk) for filename, snp_chunk in self.files)
+
+    # Get a description of the data as a dictionary that can be written as JSON
+    def get_status(self):
+        return {"source": "files", "files": len(self.files), "rows": self.get_row_count()}
+
+    # Get a ResultsSet for the files and rows selected by params, holding the same counts
+    # parse_snps would return for these files
+    def get_results_set(self, params):
+        results_set = new_results_set(params)
+        for filename, snp_chunk in self.files:
+            label = params.get_file_group_label(filename)
+            if label != None:
+                if params.is_region_query():
+                    # Rows are sorted by chromosome and position so a region can be found by bisecting
+                    snp_chunk = snp_chunk.select(find_query_rows(snp_chunk.get_chromosome_codes(), snp_chunk.get_positions(), params))
+                results_set.add_chunk(label, snp_chunk.select(params.process_chunk(snp_chunk)))
+        return results_set
+
+# Load the data queries are answered from, as selected by params: the genotype matrix in its
+# matrix directory if one has been built that covers params (see open_matrix), otherwise ResidentFiles
+def load_data(params):
+    matrix = open_matrix(params)
+    if matrix != None:
+        return matrix
+    return ResidentFiles.load(params)
+
+# Get a description of the data queries are answered from as a dictionary
+def get_data_status(data):
+    if isinstance(data, GenotypeMatrix):
+        return {"source": "matrix", "files": data.get_file_count(), "snps": data.get_snp_count()}
+    return data.get_status()
+
+####################################################################################
+#
+# HTTP server answering queries from data loaded once
+#
+####################################################################################
+class QueryServer(BaseHTTPServer.HTTPServer):
+    # Constructor.  data is a GenotypeMatrix or ResidentFiles.  Listens on localhost only; port 0
+    # picks a free port.
+    def __init__(self, data, port = default_port):
+        BaseHTTPServer.HTTPServer.__init__(self, ("127.0.0.1", port), QueryHandler)
+        self.data = data
+        self.answers = collections.OrderedDict()
+        self.queries_answered = 0
+
+    # Convert the contents to a string
+    def __str__(self):
+        return "( QueryServer: port " + str(self.get_port()) + ", " + str(self.data) + " )"
+
+    # Get the port the server listens on
+    def get_port(self):
+        return self.server_address[1]
+
+    # Answer a query given as the text of a parameter file.  Returns a tuple of (answer, True if it
+    # was kept from an earlier query).  Raises ValueError if the query can't be read.
+    def answer(self, text):
+        try:
+            params = read_params_lines(text.splitlines(True))
+        except SystemExit as error:
+            # read_params_lines exits with a message when a keyword has a bad value
+            raise ValueError(str(error))
+        # RSIDFILE and REGIONFILE are named by their contents since the files can change
+        key = json.dumps([text] + [selection_list.get_digest() for selection_list in [params.get_rsid_list(), params.get_region_list()]
+                                   if selection_list != None])
+        self.queries_answered += 1
+        if key in self.answers:
+            answer = self.answers.pop(key)
+            self.answers[key] = answer
+            return (answer, True)
+        results_set = self.data.get_results_set(params)
+        if params.get_harmonize():
+            results_set.harmonize()
+        stream = StringIO.StringIO()
+        new_writer(params).write(stream, results_set, params.get_file_group_labels(), params.get_sort_output())
+        answer = stream.getvalue()
+        self.answers[key] = answer
+        if len(self.answers) > answer_cache_size:
+            self.answers.popitem(last=False)
+        return (answer, False)
+
+    # Get a description of the server as a dictionary that can be written as JSON
+    def get_status(self):
+        status = get_data_status(self.data)
+        status.update({"queries_answered": self.queries_answered, "answers_kept": len(self.answers)})
+        return status
+
+####################################################################################
+#
+# Handler for the requests to a QueryServer
+#
+####################################################################################
+class QueryHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    # Answer POST /query
+    def do_POST(self):
+        if self.path != "/query":
+            self.send_text(404, "Unknown request " + self.path + "\n")
+            return
+        started = time.time()
+        text = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            answer, kept = self.server.answer(text)
+        except ValueError as error:
+            self.send_text(400, str(error) + "\n")
+            return
+        except Exception as error:
+            # Answer with the error rather than dropping the connection, and log it here
+            traceback.print_exc()
+            self.send_text(500, type(error).__name__ + ": " + str(error) + "\n")
+            return
+        self.send_text(200, answer, {"X-Answer-Kept": str(kept), "X-Query-Seconds": "%.6f" % (time.time() - started)})
+
+    # Answer GET /status
+    def do_GET(self):
+        if self.path != "/status":
+            self.send_text(404, "Unknown request " + self.path + "\n")
+            return
+        self.send_text(200, json.dumps(self.server.get_status(), sort_keys=True) + "\n", {"Content-Type": "application/json"})
+
+    # Send a response with a body and any extra headers
+    def send_text(self, code, body, headers = {}):
+        self.send_response(code)
+        self.send_header("Content-Type", headers.get("Content-Type", "text/plain"))
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            if name != "Content-Type":
+                self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Log requests to the console without the client address, which is always this machine
+    def log_message(self, format, *args):
+        sys.stderr.write("%s %s\n" % (self.log_date_time_string(), format % args))
+
+if __name__ == "__main__":
+    params = read_params(sys.argv[1])
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else default_port
+    print "Loading data"
+    server = QueryServer(load_data(params), port)
+    print "Serving " + str(server.data) + " on http://127.0.0.1:" + str(server.get_port())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,137 @@
+"""
+This program is designed to test the classes in snp_server and the functions in snp_client
+"""
+import sys
+import os
+import urllib2
+import threading
+import StringIO
+from snp_classes import *
+from snp_server import *
+from snp_client import send_query, get_status
+from snp_writers import new_writer
+from snp_matrix import GenotypeMatrix
+from parse_SNPs import parse_snps
+from parse_SNPs_test import SnpDirectory_test
+import unittest
+
+# Queries sent in the tests, as parameter file text
+queries = ["RSID\trs3094315\n",
+           "CHROMOSOMES\t1\nPOSSTART\t700000\nFORMAT\tTSV\n",
+           "FILES:Group 1:1\tuser1_*.txt\nFILES:Group 2:2\t*illumina.txt\nBACKEND\tARRAY\nSORT\tY\n"]
+
+####################################################################################
+#
+# Test ResidentFiles class
+#
+####################################################################################
+class ResidentFiles_test(SnpDirectory_test):
+
+    def test_get_results_set(self):
+        data = ResidentFiles.load(self.params)
+        self.assertEqual(5, get_data_status(data)["files"])
+        for text in queries:
+            params = read_params_lines(text.splitlines(True))
+            params.set_directory_location(self.dir)
+            self.assertEqual(self.get_counts(parse_snps(params)), self.get_counts(data.get_results_set(params)))
+
+    def test_load_matrix(self):
+        self.params.set_matrix_directory(os.path.join(self.dir, "matrix"))
+        GenotypeMatrix.build(self.params, self.params.get_matrix_directory())
+        data = load_data(self.params)
+        self.assertEqual({"source": "matrix", "files": 5, "snps": 4}, get_data_status(data))
+        for text in queries:
+            params = read_params_lines(text.splitlines(True))
+            params.set_directory_location(self.dir)
+            self.assertEqual(self.get_counts(parse_snps(params)), self.get_counts(data.get_results_set(params)))
+
+    def test_load_stale_matrix(self):
+        build_params = Params()
+        build_params.set_directory_location(self.dir)
+        build_params.set_matrix_directory(os.path.join(self.dir, "matrix"))
+        build_params.add_chromosome("2")
+        GenotypeMatrix.build(build_params, build_params.get_matrix_directory())
+        self.assertEqual("matrix", get_data_status(load_data(build_params))["source"])
+        # A matrix of chromosome 2 doesn't cover every chromosome, so the files are loaded instead
+        self.params.set_matrix_directory(build_params.get_matrix_directory())
+        data = load_data(self.params)
+        self.assertEqual({"source": "files", "files": 5, "rows": 9}, get_data_status(data))
+        self.assertEqual(self.get_counts(parse_snps(self.params)), self.get_counts(data.get_results_set(self.params)))
+        # Neither does a matrix built before a file changed
+        with open(os.path.join(self.dir, "user3_file3_yearofbirth_1966_sex_unknown.illumina.txt"), "a") as f:
+            f.write('"rs3094315","2","742429","AG"\n')
+        self.assertEqual("files", get_data_status(load_data(build_params))["source"])
+
+    def test_load_selections(self):
+        self.params.add_chromosome("2")
+        self.assertEqual(2, ResidentFiles.load(self.params).get_row_count())
+
+####################################################################################
+#
+# Test QueryServer class through snp_client
+#
+####################################################################################
+class QueryServer_test(SnpDirectory_test):
+
+    def setUp(self):
+        SnpDirectory_test.setUp(self)
+        self.server = QueryServer(load_data(self.params), 0)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.stderr = sys.stderr
+        sys.stderr = StringIO.StringIO()  # Requests are logged to the console
+
+    def tearDown(self):
+        sys.stderr = self.stderr
+        self.server.shutdown()
+        self.server.server_close()
+        SnpDirectory_test.tearDown(self)
+
+    # Get the counts parse_files.py would write for a query
+    def get_expected(self, text):
+        params = read_params_lines(text.splitlines(True))
+        params.set_directory_location(self.dir)
+        stream = StringIO.StringIO()
+        new_writer(params).write(stream, parse_snps(params), params.get_file_group_labels(), params.get_sort_output())
+        return stream.getvalue()
+
+    def test_query(self):
+        port = self.server.get_port()
+        for text in queries:
+            self.assertEqual(self.get_expected(text), send_query(text, port))
+        # Repeated queries are answered from the kept answers
+        self.assertEqual(self.get_expected(queries[0]), send_query(queries[0], port))
+        self.assertEqual(self.server.answer(queries[0])[1], True)
+        status = get_status(port)
+        self.assertEqual(("files", 5, 5), (status["source"], status["files"], status["queries_answered"]))
+
+    def test_bad_query(self):
+        try:
+            send_query("FORMAT\tXML\n", self.server.get_port())
+            self.fail("No error for a bad query")
+        except urllib2.HTTPError as error:
+            self.assertEqual(400, error.code)
+            self.assertTrue("FORMAT must be one of" in error.read())
+
+    def test_server_error(self):
+        def fail(params):
+            raise IOError("disk full")
+        self.server.data.get_results_set = fail
+        try:
+            send_query(queries[0], self.server.get_port())
+            self.fail("No error for a failed query")
+        except urllib2.HTTPError as error:
+            self.assertEqual(500, error.code)
+            self.assertEqual("IOError: disk full\n", error.read())
+        # The server keeps answering
+        self.assertEqual(0, get_status(self.server.get_port())["answers_kept"])
+
+    def test_answer_cache_size(self):
+        for position in range(answer_cache_size + 1):
+            self.server.answer("POSSTART\t" + str(position) + "\n")
+        self.assertEqual(answer_cache_size, len(self.server.answers))
+        self.assertFalse(self.server.answer("POSSTART\t0\n")[1])
+
+if __name__ == '__main__':
+    unittest.main()
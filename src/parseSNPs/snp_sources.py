@@ -0,0 +1,159 @@
+"""
+This module lists and opens SNP files that may be compressed or held in a zip archive.
+
+The directory location (DIR in parse_files.txt) can be a directory or a zip archive such as an
+OpenSNP data dump.  Files in a directory can be plain text, gzipped (name.gz) or zipped one file
+to an archive (name.zip).  Members of a zip archive can be plain text or gzipped.  Each file is
+known by its name without the .gz or .zip ending and without any directory within the archive, so
+processors and file groups match the names they would for the extracted files.  The path of a file
+is its name joined to the directory location, as for a directory of plain files.
+
+Compressed files are decompressed as they are read so nothing is extracted to disk.
+"""
+
+import os
+import io
+import zlib
+import time
+import zipfile
+
+# Endings removed from the names of compressed files
+compressed_endings = [".gz", ".zip"]
+
+# Number of compressed bytes decompressed at a time
+block_size = 1048576
+
+# Open zip archives by path.  Each member opened gets its own file handle, so they can be shared.
+archives = {}
+
+# Get the name a file is known by from its name in a directory or archive
+def get_file_name(name):
+    name = os.path.basename(name)
+    for ending in compressed_endings:
+        if name.endswith(ending):
+            return name[:-len(ending)]
+    return name
+
+# Get an open ZipFile for an archive path, reusing it while the archive is unchanged
+def get_archive(archive_path):
+    stat = os.stat(archive_path)
+    key = (os.path.abspath(archive_path), stat.st_size, stat.st_mtime)
+    if key not in archives:
+        archives[key] = zipfile.ZipFile(archive_path)
+    return archives[key]
+
+# Get the members of a zip archive that hold files, as a dictionary of {name: ZipInfo}
+def get_archive_members(archive_path):
+    members = {}
+    for info in get_archive(archive_path).infolist():
+        if not info.filename.endswith("/"):
+            members.setdefault(get_file_name(info.filename), info)
+    return members
+
+# List the names of the files in a directory location, which can be a directory or zip archive
+def list_files(location):
+    if os.path.isfile(location) and zipfile.is_zipfile(location):
+        return sorted(get_archive_members(location).keys())
+    names = []
+    found = set()
+    for entry in os.listdir(location):
+        name = get_file_name(entry)
+        if name not in found:
+            found.add(name)
+            names.append(name)
+    return names
+
+# Find where a file path is stored.  Returns a tuple of (real path, archive member, gzipped)
+# where archive member is a ZipInfo or None.  Returns None if there is no such file.
+def find_file(path):
+    if os.path.exists(path):
+        return (path, None, False)
+    if os.path.isfile(path + ".gz"):
+        return (path + ".gz", None, True)
+    if os.path.isfile(path + ".zip") and zipfile.is_zipfile(path + ".zip"):
+        for info in get_archive(path + ".zip").infolist():
+            if not info.filename.endswith("/"):
+                return (path + ".zip", info, info.filename.endswith(".gz"))
+    archive_path = os.path.dirname(path)
+    if os.path.isfile(archive_path) and zipfile.is_zipfile(archive_path):
+        info = get_archive_members(archive_path).get(os.path.basename(path))
+        if info != None:
+            return (archive_path, info, info.filename.endswith(".gz"))
+    return None
+
+# Return True if a path is a file that can be read with open_file
+def is_file(path):
+    found = find_file(path)
+    return found != None and (found[1] != None or os.path.isfile(found[0]))
+
+# Open a file path for reading, decompressing it if needed.  Raises IOError if there is no such file.
+def open_file(path):
+    found = find_file(path)
+    if found == None:
+        raise IOError("No such SNP file: " + path)
+    real_path, info, gzipped = found
+    if info == None:
+        f = open(real_path, "rb" if gzipped else "r")
+    else:
+        f = get_archive(real_path).open(info)
+    if gzipped:
+        f = io.BufferedReader(GzipStream(f), block_size)
+    return f
+
+# Get the details of a file path that show whether it has changed: a dictionary of the path it is
+# stored at, its size and its modification time.  Members of an archive are given their own path
+# within the archive, their uncompressed size and the time recorded for them in the archive.
+def get_file_info(path):
+    found = find_file(path)
+    if found == None:
+        raise IOError("No such SNP file: " + path)
+    real_path, info, gzipped = found
+    if info == None:
+        stat = os.stat(real_path)
+        return {"path": os.path.abspath(real_path), "size": stat.st_size, "mtime": stat.st_mtime}
+    return {"path": os.path.join(os.path.abspath(real_path), info.filename), "size": info.file_size,
+            "mtime": time.mktime(info.date_time + (0, 0, -1)), "crc": info.CRC}
+
+####################################################################################
+#
+# Raw stream that decompresses a gzip stream as it is read.  Unlike gzip.GzipFile it
+# doesn't need to seek, so it can read members of a zip archive.
+#
+####################################################################################
+class GzipStream(io.RawIOBase):
+    # Constructor.  f is the compressed stream.
+    def __init__(self, f):
+        self.f = f
+        self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.buffer = ""
+        self.offset = 0
+
+    # Return True since the stream can be read
+    def readable(self):
+        return True
+
+    # Read decompressed bytes into b.  Returns the number of bytes read, or 0 at the end.
+    def readinto(self, b):
+        while self.offset == len(self.buffer):
+            data = self.decompressor.unused_data
+            if len(data) > 0:
+                # A gzip stream can hold more than one member
+                self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                data = self.f.read(block_size)
+                if len(data) == 0:
+                    self.buffer = self.decompressor.flush()
+                    self.offset = 0
+                    break
+            self.buffer = self.decompressor.decompress(data)
+            self.offset = 0
+        count = min(len(b), len(self.buffer) - self.offset)
+        b[:count] = self.buffer[self.offset:self.offset + count]
+        self.offset += count
+        return count
+
+    # Close the compressed stream
+    def close(self):
+        if not self.closed:
+            self.f.close()
+        io.RawIOBase.close(self)
@@ -0,0 +1,86 @@
+"""
+This program is designed to test the functions in snp_sources
+"""
+import sys
+import os
+import gzip
+import shutil
+import zipfile
+import StringIO
+from snp_classes import *
+from snp_sources import *
+from parse_SNPs import parse_snps
+from parse_SNPs_test import SnpDirectory_test, sample_files
+import unittest
+
+# Gzip a string
+def gzip_string(contents):
+    buffer = StringIO.StringIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb") as f:
+        f.write(contents)
+    return buffer.getvalue()
+
+####################################################################################
+#
+# Test reading compressed files and archives
+#
+####################################################################################
+class snp_sources_test(SnpDirectory_test):
+
+    def setUp(self):
+        SnpDirectory_test.setUp(self)
+        self.expected = self.get_counts(parse_snps(self.params))
+        self.archive_dir = self.dir + "_archives"
+        os.makedirs(self.archive_dir)
+
+    def tearDown(self):
+        SnpDirectory_test.tearDown(self)
+        shutil.rmtree(self.archive_dir)
+
+    # Get the counts from parse_snps for files in a directory location
+    def get_location_counts(self, location):
+        self.params.set_directory_location(location)
+        return self.get_counts(parse_snps(self.params))
+
+    def test_get_file_name(self):
+        self.assertEqual("user1_file1.23andme.txt", get_file_name("dump/user1_file1.23andme.txt.gz"))
+        self.assertEqual("user1_file1.23andme.txt", get_file_name("user1_file1.23andme.txt.zip"))
+        self.assertEqual("user1_file1.23andme.txt", get_file_name("user1_file1.23andme.txt"))
+
+    def test_gzip_directory(self):
+        gzip_dir = os.path.join(self.archive_dir, "gzip")
+        os.makedirs(gzip_dir)
+        for filename, contents in sample_files.iteritems():
+            with open(os.path.join(gzip_dir, filename + ".gz"), "wb") as f:
+                f.write(gzip_string(contents) + gzip_string(""))
+        self.assertEqual(sorted(sample_files.keys()), sorted(list_files(gzip_dir)))
+        self.assertEqual(self.expected, self.get_location_counts(gzip_dir))
+
+    def test_zip_archive(self):
+        archive_path = os.path.join(self.archive_dir, "dump.zip")
+        with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for filename, contents in sample_files.iteritems():
+                if filename.startswith("user1_"):
+                    archive.writestr("dump/" + filename + ".gz", gzip_string(contents))
+                else:
+                    archive.writestr("dump/" + filename, contents)
+        self.assertEqual(sorted(sample_files.keys()), list_files(archive_path))
+        self.assertEqual(self.expected, self.get_location_counts(archive_path))
+        path = os.path.join(archive_path, "user5_file5_yearofbirth_unknown_sex_unknown.IYG.txt")
+        self.assertTrue(is_file(path))
+        self.assertEqual(len(sample_files["user5_file5_yearofbirth_unknown_sex_unknown.IYG.txt"]), get_file_info(path)["size"])
+
+    def test_zip_directory(self):
+        zip_dir = os.path.join(self.archive_dir, "zip")
+        os.makedirs(zip_dir)
+        for filename, contents in sample_files.iteritems():
+            with zipfile.ZipFile(os.path.join(zip_dir, filename + ".zip"), "w") as archive:
+                archive.writestr(filename, contents)
+        self.assertEqual(self.expected, self.get_location_counts(zip_dir))
+
+    def test_missing_file(self):
+        self.assertFalse(is_file(os.path.join(self.dir, "user9_file9.23andme.txt")))
+        self.assertRaises(IOError, open_file, os.path.join(self.dir, "user9_file9.23andme.txt"))
+
+if __name__ == '__main__':
+    unittest.main()
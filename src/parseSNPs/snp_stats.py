@@ -0,0 +1,166 @@
+"""
+This module contains vectorized statistical functions for NumPy arrays of SNPs.
+
+Each function takes arrays with a value or table for each SNP and returns an array of results,
+so a whole genome is tested with a few array operations instead of a loop per SNP.
+"""
+
+import numpy as np
+
+# Number of SNPs tested at a time by fisher_exact.  Limits the memory used for the tables
+# enumerated for each SNP.
+fisher_block_size = 4096
+
+# Number of standard deviations beyond the table observed that fisher_exact sums tables for
+fisher_window = 10
+
+# Get the complementary error function of an array.  Uses the Chebyshev fit from Numerical
+# Recipes, which has a fractional error below 1.2e-7 everywhere, so small p-values keep their
+# precision.
+def erfc(x):
+    x = np.asarray(x, dtype=np.float64)
+    z = np.abs(x)
+    t = 1.0 / (1.0 + 0.5 * z)
+    polynomial = -z * z - 1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 +
+                 t * (-0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587 +
+                 t * (-0.82215223 + t * 0.17087277))))))))
+    result = t * np.exp(polynomial)
+    return np.where(x >= 0, result, 2.0 - result)
+
+# Get the chi-square survival function (the p-value) for arrays of statistics and whole numbers
+# of degrees of freedom.  Uses the closed forms for even and odd degrees of freedom.  Returns
+# NaN where there are no degrees of freedom.
+def chi2_sf(x, df):
+    x = np.maximum(np.asarray(x, dtype=np.float64), 0)
+    df = np.broadcast_to(np.asarray(df, dtype=np.int64), x.shape)
+    p = np.full(x.shape, np.nan)
+    half = x / 2
+    with np.errstate(under="ignore"):
+        exp_half = np.exp(-half)
+        for k in np.unique(df[df > 0]):
+            rows = df == k
+            if k % 2 == 0:
+                # exp(-x/2) * sum of (x/2)^i / i! for i < k/2
+                term = np.ones(np.count_nonzero(rows))
+                total = term.copy()
+                for i in range(1, k // 2):
+                    term = term * half[rows] / i
+                    total += term
+                p[rows] = exp_half[rows] * total
+            else:
+                # erfc(sqrt(x/2)) + sqrt(2/pi) exp(-x/2) * sum of x^(i-1/2) / (2i-1)!! for i <= (k-1)/2
+                root = np.sqrt(x[rows])
+                term = root.copy()
+                total = np.zeros(np.count_nonzero(rows))
+                for i in range(1, (k - 1) // 2 + 1):
+                    if i > 1:
+                        term = term * x[rows] / (2 * i - 1)
+                    total += term
+                p[rows] = erfc(root / np.sqrt(2)) + np.sqrt(2 / np.pi) * exp_half[rows] * total
+    return np.minimum(p, 1.0)
+
+# Get the Pearson chi-square test of independence for an array of contingency tables with shape
+# (SNPs, rows, columns).  Rows and columns with nothing counted are left out of the degrees of
+# freedom.  Returns a tuple of (statistic, degrees of freedom, p-value) arrays.
+def chi_square(tables):
+    tables = np.asarray(tables, dtype=np.float64)
+    row_totals = tables.sum(axis=2)
+    column_totals = tables.sum(axis=1)
+    totals = row_totals.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = row_totals[:, :, np.newaxis] * column_totals[:, np.newaxis, :] / totals[:, np.newaxis, np.newaxis]
+        cells = np.where(expected > 0, (tables - expected) ** 2 / expected, 0)
+    statistic = cells.sum(axis=(1, 2))
+    df = (np.count_nonzero(row_totals, axis=1) - 1) * (np.count_nonzero(column_totals, axis=1) - 1)
+    df = np.maximum(df, 0)
+    return (statistic, df, chi2_sf(statistic, df))
+
+# Get the log of the factorials of 0 to n
+def log_factorials(n):
+    return np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, n + 1)))])
+
+# Get the two-sided Fisher exact test p-values for arrays of 2x2 tables [[a, b], [c, d]].  The
+# p-value sums the probabilities of every table with the same margins that is no more likely
+# than the table observed.  Tables more than fisher_window standard deviations further from the
+# mean than the table observed are left out since they add less than 1e-20 of the p-value.
+def fisher_exact(a, b, c, d):
+    a, b, c, d = [np.asarray(value, dtype=np.int64) for value in (a, b, c, d)]
+    row1 = a + b
+    row2 = c + d
+    column1 = a + c
+    n = row1 + row2
+    log_fact = log_factorials(int(n.max()) if len(n) > 0 else 0)
+    low = np.maximum(0, column1 - row2)
+    high = np.minimum(row1, column1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = row1 * column1 / n.astype(np.float64)
+        sd = np.sqrt(row1 * row2 * column1 * (n - column1) / (n * n * (n - 1.0)))
+    width = np.nan_to_num(np.abs(a - mean) + fisher_window * sd) + 2
+    low = np.maximum(low, np.floor(np.nan_to_num(mean) - width).astype(np.int64))
+    high = np.minimum(high, np.ceil(np.nan_to_num(mean) + width).astype(np.int64))
+    p = np.ones(len(a))
+    # Test SNPs with a similar number of possible tables together so little of each block is padding
+    order = np.argsort(high - low, kind="mergesort")
+    for start in range(0, len(order), fisher_block_size):
+        rows = order[start:start + fisher_block_size]
+        x = low[rows, np.newaxis] + np.arange(int((high[rows] - low[rows]).max()) + 1)
+        possible = x <= high[rows, np.newaxis]
+        x = np.minimum(x, high[rows, np.newaxis])
+        margins = log_fact[row1[rows]] + log_fact[row2[rows]] + log_fact[column1[rows]] + \
+                  log_fact[n[rows] - column1[rows]] - log_fact[n[rows]]
+        log_p = margins[:, np.newaxis] - log_fact[x] - log_fact[row1[rows, np.newaxis] - x] - \
+                log_fact[column1[rows, np.newaxis] - x] - log_fact[row2[rows, np.newaxis] - column1[rows, np.newaxis] + x]
+        observed = margins - log_fact[a[rows]] - log_fact[b[rows]] - log_fact[c[rows]] - log_fact[d[rows]]
+        # Allow for rounding so tables as likely as the one observed are counted
+        as_extreme = possible & (log_p <= observed[:, np.newaxis] + 1e-7)
+        with np.errstate(under="ignore"):
+            p[rows] = np.where(as_extreme, np.exp(log_p), 0).sum(axis=1)
+    return np.minimum(p, 1.0)
+
+# Get the exact Hardy-Weinberg equilibrium p-values for arrays of genotype counts of the two
+# alleles of each SNP (Wigginton, Cutler and Abecasis 2005).  The p-value sums the probabilities of
+# every heterozygote count with the same allele counts that is no more likely than the count
+# observed.  As in fisher_exact, counts far beyond the one observed are left out.  The heterozygote
+# count varies less than a binomial count of the genotypes with the same mean, so that count's
+# standard deviation is used.  SNPs with no genotypes have a p-value of 1.
+def hwe_exact(homozygotes1, heterozygotes, homozygotes2):
+    homozygotes1, heterozygotes, homozygotes2 = [np.asarray(value, dtype=np.int64)
+                                                 for value in (homozygotes1, heterozygotes, homozygotes2)]
+    n = homozygotes1 + heterozygotes + homozygotes2
+    rare = np.minimum(2 * homozygotes1, 2 * homozygotes2) + heterozygotes
+    common = 2 * n - rare
+    log_fact = log_factorials(2 * int(n.max()) if len(n) > 0 else 0)
+    margins = log_fact[n] + log_fact[rare] + log_fact[common] - log_fact[2 * n]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.nan_to_num(rare * common / (2 * n - 1.0))
+        sd = np.nan_to_num(np.sqrt(mean * (1 - mean / n)))
+    width = np.abs(heterozygotes - mean) + fisher_window * sd + 2
+    # The heterozygote count has the same parity as the rare allele count
+    parity = rare % 2
+    low = np.maximum(0, np.floor((mean - width - parity) / 2).astype(np.int64))
+    high = np.minimum(rare // 2, np.ceil((mean + width - parity) / 2).astype(np.int64))
+    p = np.ones(len(n))
+    order = np.argsort(high - low, kind="mergesort")
+    for start in range(0, len(order), fisher_block_size):
+        rows = order[start:start + fisher_block_size]
+        steps = low[rows, np.newaxis] + np.arange(int((high[rows] - low[rows]).max()) + 1)
+        possible = steps <= high[rows, np.newaxis]
+        h = parity[rows, np.newaxis] + 2 * np.minimum(steps, high[rows, np.newaxis])
+        rare_homozygotes = (rare[rows, np.newaxis] - h) // 2
+        log_p = margins[rows, np.newaxis] + h * np.log(2) - log_fact[h] - log_fact[rare_homozygotes] - \
+                log_fact[n[rows, np.newaxis] - h - rare_homozygotes]
+        observed_h = heterozygotes[rows]
+        observed = margins[rows] + observed_h * np.log(2) - log_fact[observed_h] - \
+                   log_fact[(rare[rows] - observed_h) // 2] - log_fact[n[rows] - observed_h - (rare[rows] - observed_h) // 2]
+        # Allow for rounding so counts as likely as the one observed are counted
+        as_extreme = possible & (log_p <= observed[:, np.newaxis] + 1e-7)
+        with np.errstate(under="ignore"):
+            p[rows] = np.where(as_extreme, np.exp(log_p), 0).sum(axis=1)
+    return np.minimum(p, 1.0)
+
+# Get the odds ratios for arrays of 2x2 tables [[a, b], [c, d]].  Tables with a zero cell have
+# 0.5 added to every cell (the Haldane-Anscombe correction).
+def odds_ratio(a, b, c, d):
+    a, b, c, d = [np.asarray(value, dtype=np.float64) for value in (a, b, c, d)]
+    correction = np.where((a == 0) | (b == 0) | (c == 0) | (d == 0), 0.5, 0.0)
+    return ((a + correction) * (d + correction)) / ((b + correction) * (c + correction))
@@ -0,0 +1,58 @@
+"""
+This program is designed to test the functions in snp_stats
+"""
+import sys
+import math
+import numpy as np
+from snp_stats import *
+import unittest
+
+####################################################################################
+#
+# Test the statistical functions
+#
+####################################################################################
+class snp_stats_test(unittest.TestCase):
+
+    def test_erfc(self):
+        values = [-1.0, 0.0, 0.5, 2.0, 5.0]
+        expected = [math.erfc(value) for value in values]
+        for actual, value in zip(erfc(values), expected):
+            self.assertAlmostEqual(1.0, actual / value, places=6)
+
+    def test_chi2_sf(self):
+        # Critical values for p = 0.05 with 1 to 5 degrees of freedom
+        p = chi2_sf([3.841459, 5.991465, 7.814728, 9.487729, 11.070498], [1, 2, 3, 4, 5])
+        for value in p:
+            self.assertAlmostEqual(0.05, value, places=6)
+        self.assertAlmostEqual(1.0, chi2_sf([0.0], [1])[0])
+        self.assertAlmostEqual(1.0, chi2_sf([100.0], [1])[0] / 1.5239706e-23, places=5)
+        self.assertTrue(np.isnan(chi2_sf([1.0], [0])[0]))
+
+    def test_chi_square(self):
+        statistic, df, p = chi_square([[[10, 20], [30, 40]], [[5, 0], [5, 0]]])
+        self.assertAlmostEqual(0.7936508, statistic[0], places=6)
+        self.assertEqual([1, 0], df.tolist())
+        self.assertAlmostEqual(0.3729985, p[0], places=6)
+        self.assertTrue(np.isnan(p[1]))
+
+    def test_fisher_exact(self):
+        p = fisher_exact([3, 1, 8, 0], [1, 9, 2, 0], [1, 11, 1, 0], [3, 3, 5, 0])
+        self.assertAlmostEqual(0.4857143, p[0], places=6)
+        self.assertAlmostEqual(0.0027595, p[1], places=6)
+        self.assertAlmostEqual(0.0349650, p[2], places=6)
+        self.assertEqual(1.0, p[3])
+
+    def test_hwe_exact(self):
+        # 3 people: AA, AB, BB.  One heterozygote has probability 0.6 and three have 0.4.
+        p = hwe_exact([1, 0, 5, 0], [1, 3, 0, 0], [1, 0, 5, 0])
+        self.assertAlmostEqual(1.0, p[0])
+        self.assertAlmostEqual(0.4, p[1])
+        self.assertAlmostEqual(0.0013640, p[2], places=6)
+        self.assertEqual(1.0, p[3])
+
+    def test_odds_ratio(self):
+        self.assertEqual([9.0, (0.5 * 4.5) / (5.5 * 2.5)], odds_ratio([3, 0], [1, 5], [1, 2], [3, 4]).tolist())
+
+if __name__ == '__main__':
+    unittest.main()
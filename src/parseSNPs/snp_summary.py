@@ -0,0 +1,160 @@
+"""
+This module summarizes the genotypes counted for each SNP in each file group for quality control.
+
+For each SNP the two most common called alleles across the groups summarized are taken as the
+major and minor alleles.  For each group the summary has:
+    allele frequencies      of each called allele among the called alleles
+    minor allele frequency  of the minor allele among the major and minor alleles
+    call rate               of the genotypes counted that aren't no-calls such as "--"
+    HWE p                   exact Hardy-Weinberg equilibrium test of the major and minor genotypes
+Files that don't list a SNP aren't counted, so the call rate only reflects the no-calls in the
+files that do.  Every SNP is summarized at once with NumPy array operations (see snp_stats).
+"""
+
+import numpy as np
+from snp_codes import *
+from snp_stats import hwe_exact
+
+# Get the number of each called allele from genotype counts, given in the form returned by
+# ResultsSet.get_genotype_counts.  Returns an array with a row for each SNP, a column for each
+# label and a count for each allele in called_alleles.
+def get_allele_counts(codes, counts):
+    return np.dot(counts, genotype_allele_counts[codes])
+
+# Get the major and minor alleles from allele counts (see get_allele_counts) as a tuple of arrays
+# of positions in called_alleles.  The counts of every label are added together.
+def get_major_minor(allele_counts):
+    allele_totals = allele_counts.sum(axis=1)
+    major = np.argmax(allele_totals, axis=1)
+    allele_totals[np.arange(len(major)), major] = -1
+    return (major, np.argmax(allele_totals, axis=1))
+
+# Count the genotypes of the major and minor alleles from genotype counts, given in the form
+# returned by ResultsSet.get_genotype_counts.  Returns an array with a row for each SNP, a column
+# for each label and counts of major/major, major/minor and minor/minor.  Heterozygotes can be
+# written either way round.
+def get_major_minor_genotypes(codes, counts, major, minor):
+    snp_count, label_count = counts.shape[:2]
+    rows = np.arange(snp_count)[:, np.newaxis]
+    groups = np.arange(label_count)[np.newaxis, :]
+    # Genotypes that weren't counted are read from an extra slot of zeros
+    padded_counts = np.concatenate([counts, np.zeros((snp_count, label_count, 1), dtype=counts.dtype)], axis=2)
+    code_slots = np.zeros(code_count, dtype=np.int64) + len(codes)
+    code_slots[codes] = np.arange(len(codes))
+    def genotype_counts(first, second):
+        return padded_counts[rows, groups, code_slots[genotype_pair_codes[first, second]][:, np.newaxis]]
+    return np.dstack([genotype_counts(major, major),
+                      genotype_counts(major, minor) + genotype_counts(minor, major),
+                      genotype_counts(minor, minor)])
+
+# Select rows from genotype counts, given in the form returned by ResultsSet.get_genotype_counts.
+# rows is an array of indexes or a boolean array.  Returns a tuple of the same form.
+def select_rows(genotype_counts, rows):
+    rsids, chromosomes, positions, codes, counts = genotype_counts
+    indexes = np.arange(len(rsids))[rows]
+    return ([rsids[index] for index in indexes], [chromosomes[index] for index in indexes],
+            [positions[index] for index in indexes], codes, counts[indexes])
+
+####################################################################################
+#
+# Class holding the summary statistics for every SNP in a set of results
+#
+####################################################################################
+class SummaryTable:
+    # Constructor.  Summarizes the genotype counts for the group labels, given in the form returned
+    # by ResultsSet.get_genotype_counts.
+    def __init__(self, labels, rsids, chromosomes, positions, codes, counts):
+        self.labels = list(labels)
+        self.rsids = rsids
+        self.chromosomes = chromosomes
+        self.positions = positions
+        self.allele_counts = get_allele_counts(codes, counts)
+        self.major, self.minor = get_major_minor(self.allele_counts)
+        rows = np.arange(len(rsids))[:, np.newaxis]
+        groups = np.arange(len(self.labels))[np.newaxis, :]
+        self.minor_counts = self.allele_counts[rows, groups, self.minor[:, np.newaxis]]
+        self.major_counts = self.allele_counts[rows, groups, self.major[:, np.newaxis]]
+        self.genotypes = counts.sum(axis=2)
+        self.no_calls = counts[:, :, genotype_no_calls[codes]].sum(axis=2)
+        self.genotype_counts = get_major_minor_genotypes(codes, counts, self.major, self.minor)
+        shape = self.genotype_counts.shape[:2]
+        self.hwe_p = hwe_exact(*[self.genotype_counts[:, :, i].ravel() for i in range(3)]).reshape(shape)
+
+    # Summarize the SNPs in a ResultsSet or ArrayResultsSet for the group labels
+    @staticmethod
+    def from_results_set(results_set, labels):
+        return SummaryTable(labels, *results_set.get_genotype_counts(labels))
+
+    # Get the number of SNPs in the table
+    def __len__(self):
+        return len(self.rsids)
+
+    # Convert the contents to a string
+    def __str__(self):
+        return "( SummaryTable: " + ", ".join(self.labels) + ": " + str(len(self)) + " SNPs )"
+
+    # Get the group labels summarized
+    def get_labels(self):
+        return self.labels
+
+    # Get the frequency of each called allele as an array with a row for each SNP, a column for
+    # each label and a frequency for each allele in called_alleles
+    def get_allele_frequencies(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.allele_counts / self.allele_counts.sum(axis=2, keepdims=True).astype(np.float64)
+
+    # Get the frequency of the minor allele in each group as an array with a column for each label
+    def get_minor_allele_frequencies(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.minor_counts / (self.minor_counts + self.major_counts).astype(np.float64)
+
+    # Get the number of genotypes counted in each group as an array with a column for each label
+    def get_genotype_totals(self):
+        return self.genotypes
+
+    # Get the fraction of the genotypes counted in each group that aren't no-calls as an array
+    # with a column for each label
+    def get_call_rates(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return 1 - self.no_calls / self.genotypes.astype(np.float64)
+
+    # Get the exact Hardy-Weinberg equilibrium p-values for each group as an array with a column
+    # for each label
+    def get_hwe_p(self):
+        return self.hwe_p
+
+    # Get a boolean array of the SNPs that pass quality control in every group.  Thresholds that are
+    # None aren't applied.  A group with no genotypes for a SNP fails the thresholds applied.
+    def get_passing(self, min_maf = None, min_call_rate = None, min_hwe_p = None):
+        passing = np.ones(len(self), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            if min_maf != None:
+                passing &= (self.get_minor_allele_frequencies() >= min_maf).all(axis=1)
+            if min_call_rate != None:
+                passing &= (self.get_call_rates() >= min_call_rate).all(axis=1)
+            if min_hwe_p != None:
+                passing &= ((self.hwe_p >= min_hwe_p) & (self.genotypes > 0)).all(axis=1)
+        return passing
+
+    # Get the sequence of the SNPs by chromosome, position and rsid
+    def get_order(self):
+        chromosome_seqs = np.array([chromosome_codes.get(chromosome, 0) for chromosome in self.chromosomes])
+        return np.lexsort((np.asarray(self.rsids), np.asarray(self.positions), chromosome_seqs))
+
+    # Print the table in chromosome and position sequence as tab-separated columns with a heading
+    # line.  If rows is passed, only the SNPs it selects are printed (see get_passing).
+    def print_contents(self, rows = None):
+        heading = ["rsid", "chromosome", "position", "minor", "major"]
+        for label in self.labels:
+            heading += ["genotypes " + label, "call rate " + label, "MAF " + label, "HWE p " + label]
+        print "\t".join(heading)
+        frequencies = self.get_minor_allele_frequencies()
+        call_rates = self.get_call_rates()
+        for index in self.get_order():
+            if rows is None or rows[index]:
+                line = [self.rsids[index], self.chromosomes[index], str(self.positions[index]),
+                        called_alleles[self.minor[index]], called_alleles[self.major[index]]]
+                for label_index in range(len(self.labels)):
+                    line += [str(self.genotypes[index, label_index]), "%.4g" % call_rates[index, label_index],
+                             "%.4g" % frequencies[index, label_index], "%.4g" % self.hwe_p[index, label_index]]
+                print "\t".join(line)
@@ -0,0 +1,70 @@
+"""
+This program is designed to test the classes in snp_summary
+"""
+import sys
+import numpy as np
+from snp_classes import *
+from snp_results import ArrayResultsSet
+from snp_summary import *
+import unittest
+
+####################################################################################
+#
+# Test SummaryTable class
+#
+####################################################################################
+class SummaryTable_test(unittest.TestCase):
+
+    def setUp(self):
+        rsids = ["RS1"] * 10 + ["RS2"] * 4
+        chromosomes = ["1"] * 14
+        positions = [5] * 10 + [9] * 4
+        self.chunks = {"Rollers": SnpChunk.from_strings(rsids, chromosomes, positions,
+                                                        ["AA"] * 6 + ["AG"] * 3 + ["GA"] + ["CC", "CT", "--", "T"]),
+                       "Non-Rollers": SnpChunk.from_strings(rsids, chromosomes, positions,
+                                                            ["GG"] * 6 + ["AG"] * 3 + ["AA"] + ["CC"] * 4)}
+
+    # Get the summary for a results set holding the sample chunks
+    def get_table(self, results_set):
+        for label, snp_chunk in self.chunks.items():
+            results_set.add_chunk(label, snp_chunk)
+        return SummaryTable.from_results_set(results_set, ["Rollers", "Non-Rollers"])
+
+    def test_statistics(self):
+        for results_set in [ResultsSet(), ArrayResultsSet()]:
+            table = self.get_table(results_set)
+            self.assertEqual(2, len(table))
+            first, second = table.get_order()
+            self.assertEqual(["RS1", "RS2"], [table.rsids[first], table.rsids[second]])
+            self.assertEqual([0.2, 0.75], table.get_minor_allele_frequencies()[first].tolist())
+            self.assertEqual([10, 10], table.get_genotype_totals()[first].tolist())
+            self.assertEqual([0.75, 1.0], table.get_call_rates()[second].tolist())
+            frequencies = table.get_allele_frequencies()[second, 0]
+            self.assertEqual([0.0, 0.6, 0.0, 0.4], frequencies[:4].tolist())
+            # Non-Rollers AA=1, AG=3, GG=6
+            self.assertAlmostEqual(0.4798762, table.get_hwe_p()[first, 1], places=6)
+
+    def test_get_passing(self):
+        table = self.get_table(ResultsSet())
+        first, second = table.get_order()
+        self.assertEqual([True, True], table.get_passing()[[first, second]].tolist())
+        self.assertEqual([True, False], table.get_passing(min_call_rate=0.9)[[first, second]].tolist())
+        self.assertEqual([False, False], table.get_passing(min_maf=0.3)[[first, second]].tolist())
+
+    def test_select_rows(self):
+        results_set = ResultsSet()
+        for label, snp_chunk in self.chunks.items():
+            results_set.add_chunk(label, snp_chunk)
+        genotype_counts = results_set.get_genotype_counts(["Rollers"])
+        rows = np.array(genotype_counts[0]) == "RS2"
+        rsids, chromosomes, positions, codes, counts = select_rows(genotype_counts, rows)
+        self.assertEqual((["RS2"], ["1"], [9]), (rsids, chromosomes, positions))
+        self.assertEqual(4, counts.sum())
+
+    def test_empty(self):
+        table = SummaryTable.from_results_set(ResultsSet(), ["Default"])
+        self.assertEqual(0, len(table))
+        self.assertEqual(0, len(table.get_passing(min_maf=0.1)))
+
+if __name__ == '__main__':
+    unittest.main()
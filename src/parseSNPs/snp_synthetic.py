@@ -0,0 +1,145 @@
+"""
+This module writes synthetic OpenSNP files for testing and benchmarking the parser without the real dump.
+
+A panel of SNPs is drawn once: rsids, chromosomes, sorted positions, a pair of alleles and an allele
+frequency for each.  Every file holds the panel's SNPs in chromosome and position sequence, with
+genotypes drawn for its user under Hardy-Weinberg equilibrium and a few no-calls.  Files are written
+in each format the processors accept, in turn, and named as OpenSNP names them, such as
+user12_file34_yearofbirth_1970_sex_XY.23andme.txt.  The same seed always writes the same files.
+
+Usage:
+    python snp_synthetic.py [directory] [files] [rows per file]
+"""
+
+import sys
+import os
+import numpy as np
+
+# Allele pairs SNPs are drawn with
+allele_pairs = [("A", "G"), ("C", "T"), ("A", "C"), ("G", "T"), ("A", "T"), ("C", "G")]
+
+# Chromosomes SNPs are drawn on, each equally likely
+panel_chromosomes = [str(number) for number in range(1, 23)] + ["X", "Y", "MT"]
+
+####################################################################################
+#
+# Functions formatting the lines of each file format.  Each takes the columns of the
+# panel and a user's genotypes as lists, and the SnpPanel, and returns the text of the file.
+#
+####################################################################################
+
+# 23andme: a commented header and tab-separated rsid, chromosome, position and genotype
+def format_23andme(rsids, chromosomes, positions, genotypes, panel):
+    header = "# This data file generated by snp_synthetic\n# rsid\tchromosome\tposition\tgenotype\n"
+    return header + "".join(["%s\t%s\t%d\t%s\n" % row for row in zip(rsids, chromosomes, positions, genotypes)])
+
+# Illumina: quoted comma-separated rsid, chromosome, position and genotype
+def format_illumina(rsids, chromosomes, positions, genotypes, panel):
+    return "".join(['"%s","%s","%d","%s"\n' % row for row in zip(rsids, chromosomes, positions, genotypes)])
+
+# FTDNA Illumina: tab-separated rsid, chromosome, position and each allele
+def format_ftdna_tab(rsids, chromosomes, positions, genotypes, panel):
+    return "".join(["%s\t%s\t%d\t%s\t%s\n" % (rsid, chromosome, position, genotype[0], genotype[1:] or genotype[0])
+                    for rsid, chromosome, position, genotype in zip(rsids, chromosomes, positions, genotypes)])
+
+# FTDNA Illumina: space-separated rsid, chromosome, position and genotype
+def format_ftdna_space(rsids, chromosomes, positions, genotypes, panel):
+    return "".join(["%s %s %d %s\n" % row for row in zip(rsids, chromosomes, positions, genotypes)])
+
+# IYG: tab-separated rsid and genotype
+def format_iyg(rsids, chromosomes, positions, genotypes, panel):
+    return "".join(["%s\t%s\n" % row for row in zip(rsids, genotypes)])
+
+# decodeme: comma-separated rsid, variation, chromosome, position, strand and genotype.  Genotypes
+# on the - strand are written as the opposite strand reports them.
+def format_decodeme(rsids, chromosomes, positions, genotypes, panel):
+    complement = dict(zip("ACGT-", "TGCA-"))
+    lines = []
+    for rsid, first, second, chromosome, position, strand, genotype in zip(rsids, panel.first_alleles.tolist(),
+                                                                           panel.second_alleles.tolist(), chromosomes,
+                                                                           positions, panel.strands.tolist(), genotypes):
+        if strand == "-":
+            genotype = "".join([complement[allele] for allele in genotype])
+        lines.append("%s,%s/%s,%s,%d,%s,%s\n" % (rsid, first, second, chromosome, position, strand, genotype))
+    return "".join(lines)
+
+# Names of the formats with the file name ending and the function formatting each.  Files are
+# written in this sequence.
+file_formats = [("23andme", "23andme.txt", format_23andme),
+                ("illumina", "illumina.txt", format_illumina),
+                ("ftdna-tab", "ftdna-illumina.txt", format_ftdna_tab),
+                ("ftdna-space", "ftdna-illumina.txt", format_ftdna_space),
+                ("iyg", "IYG.txt", format_iyg),
+                ("decodeme", "decodeme.txt", format_decodeme)]
+
+####################################################################################
+#
+# Class holding the panel of SNPs synthetic files are drawn from
+#
+####################################################################################
+class SnpPanel:
+    # Constructor.  Draws a panel of rows SNPs with a random number generator seeded with seed.
+    def __init__(self, rows, seed = 0):
+        self.random = np.random.RandomState(seed)
+        chromosome_indexes = np.sort(self.random.randint(0, len(panel_chromosomes), rows))
+        self.chromosomes = [panel_chromosomes[index] for index in chromosome_indexes.tolist()]
+        # Positions increase within each chromosome, as they do in the real files
+        self.positions = np.zeros(rows, dtype=np.int64)
+        for index in np.unique(chromosome_indexes).tolist():
+            found = chromosome_indexes == index
+            self.positions[found] = np.cumsum(self.random.randint(1, 20000, found.sum()))
+        self.rsids = ["rs" + str(number) for number in (self.random.permutation(rows * 10)[:rows] + 1000).tolist()]
+        pairs = self.random.randint(0, len(allele_pairs), rows)
+        self.first_alleles = np.array([allele_pairs[pair][0] for pair in pairs.tolist()])
+        self.second_alleles = np.array([allele_pairs[pair][1] for pair in pairs.tolist()])
+        self.frequencies = self.random.beta(0.5, 0.5, rows)
+        self.strands = np.where(self.random.random_sample(rows) < 0.3, "-", "+")
+
+    # Get the number of SNPs in the panel
+    def __len__(self):
+        return len(self.rsids)
+
+    # Convert the contents to a string
+    def __str__(self):
+        return "( SnpPanel: " + str(len(self)) + " SNPs )"
+
+    # Draw the genotypes of one user as a list of strings.  no_call_rate is the share reported as "--".
+    def draw_genotypes(self, no_call_rate = 0.01):
+        rows = len(self)
+        first = np.where(self.random.random_sample(rows) < self.frequencies, self.first_alleles, self.second_alleles)
+        second = np.where(self.random.random_sample(rows) < self.frequencies, self.first_alleles, self.second_alleles)
+        # Alleles are reported in alphabetic sequence
+        genotypes = np.where(first <= second, np.char.add(first, second), np.char.add(second, first))
+        # Y and MT SNPs have one allele
+        haploid = np.in1d(self.chromosomes, ["Y", "MT"])
+        genotypes = np.where(haploid, first, genotypes)
+        genotypes = np.where(self.random.random_sample(rows) < no_call_rate, "--", genotypes)
+        return genotypes.tolist()
+
+    # Write a file of the panel's SNPs for one user in a format (see file_formats) to a directory.
+    # Returns the file name.
+    def write_file(self, directory, user, file_number, file_format, no_call_rate = 0.01):
+        name, ending, format_lines = dict((entry[0], entry) for entry in file_formats)[file_format]
+        year = "unknown" if user % 3 == 0 else str(1940 + user % 60)
+        sex = ["XX", "XY", "unknown"][user % 3]
+        filename = "user%d_file%d_yearofbirth_%s_sex_%s.%s" % (user, file_number, year, sex, ending)
+        text = format_lines(self.rsids, self.chromosomes, self.positions.tolist(), self.draw_genotypes(no_call_rate), self)
+        with open(os.path.join(directory, filename), "w") as f:
+            f.write(text)
+        return filename
+
+# Write synthetic SNP files of rows SNPs each to a directory, cycling through the formats
+# named (all of file_formats if None).  Returns a list of the file names written.
+def write_dataset(directory, files, rows, formats = None, seed = 0, no_call_rate = 0.01):
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    formats = formats or [entry[0] for entry in file_formats]
+    panel = SnpPanel(rows, seed)
+    return [panel.write_file(directory, index + 1, index + 1, formats[index % len(formats)], no_call_rate)
+            for index in range(files)]
+
+if __name__ == "__main__":
+    filenames = write_dataset(sys.argv[1] if len(sys.argv) > 1 else "synthetic",
+                              int(sys.argv[2]) if len(sys.argv) > 2 else 12,
+                              int(sys.argv[3]) if len(sys.argv) > 3 else 10000)
+    print "Wrote", len(filenames), "files"
@@ -0,0 +1,55 @@
+"""
+This program is designed to test the classes in snp_synthetic
+"""
+import sys
+import os
+import shutil
+import tempfile
+from snp_classes import *
+from snp_synthetic import *
+from snp_sources import open_file
+import unittest
+
+####################################################################################
+#
+# Test SnpPanel class and write_dataset
+#
+####################################################################################
+class SnpPanel_test(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_draw_genotypes(self):
+        panel = SnpPanel(1000, seed=1)
+        genotypes = panel.draw_genotypes(no_call_rate=0.0)
+        self.assertEqual(1000, len(genotypes))
+        self.assertEqual(1000, len(set(panel.rsids)))
+        for genotype, chromosome, first, second in zip(genotypes, panel.chromosomes, panel.first_alleles, panel.second_alleles):
+            self.assertTrue(set(genotype) <= set([first, second]))
+            self.assertEqual(1 if chromosome in ["Y", "MT"] else 2, len(genotype))
+        self.assertEqual(SnpPanel(1000, seed=1).draw_genotypes(), SnpPanel(1000, seed=1).draw_genotypes())
+
+    def test_write_dataset(self):
+        filenames = write_dataset(self.dir, len(file_formats) + 1, 200)
+        self.assertEqual(sorted(filenames), sorted(os.listdir(self.dir)))
+        self.assertTrue(filenames[0].startswith("user1_file1_yearofbirth_"))
+        panel = SnpPanel(200)
+        # Every file parses to the panel's SNPs in each format
+        for filename in filenames:
+            processor = AbstractSNPProcessor.get_processor(filename)
+            with open_file(os.path.join(self.dir, filename)) as f:
+                snp_chunk = SnpChunk.concatenate(list(processor.parse_file(f)))
+            self.assertTrue(snp_chunk.is_valid(), filename)
+            self.assertEqual(200, len(snp_chunk))
+            self.assertEqual([rsid.upper() for rsid in panel.rsids], snp_chunk.get_rsids().tolist())
+
+    def test_formats(self):
+        filenames = write_dataset(self.dir, 2, 10, formats=["decodeme"])
+        self.assertEqual(2, len([filename for filename in filenames if filename.endswith(".decodeme.txt")]))
+
+if __name__ == '__main__':
+    unittest.main()
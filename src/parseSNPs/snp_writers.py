@@ -0,0 +1,263 @@
+"""
+This module writes the genotype counts in a ResultsSet or ArrayResultsSet to the console or a file.
+
+The format is chosen with the FORMAT keyword in parse_files.txt (see Params.get_output_format):
+    TEXT    the ( Results: ( Result: ( Group: listing printed by ResultsSet.print_contents
+    TSV     a tab-separated table with a row for each SNP and group and a column for each genotype
+    CSV     the same table separated by commas
+    JSONL   a JSON object on a line for each SNP holding the counts of each group
+    BINARY  a NumPy .npz file with a column for each of rsids, chromosome codes, positions, group
+            labels, genotype codes and counts, and the names of the codes.  read_binary reads it back.
+Text is formatted a block of SNPs at a time and written with one call per block, rather than
+printed a group at a time.  TSV, CSV, JSONL and BINARY take the counts as arrays (see
+ResultsSet.get_genotype_counts), with each genotype held as its code.
+
+If SORT is set, SNPs are written in chromosome, position and rsid sequence, otherwise in the
+sequence the results set holds them.
+"""
+
+import sys
+import gc
+import csv
+import json
+import numpy as np
+from json.encoder import encode_basestring_ascii
+from snp_codes import *
+from snp_classes import ResultsSet
+
+# Names of the output formats
+output_formats = ["TEXT", "TSV", "CSV", "JSONL", "BINARY"]
+
+# Number of SNPs formatted before each write
+block_size = 16384
+
+# Size of the buffer of files written to
+output_buffer_size = 1 << 20
+
+# Create a writer for the format named in params
+def new_writer(params):
+    output_format = params.get_output_format()
+    if output_format == "TSV":
+        return TableWriter("\t")
+    if output_format == "CSV":
+        return TableWriter(",")
+    if output_format == "JSONL":
+        return JsonLinesWriter()
+    if output_format == "BINARY":
+        return BinaryWriter()
+    return TextWriter()
+
+# Write the counts in a results set for the file groups in params, in the format and to the file
+# named in params.  The writers create no reference cycles, so garbage collection is paused while
+# they run; otherwise the lists made for each block set off collections that search every Result
+# and Group in a ResultsSet, taking longer than the writing.
+def write_results(results_set, params):
+    writer = new_writer(params)
+    labels = params.get_file_group_labels()
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        if params.get_output_path() == None:
+            writer.write(sys.stdout, results_set, labels, params.get_sort_output())
+        else:
+            with open(params.get_output_path(), "wb", output_buffer_size) as stream:
+                writer.write(stream, results_set, labels, params.get_sort_output())
+    finally:
+        if collecting:
+            gc.enable()
+
+# Get the sequence to write SNPs in: by chromosome, position and rsid if sort is True, otherwise
+# the sequence they are listed in
+def get_order(rsids, chromosomes, positions, sort):
+    if not sort:
+        return np.arange(len(rsids))
+    chromosome_seqs = np.array([chromosome_codes.get(chromosome, 0) for chromosome in chromosomes], dtype=np.int64)
+    return np.lexsort((np.array(rsids, dtype=str), np.array(positions, dtype=np.int64), chromosome_seqs))
+
+# Get the counts of a block of SNPs for each group with anything counted.  rows is an array of SNP
+# indexes and counts an array in the form returned by ResultsSet.get_genotype_counts.  Returns a
+# tuple of lists of (SNP indexes, label indexes, counts) with an entry for each SNP and group.
+# If slots is passed, the counts of each genotype are listed in that sequence.
+def get_block(rows, counts, slots = None):
+    block_counts = counts[rows]
+    if slots != None:
+        block_counts = block_counts[:, :, slots]
+    block_counts = block_counts.reshape((-1, counts.shape[2]))
+    counted = np.flatnonzero(block_counts.any(axis=1))
+    return (rows[counted // counts.shape[1]].tolist(), (counted % counts.shape[1]).tolist(), block_counts[counted].tolist())
+
+# Get the slots of genotype codes in ascending code sequence, so the genotypes are written in the
+# same sequence by either results backend
+def get_code_slots(codes):
+    return np.argsort(codes, kind="mergesort").tolist()
+
+# Read the counts written by BinaryWriter.  Returns a tuple of (labels, rsids, chromosomes,
+# positions, codes, counts) in the form taken by SummaryTable and AssociationTable.
+def read_binary(path):
+    arrays = np.load(path)
+    code_names = json.loads(str(arrays["code_names"])) if "code_names" in arrays.files else None
+    chromosome_codes, genotype_codes = import_codes(code_names, arrays["chromosome_codes"], arrays["genotype_codes"])
+    return (arrays["labels"].tolist(), arrays["rsids"].tolist(), decode_chromosomes(chromosome_codes).tolist(),
+            arrays["positions"].tolist(), genotype_codes.tolist(), arrays["counts"])
+
+####################################################################################
+#
+# Writes the counts as the nested listing printed by ResultsSet.print_contents
+#
+####################################################################################
+class TextWriter:
+    # Format the first line print_contents prints for a result
+    @staticmethod
+    def format_heading(rsid, chromosome, position):
+        return "   ( Result: rsid " + str(rsid) + ", chromosome " + str(chromosome) + ", position " + str(position) + ":\n"
+
+    # Format the line print_contents prints for a group from a list of "genotype=count" entries
+    @staticmethod
+    def format_group(label, entries):
+        if len(entries) > 0:
+            return "       ( Group: label '" + label + "':  " + " ,  ".join(entries) + "  )\n"
+        return "       ( Group: label '" + label + "':   )\n"
+
+    # Format the lines print_contents prints for a Result
+    @staticmethod
+    def format_result(result):
+        lines = [TextWriter.format_heading(result.get_rsid(), result.get_chromosome(), result.get_position())]
+        for label, group in result.get_groups().items():
+            lines.append(TextWriter.format_group(label, [gtype + "=" + str(count) for gtype, count in sorted(group.get_counts().items())]))
+        lines.append("   )\n")
+        return "".join(lines)
+
+    # Get the sequence print_contents prints the groups of a ResultView in, given the indexes of
+    # its labels with something counted in ascending sequence.  The view's groups are copied to a
+    # Result, so they are in the sequence of a dictionary filled from another one.
+    @staticmethod
+    def get_label_order(labels, label_indexes):
+        groups = {}
+        for label, label_index in dict((labels[label_index], label_index) for label_index in label_indexes).iteritems():
+            groups[label] = label_index
+        return groups.values()
+
+    # Write the counts in a results set to a stream.  labels isn't used; every group is written.
+    def write(self, stream, results_set, labels, sort):
+        stream.write("( Results:\n")
+        if isinstance(results_set, ResultsSet):
+            results = list(results_set.get_results_iterator())
+            order = np.arange(len(results))
+            if sort:
+                order = get_order([result.get_rsid() for result in results], [result.get_chromosome() for result in results],
+                                  [result.get_position() for result in results], sort)
+            for start in range(0, len(order), block_size):
+                stream.write("".join([TextWriter.format_result(results[index]) for index in order[start:start + block_size]]))
+        else:
+            self.write_arrays(stream, results_set, sort)
+        stream.write(")\n")
+
+    # Write the counts in an ArrayResultsSet, formatting them from its arrays.  Its genotypes are
+    # held as codes, so nothing is lost.
+    def write_arrays(self, stream, results_set, sort):
+        labels = list(results_set.labels)
+        rsids, chromosomes, positions, codes, counts = results_set.get_genotype_counts(labels)
+        order = get_order(rsids, chromosomes, positions, sort)
+        # Genotypes are listed in name sequence
+        slots = sorted(range(len(codes)), key=lambda slot: genotype_names[codes[slot]])
+        gtype_texts = [genotype_names[codes[slot]] + "=" for slot in slots]
+        label_orders = {}
+        for start in range(0, len(order), block_size):
+            indexes, label_indexes, block_counts = get_block(order[start:start + block_size], counts, slots)
+            groups = [TextWriter.format_group(labels[label_index], [gtype_texts[slot] + str(count)
+                                                                    for slot, count in enumerate(label_counts) if count != 0])
+                      for label_index, label_counts in zip(label_indexes, block_counts)]
+            lines = []
+            entry = 0
+            while entry < len(indexes):
+                # Each SNP's groups are together and in label sequence
+                end = entry + 1
+                while end < len(indexes) and indexes[end] == indexes[entry]:
+                    end += 1
+                snp_labels = tuple(label_indexes[entry:end])
+                if snp_labels not in label_orders:
+                    label_orders[snp_labels] = [snp_labels.index(label_index)
+                                                for label_index in TextWriter.get_label_order(labels, snp_labels)]
+                index = indexes[entry]
+                lines.append(TextWriter.format_heading(rsids[index], chromosomes[index], positions[index]))
+                lines.extend([groups[entry + offset] for offset in label_orders[snp_labels]])
+                lines.append("   )\n")
+                entry = end
+            stream.write("".join(lines))
+
+####################################################################################
+#
+# Writes the counts as a delimited table with a row for each SNP and group and a
+# column for each genotype counted
+#
+####################################################################################
+class TableWriter:
+    # Constructor
+    def __init__(self, delimiter):
+        self.delimiter = delimiter
+
+    # Write the counts in a results set for some group labels to a stream.  Groups with nothing
+    # counted for a SNP have no row.
+    def write(self, stream, results_set, labels, sort):
+        rsids, chromosomes, positions, codes, counts = results_set.get_genotype_counts(labels)
+        order = get_order(rsids, chromosomes, positions, sort)
+        slots = get_code_slots(codes)
+        writer = csv.writer(stream, delimiter=self.delimiter, lineterminator="\n")
+        writer.writerow(["rsid", "chromosome", "position", "label"] + [genotype_names[codes[slot]] for slot in slots])
+        for start in range(0, len(order), block_size):
+            indexes, label_indexes, block_counts = get_block(order[start:start + block_size], counts, slots)
+            writer.writerows([[rsids[index], chromosomes[index], positions[index], labels[label_index]] + label_counts
+                              for index, label_index, label_counts in zip(indexes, label_indexes, block_counts)])
+
+####################################################################################
+#
+# Writes the counts as a JSON object on a line for each SNP, such as:
+#   {"rsid": "RS123", "chromosome": "1", "position": 1234, "groups": {"A": {"AG": 2, "GG": 1}}}
+#
+####################################################################################
+class JsonLinesWriter:
+    # Write the counts in a results set for some group labels to a stream.  Groups with nothing
+    # counted for a SNP are left out.
+    def write(self, stream, results_set, labels, sort):
+        rsids, chromosomes, positions, codes, counts = results_set.get_genotype_counts(labels)
+        order = get_order(rsids, chromosomes, positions, sort)
+        slots = get_code_slots(codes)
+        label_texts = [encode_basestring_ascii(label) + ": {" for label in labels]
+        gtype_texts = [encode_basestring_ascii(genotype_names[codes[slot]]) + ": " for slot in slots]
+        chromosome_texts = dict((chromosome, encode_basestring_ascii(chromosome)) for chromosome in set(chromosomes))
+        for start in range(0, len(order), block_size):
+            indexes, label_indexes, block_counts = get_block(order[start:start + block_size], counts, slots)
+            groups = [label_texts[label_index] + ", ".join([gtype_texts[slot] + str(count)
+                                                            for slot, count in enumerate(label_counts) if count != 0]) + "}"
+                      for label_index, label_counts in zip(label_indexes, block_counts)]
+            lines = []
+            # Each SNP's groups are together and in label sequence
+            for entry, index in enumerate(indexes):
+                if entry == 0 or index != indexes[entry - 1]:
+                    if entry > 0:
+                        lines.append("}}\n")
+                    lines.append("{\"rsid\": " + encode_basestring_ascii(rsids[index]) + ", \"chromosome\": " +
+                                 chromosome_texts[chromosomes[index]] + ", \"position\": " + str(positions[index]) +
+                                 ", \"groups\": {" + groups[entry])
+                else:
+                    lines.append(", " + groups[entry])
+            if len(indexes) > 0:
+                lines.append("}}\n")
+            stream.write("".join(lines))
+
+####################################################################################
+#
+# Writes the counts as a NumPy .npz file of columns (see read_binary)
+#
+####################################################################################
+class BinaryWriter:
+    # Write the counts in a results set for some group labels to a stream
+    def write(self, stream, results_set, labels, sort):
+        rsids, chromosomes, positions, codes, counts = results_set.get_genotype_counts(labels)
+        order = get_order(rsids, chromosomes, positions, sort)
+        slots = get_code_slots(codes)
+        np.savez(stream, labels=np.array(labels, dtype=str), rsids=np.array(rsids, dtype=str)[order],
+                 chromosome_codes=encode_chromosomes(chromosomes)[order],
+                 positions=np.array(positions, dtype=np.int32)[order],
+                 genotype_codes=np.array(codes, dtype=np.uint8)[slots], counts=counts[order][:, :, slots],
+                 code_names=np.array(json.dumps(get_code_names())))
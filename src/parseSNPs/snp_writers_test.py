@@ -0,0 +1,105 @@
+"""
+This program is designed to test the classes in snp_writers
+"""
+import sys
+import os
+import json
+import shutil
+import tempfile
+import StringIO
+import numpy as np
+from snp_classes import *
+from snp_results import ArrayResultsSet
+from snp_writers import *
+import unittest
+
+####################################################################################
+#
+# Test the result writers
+#
+####################################################################################
+class writers_test(unittest.TestCase):
+
+    def setUp(self):
+        self.snp_chunk = SnpChunk.from_strings(["RS2", "RS1", "RS1", "RS3", "RS1"], ["X", "1", "1", "2", "1"],
+                                               [20, 10, 10, 5, 10], ["CC", "AG", "AA", "TT", "AG"])
+        self.params = Params()
+
+    # Get the results sets of each backend holding the sample chunk
+    def get_results_sets(self):
+        results_sets = [ResultsSet(), ArrayResultsSet()]
+        for results_set in results_sets:
+            results_set.add_chunk("Default", self.snp_chunk)
+        return results_sets
+
+    # Write a results set with the params and return what was written
+    def write(self, results_set):
+        stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            write_results(results_set, self.params)
+            return sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+
+    # Get what print_contents prints for a results set
+    def get_printed(self, results_set):
+        stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            results_set.print_contents()
+            return sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+
+    def test_text(self):
+        for results_set in self.get_results_sets():
+            self.assertEqual(self.get_printed(results_set), self.write(results_set))
+
+    def test_table(self):
+        self.params.set_output_format("tsv")
+        self.params.set_sort_output(True)
+        for results_set in self.get_results_sets():
+            lines = [line.split("\t") for line in self.write(results_set).splitlines()]
+            self.assertEqual(["rsid", "chromosome", "position", "label"], lines[0][:4])
+            self.assertEqual(["RS1", "RS3", "RS2"], [line[0] for line in lines[1:]])
+            counts = dict(zip(lines[0][4:], lines[1][4:]))
+            self.assertEqual("1", counts["AA"])
+            self.assertEqual("2", counts["AG"])
+            self.assertEqual("0", counts["CC"])
+
+    def test_json_lines(self):
+        self.params.set_output_format("jsonl")
+        self.params.set_sort_output(True)
+        for results_set in self.get_results_sets():
+            lines = [json.loads(line) for line in self.write(results_set).splitlines()]
+            self.assertEqual(3, len(lines))
+            self.assertEqual({"rsid": "RS1", "chromosome": "1", "position": 10, "groups": {"Default": {"AA": 1, "AG": 2}}},
+                             lines[0])
+            self.assertEqual(["1", "2", "X"], [line["chromosome"] for line in lines])
+
+    def test_binary(self):
+        directory = tempfile.mkdtemp()
+        try:
+            self.params.set_output_format("binary")
+            self.params.set_output_path(os.path.join(directory, "counts.npz"))
+            self.params.set_sort_output(True)
+            for results_set in self.get_results_sets():
+                self.assertEqual("", self.write(results_set))
+                labels, rsids, chromosomes, positions, codes, counts = read_binary(self.params.get_output_path())
+                self.assertEqual((["Default"], ["RS1", "RS3", "RS2"], ["1", "2", "X"], [10, 5, 20]),
+                                 (labels, rsids, chromosomes, positions))
+                self.assertEqual(sorted(codes), codes)
+                self.assertEqual(2, counts[0, 0, codes.index(genotype_codes["AG"])])
+                self.assertEqual(5, counts.sum())
+        finally:
+            shutil.rmtree(directory)
+
+    def test_empty(self):
+        self.params.set_output_format("csv")
+        self.assertEqual("rsid,chromosome,position,label\n", self.write(ResultsSet()))
+        self.params.set_output_format("jsonl")
+        self.assertEqual("", self.write(ArrayResultsSet()))
+
+if __name__ == '__main__':
+    unittest.main()